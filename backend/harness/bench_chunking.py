@@ -0,0 +1,101 @@
+'''
+Measure how the chunk size (CHUNK_TOKENS) and Bedrock concurrency (BEDROCK_CONCURRENCY) of the Titan
+Textract Lambda drive the latency of filtering one long document, against the fakes in fakes.py.
+
+Bedrock latency is modelled as a fixed per request cost plus a cost per 1k prompt tokens, so smaller
+chunks trade more requests for shorter ones and only pay off when they run concurrently.
+
+Usage:
+    python backend/harness/bench_chunking.py
+    python backend/harness/bench_chunking.py --lines 1200 --chunk-tokens 6000,3000,1500 --concurrency 1,4,8
+    python backend/harness/bench_chunking.py --rate 2 --json
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+
+from run_harness import handler_specs, load_handler
+from fakes import FakeBedrock, FakeS3, FakeTextract, Faults
+from common.rate_limit import RateLimiter
+
+
+class SlowBedrock(FakeBedrock):
+    """FakeBedrock answering after latency + per_1k_tokens seconds per 1000 estimated prompt tokens."""
+
+    def __init__(self, latency: float, per_1k_tokens: float):
+        super().__init__()
+        self.latency = latency
+        self.per_1k_tokens = per_1k_tokens
+
+    def invoke_model(self, body, modelId, **kwargs):
+        prompt = json.loads(body).get('inputText', '')
+        time.sleep(self.latency + len(prompt) / 4 / 1000 * self.per_1k_tokens)
+        return super().invoke_model(body, modelId, **kwargs)
+
+
+def bench(lines: int, chunk_sizes: list, concurrencies: list, rate: float, latency: float,
+          per_1k_tokens: float) -> list:
+    """
+    Filter the same single page document once per (chunk size, concurrency) pair.
+
+    :return: The bedrock_chunking metric line of every run
+    """
+    spec = next(spec for spec in handler_specs if spec.name == 'textract_titan')
+    load_handler(spec)
+    module = sys.modules['harness_' + spec.name]
+
+    s3 = FakeS3()
+    s3.create_bucket(Bucket='doc-input-external')
+    s3.put_object(Bucket='doc-input-external', Key='long_statement.png', Body=b'\x89PNG\r\n\x1a\n')
+    textract = FakeTextract(s3, Faults(), lines=lines, pages=1)
+    bedrock = SlowBedrock(latency, per_1k_tokens)
+
+    rows = []
+    for chunk_tokens in chunk_sizes:
+        for concurrency in concurrencies:
+            module.chunk_tokens = chunk_tokens
+            module.bedrock_concurrency = concurrency
+            module.bedrock_rate = rate
+            module.bedrock_limiter = RateLimiter(rate)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                module.extract_and_filter(textract, bedrock, 'doc-input-external', 'long_statement.png')
+            metric = next(json.loads(line) for line in output.getvalue().splitlines() if 'bedrock_chunking' in line)
+            rows.append(metric)
+    return rows
+
+
+def _print_table(rows: list):
+    columns = ['tokens_before_compaction', 'tokens_after_compaction', 'chunk_tokens', 'chunks', 'concurrency', 'rate', 'seconds', 'bedrock_seconds_sum', 'rate_wait_seconds',
+               'lines_before_merge', 'lines_after_merge']
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(widths[column]) for column in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=600, help='OCR lines in the document (about 20 tokens each)')
+    parser.add_argument('--chunk-tokens', default='12000,3000,1500,750')
+    parser.add_argument('--concurrency', default='1,2,4,8')
+    parser.add_argument('--rate', type=float, default=0, help='Bedrock requests per second, 0 for no limit')
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per Bedrock request')
+    parser.add_argument('--per-1k-tokens', type=float, default=0.1, help='Seconds per 1000 prompt tokens')
+    parser.add_argument('--json', action='store_true', help='Print the rows as JSON')
+    args = parser.parse_args(argv)
+
+    rows = bench(args.lines, [int(value) for value in args.chunk_tokens.split(',')],
+                 [int(value) for value in args.concurrency.split(',')], args.rate, args.latency, args.per_1k_tokens)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,509 @@
+'''
+Deterministic in-process stand-ins for the services the Lambdas call: S3, Lambda, Bedrock, Textract,
+Transcribe, Secrets Manager and the Google APIs (Geocoding, Street View, Custom Search, scraped pages).
+
+Every fake takes a Faults object, which adds latency and injects failures per call, so the handlers can be
+timed and stress tested without AWS or Google credentials.
+'''
+
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import types
+
+from botocore.exceptions import ClientError
+
+
+class Faults:
+    """
+    Latency and failure injection for one fake service.
+
+    :param latency: Seconds added to every call
+    :param jitter: Extra uniformly random seconds in [0, jitter)
+    :param failure_rate: Probability in [0, 1] that a call raises
+    :param seed: Seed of the random generator, the same seed gives the same sequence of delays and failures
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+
+    def apply(self, operation: str, error=None):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+            fail = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise (error or _client_error)('ThrottlingException', f"Injected failure in {operation}", operation)
+
+
+def _client_error(code: str, message: str, operation: str, status: int = 400) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message},
+                        'ResponseMetadata': {'HTTPStatusCode': status}}, operation)
+
+
+def _body(data: bytes) -> io.BytesIO:
+    # Stands in for botocore's StreamingBody, read()/iteration over a bytes buffer
+    return io.BytesIO(data)
+
+
+class FakeS3:
+    """In-memory S3: buckets of {key: (bytes, metadata)}, with ETags, conditional writes and conditional reads."""
+
+    class exceptions:
+        ClientError = ClientError
+
+        class NoSuchBucket(ClientError):
+            pass
+
+        class NoSuchKey(ClientError):
+            pass
+
+    def __init__(self, faults: Faults = None):
+        self.faults = faults or Faults()
+        self._lock = threading.Lock()
+        self.buckets = {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        with self._lock:
+            self.buckets.setdefault(Bucket, {})
+        return {}
+
+    def head_bucket(self, Bucket):
+        self.faults.apply('HeadBucket')
+        if Bucket not in self.buckets:
+            raise _client_error('404', 'Not Found', 'HeadBucket', 404)
+        return {}
+
+    def put_object(self, Bucket, Key, Body=b'', IfMatch=None, IfNoneMatch=None, **kwargs):
+        self.faults.apply('PutObject')
+        data = Body.read() if hasattr(Body, 'read') else Body
+        data = data.encode('utf-8') if isinstance(data, str) else bytes(data)
+        with self._lock:
+            objects = self._bucket(Bucket, 'PutObject')
+            current = objects.get(Key)
+            if IfNoneMatch == '*' and current is not None:
+                raise _client_error('PreconditionFailed', 'At least one of the pre-conditions you specified did not hold',
+                                    'PutObject', 412)
+            if IfMatch is not None and (current is None or current[1]['ETag'] != IfMatch):
+                raise _client_error('PreconditionFailed', 'At least one of the pre-conditions you specified did not hold',
+                                    'PutObject', 412)
+            metadata = {'ETag': '"' + hashlib.md5(data).hexdigest() + '"', 'ContentLength': len(data),
+                        **{k: v for k, v in kwargs.items() if k in ('ContentType', 'ContentEncoding', 'Metadata')}}
+            objects[Key] = (data, metadata)
+        return {'ETag': metadata['ETag']}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read(), **(ExtraArgs or {}))
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, **kwargs):
+        data = Fileobj.read()
+        self.put_object(Bucket=Bucket, Key=Key, Body=data, **(ExtraArgs or {}))
+        if Callback is not None:
+            Callback(len(data))
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self.faults.apply('GetObject')
+        data, metadata = self._object(Bucket, Key, 'GetObject')
+        if IfNoneMatch is not None and IfNoneMatch == metadata['ETag']:
+            raise _client_error('304', 'Not Modified', 'GetObject', 304)
+        return {'Body': _body(data), **metadata}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.faults.apply('HeadObject')
+        _, metadata = self._object(Bucket, Key, 'HeadObject', missing_code='404')
+        return dict(metadata)
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective='COPY', **kwargs):
+        self.faults.apply('CopyObject')
+        data, metadata = self._object(CopySource['Bucket'], CopySource['Key'], 'CopyObject')
+        if MetadataDirective == 'REPLACE':
+            metadata = {'ETag': metadata['ETag'], 'ContentLength': metadata['ContentLength'],
+                        **{k: v for k, v in kwargs.items() if k in ('ContentType', 'ContentEncoding', 'Metadata')}}
+        with self._lock:
+            self._bucket(Bucket, 'CopyObject')[Key] = (data, dict(metadata))
+        return {'CopyObjectResult': {'ETag': metadata['ETag']}}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self.faults.apply('DeleteObject')
+        with self._lock:
+            self._bucket(Bucket, 'DeleteObject').pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self.faults.apply('DeleteObjects')
+        with self._lock:
+            objects = self._bucket(Bucket, 'DeleteObjects')
+            for item in Delete['Objects']:
+                objects.pop(item['Key'], None)
+        return {'Deleted': Delete['Objects']}
+
+    def clear(self, Bucket, Prefix=''):
+        # Harness bookkeeping between calls, not an S3 operation: no faults, no latency
+        with self._lock:
+            objects = self._bucket(Bucket, 'ListObjectsV2')
+            for key in [key for key in objects if key.startswith(Prefix)]:
+                del objects[key]
+
+    def list_objects_v2(self, Bucket, Prefix='', StartAfter='', MaxKeys=1000, ContinuationToken=None, **kwargs):
+        self.faults.apply('ListObjectsV2')
+        with self._lock:
+            objects = self._bucket(Bucket, 'ListObjectsV2')
+            start = ContinuationToken or StartAfter
+            keys = sorted(key for key in objects if key.startswith(Prefix) and key > start)
+            page = keys[:MaxKeys]
+            contents = [{'Key': key, 'ETag': objects[key][1]['ETag'], 'Size': len(objects[key][0])} for key in page]
+        response = {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': len(keys) > MaxKeys}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def get_paginator(self, operation_name):
+        if operation_name != 'list_objects_v2':
+            raise NotImplementedError(operation_name)
+        s3 = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                token = None
+                while True:
+                    page = s3.list_objects_v2(**kwargs, **({'ContinuationToken': token} if token else {}))
+                    yield page
+                    if not page['IsTruncated']:
+                        return
+                    token = page['NextContinuationToken']
+
+        return Paginator()
+
+    def _bucket(self, bucket_name, operation):
+        if bucket_name not in self.buckets:
+            raise self.exceptions.NoSuchBucket({'Error': {'Code': 'NoSuchBucket', 'Message': bucket_name},
+                                                'ResponseMetadata': {'HTTPStatusCode': 404}}, operation)
+        return self.buckets[bucket_name]
+
+    def _object(self, bucket_name, object_key, operation, missing_code='NoSuchKey'):
+        with self._lock:
+            entry = self._bucket(bucket_name, operation).get(object_key)
+        if entry is None:
+            raise self.exceptions.NoSuchKey({'Error': {'Code': missing_code, 'Message': object_key},
+                                             'ResponseMetadata': {'HTTPStatusCode': 404}}, operation)
+        return entry
+
+
+class FakeBedrock:
+    """
+    bedrock-runtime invoke_model with canned, deterministic completions.
+
+    Titan requests get an answer shaped for the prompt that asked (JSON entities, a JSON list of URLs,
+    a list of document lines or a plain summary), Nova requests get the statement fields as JSON
+    (a JSON array of them for packed multi-statement prompts).
+    """
+
+    def __init__(self, faults: Faults = None):
+        self.faults = faults or Faults()
+
+    def invoke_model(self, body, modelId, **kwargs):
+        self.faults.apply('InvokeModel')
+        request = json.loads(body)
+        if 'messages' in request:
+            prompt = request['messages'][0]['content'][0]['text']
+            fields = {'client_balance': '12,345.67', 'statement_issue_date': '2025-07-31',
+                      'client_name': 'Jamie Dimon', 'bank_name': 'Example Bank'}
+            # Packed prompts get a JSON array with one object per <statement id="N">
+            ids = re.findall(r'<statement id="(\d+)">', prompt)
+            text = json.dumps([{'id': int(i), **fields} for i in ids] if ids else fields)
+            response = {'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+                        'usage': {'inputTokens': len(prompt) // 4, 'outputTokens': len(text) // 4}}
+        else:
+            prompt = request['inputText']
+            response = {'results': [{'outputText': self._titan_output(prompt), 'tokenCount': len(prompt) // 4}]}
+        return {'body': _body(json.dumps(response).encode('utf-8')), 'contentType': 'application/json'}
+
+    def _titan_output(self, prompt: str) -> str:
+        if 'Return only a valid JSON object' in prompt:
+            return json.dumps({'customer_name': 'Jamie Dimon', 'date_of_birth': 'Not found',
+                               'address': '270 Park Avenue, New York', 'occupation': 'CEO',
+                               'source_of_wealth': 'Employment income'})
+        if 'top 5 most relevant URLs' in prompt:
+            return json.dumps([{'url': f'https://example.com/profile/{i}', 'type': 'News Source',
+                                'description': 'Profile', 'priority_score': 2} for i in range(5)])
+        if 'text:' in prompt:
+            lines = [line for line in prompt.split('text:', 1)[1].split('\n') if line.strip()]
+            return json.dumps(lines[:10])
+        return 'Summary: ' + prompt[:200]
+
+
+class FakeTextract:
+    """
+    Text detection returning LINE blocks derived from the document name, the document must exist in S3.
+
+    detect_document_text reads one page, the asynchronous start/get_document_text_detection job completes
+    after `polls_until_done` polls with `pages` pages for pdf/tif/tiff documents, paginated by MaxResults.
+    """
+
+    def __init__(self, s3: FakeS3, faults: Faults = None, lines: int = 40, pages: int = 4, polls_until_done: int = 1):
+        self.s3 = s3
+        self.faults = faults or Faults()
+        self.lines = lines
+        self.pages = pages
+        self.polls_until_done = polls_until_done
+        self.jobs = {}
+
+    def detect_document_text(self, Document):
+        self.faults.apply('DetectDocumentText')
+        location = Document['S3Object']
+        try:
+            self.s3._object(location['Bucket'], location['Name'], 'DetectDocumentText')
+        except ClientError:
+            raise _client_error('InvalidS3ObjectException', 'Unable to get object metadata from S3',
+                                'DetectDocumentText')
+        return {'DocumentMetadata': {'Pages': 1}, 'Blocks': self._blocks(location['Name'], 1)}
+
+    def start_document_text_detection(self, DocumentLocation, **kwargs):
+        self.faults.apply('StartDocumentTextDetection')
+        location = DocumentLocation['S3Object']
+        try:
+            self.s3._object(location['Bucket'], location['Name'], 'StartDocumentTextDetection')
+        except ClientError:
+            raise _client_error('InvalidS3ObjectException', 'Unable to get object metadata from S3',
+                                'StartDocumentTextDetection')
+        job_id = hashlib.md5(f"{location['Name']}-{len(self.jobs)}".encode('utf-8')).hexdigest()
+        multi_page = location['Name'].rsplit('.', 1)[-1].lower() in ('pdf', 'tif', 'tiff')
+        self.jobs[job_id] = {'blocks': self._blocks(location['Name'], self.pages if multi_page else 1), 'polls': 0}
+        return {'JobId': job_id}
+
+    def get_document_text_detection(self, JobId, MaxResults=1000, NextToken=None):
+        self.faults.apply('GetDocumentTextDetection')
+        job = self.jobs.get(JobId)
+        if job is None:
+            raise _client_error('InvalidJobIdException', JobId, 'GetDocumentTextDetection')
+        job['polls'] += 1
+        if job['polls'] <= self.polls_until_done and NextToken is None:
+            return {'JobStatus': 'IN_PROGRESS', 'Blocks': []}
+        start = int(NextToken or 0)
+        response = {'JobStatus': 'SUCCEEDED', 'Blocks': job['blocks'][start:start + MaxResults],
+                    'DocumentMetadata': {'Pages': max(block['Page'] for block in job['blocks'])}}
+        if start + MaxResults < len(job['blocks']):
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+    def _blocks(self, document: str, pages: int) -> list:
+        # Statement-like pages: letterhead, repeated column headers, two-cell transaction rows, page footer
+        name = os.path.basename(document)
+        blocks = []
+
+        # Body lines share 70% of the page, the line height leaves a gap between them
+        height = min(0.012, 0.7 / max(self.lines, 1) * 0.8)
+
+        def line(page, block_id, text, top, left):
+            return {'BlockType': 'LINE', 'Id': f'line-{page}-{block_id}', 'Page': page, 'Confidence': 99.0,
+                    'Text': text, 'Geometry': {'BoundingBox': {'Top': top, 'Left': left, 'Width': 0.28, 'Height': height}}}
+
+        for page in range(1, pages + 1):
+            blocks.append({'BlockType': 'PAGE', 'Id': f'page-{page}', 'Page': page})
+            blocks.append(line(page, 'header', 'Example Bank Statement of Account', 0.03, 0.05))
+            blocks += [line(page, f'column-{i}', column, 0.12, 0.05 + 0.3 * i)
+                       for i, column in enumerate(('Description', 'Amount'))]
+            for i in range(self.lines):
+                top = 0.15 + 0.7 * i / max(self.lines, 1)
+                blocks.append(line(page, f'{i}-text', f'{name} page {page} line {i}:', top, 0.05))
+                blocks.append(line(page, f'{i}-amount', f'balance {i * 100}.00', top, 0.35))
+            blocks.append(line(page, 'footer', f'Page {page} of {pages}', 0.96, 0.45))
+        return blocks
+
+
+class FakeTranscribe:
+    """Transcription jobs that complete immediately, transcripts are served by fake_urlopen."""
+
+    transcript_host = 'https://fake-transcribe.local/'
+
+    def __init__(self, faults: Faults = None):
+        self.faults = faults or Faults()
+        self.jobs = {}
+
+    def start_transcription_job(self, TranscriptionJobName, Media, **kwargs):
+        self.faults.apply('StartTranscriptionJob')
+        self.jobs[TranscriptionJobName] = Media['MediaFileUri']
+        return {'TranscriptionJob': {'TranscriptionJobName': TranscriptionJobName,
+                                     'TranscriptionJobStatus': 'IN_PROGRESS'}}
+
+    def get_transcription_job(self, TranscriptionJobName):
+        self.faults.apply('GetTranscriptionJob')
+        if TranscriptionJobName not in self.jobs:
+            raise _client_error('BadRequestException', 'The requested job could not be found', 'GetTranscriptionJob')
+        return {'TranscriptionJob': {
+            'TranscriptionJobName': TranscriptionJobName,
+            'TranscriptionJobStatus': 'COMPLETED',
+            'Transcript': {'TranscriptFileUri': self.transcript_host + TranscriptionJobName + '.json'}}}
+
+    def transcript(self, uri: str) -> bytes:
+        text = ("Hello Mr Dimon, thanks for taking the call. I am the CEO of JPMorgan Chase and most of my wealth "
+                "comes from employment income and company shares.")
+        return json.dumps({'jobName': uri.rsplit('/', 1)[-1], 'results': {'transcripts': [{'transcript': text}]}}).encode()
+
+
+class FakeSecretsManager:
+    def __init__(self, secrets: dict = None, faults: Faults = None):
+        self.secrets = secrets or {}
+        self.faults = faults or Faults()
+
+    def get_secret_value(self, SecretId):
+        self.faults.apply('GetSecretValue')
+        if SecretId not in self.secrets:
+            raise _client_error('ResourceNotFoundException', SecretId, 'GetSecretValue')
+        return {'SecretString': json.dumps(self.secrets[SecretId])}
+
+
+class FakeLambda:
+    """lambda invoke dispatching to handlers registered in-process by function name."""
+
+    def __init__(self, handlers: dict = None, faults: Faults = None):
+        self.handlers = handlers or {}
+        self.faults = faults or Faults()
+
+    def invoke(self, FunctionName, Payload=None, InvocationType='RequestResponse', **kwargs):
+        self.faults.apply('Invoke')
+        if FunctionName not in self.handlers:
+            raise _client_error('ResourceNotFoundException', f'Function not found: {FunctionName}', 'Invoke', 404)
+        event = json.loads(Payload) if Payload else {}
+        if InvocationType == 'Event':
+            threading.Thread(target=self.handlers[FunctionName], args=(event, None), daemon=True).start()
+            return {'StatusCode': 202, 'Payload': _body(b'')}
+        result = self.handlers[FunctionName](event, None)
+        return {'StatusCode': 200, 'Payload': _body(json.dumps(result).encode('utf-8'))}
+
+
+class FakeHTTPResponse:
+    def __init__(self, url: str, status_code: int = 200, text: str = '', data=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self._data = data
+
+    def json(self):
+        return self._data if self._data is not None else json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def read(self):
+        return self.text.encode('utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeGoogle:
+    """Google Geocoding, Street View, Custom Search and the scraped result pages."""
+
+    image = b'\xff\xd8\xff\xe0' + b'\x00' * 2048 + b'\xff\xd9'
+
+    def __init__(self, faults: Faults = None):
+        self.faults = faults or Faults()
+
+    def _fail(self, operation):
+        self.faults.apply(operation, error=lambda code, message, op: ConnectionError(message))
+
+    def geocode(self, address):
+        self._fail('Geocode')
+        digest = int(hashlib.md5(address.encode('utf-8')).hexdigest()[:8], 16)
+        return types.SimpleNamespace(address=address, latitude=40.0 + digest % 1000 / 1000,
+                                     longitude=-74.0 + digest % 997 / 1000)
+
+    def download_street_view(self, params: list, directory: str):
+        self._fail('StreetView')
+        os.makedirs(directory, exist_ok=True)
+        for i, _ in enumerate(params):
+            with open(os.path.join(directory, f'gsv_{i}.jpg'), 'wb') as f:
+                f.write(self.image)
+
+    def get(self, url, **kwargs):
+        self._fail('HTTP GET')
+        if 'googleapis.com/customsearch' in url:
+            items = [{'link': f'https://example.com/profile/{i}', 'title': f'Profile {i}',
+                      'snippet': 'Jamie Dimon is the CEO of JPMorgan Chase.'} for i in range(10)]
+            return FakeHTTPResponse(url, data={'items': items})
+        return FakeHTTPResponse(url, text='<html><body><p>Jamie Dimon is the CEO of JPMorgan Chase. '
+                                          'He has led the bank since 2005.</p></body></html>')
+
+    def modules(self) -> dict:
+        # Stand-ins for geopy.geocoders and google_streetview.api, as imported by street_view.py
+        google = self
+
+        class GoogleV3:
+            def __init__(self, api_key=None, **kwargs):
+                self.api_key = api_key
+
+            def geocode(self, address, **kwargs):
+                return google.geocode(address)
+
+        class Results:
+            def __init__(self, params):
+                self.params = params
+
+            def download_links(self, directory):
+                google.download_street_view(self.params, directory)
+
+        geopy, geocoders = types.ModuleType('geopy'), types.ModuleType('geopy.geocoders')
+        geocoders.GoogleV3 = GoogleV3
+        geopy.geocoders = geocoders
+        streetview, api = types.ModuleType('google_streetview'), types.ModuleType('google_streetview.api')
+        api.results = Results
+        streetview.api = api
+        return {'geopy': geopy, 'geopy.geocoders': geocoders, 'google_streetview': streetview,
+                'google_streetview.api': api}
+
+
+class patched:
+    """Context manager setting attributes and sys.modules entries, restoring the originals on exit."""
+
+    _missing = object()
+
+    def __init__(self, attributes: list = (), modules: dict = None):
+        self.attributes = list(attributes)  # (object, name, value)
+        self.modules = modules or {}
+        self._saved = []
+
+    def __enter__(self):
+        for target, name, value in self.attributes:
+            self._saved.append((target, name, getattr(target, name, self._missing)))
+            setattr(target, name, value)
+        for name, module in self.modules.items():
+            self._saved.append((sys.modules, name, sys.modules.get(name, self._missing)))
+            sys.modules[name] = module
+        return self
+
+    def __exit__(self, *exc):
+        for target, name, value in reversed(self._saved):
+            if target is sys.modules:
+                if value is self._missing:
+                    sys.modules.pop(name, None)
+                else:
+                    sys.modules[name] = value
+            elif value is self._missing:
+                delattr(target, name)
+            else:
+                setattr(target, name, value)
+        self._saved = []
+        return False
@@ -0,0 +1,342 @@
+'''
+Run every lambda_handler under backend/lambda in-process against the stand-ins in fakes.py and report,
+per handler, the cold start (module import + first call), warm latency and peak Python memory.
+
+Usage:
+    python backend/harness/run_harness.py
+    python backend/harness/run_harness.py --handlers textract_titan,summarise --warm 50
+    python backend/harness/run_harness.py --latency bedrock-runtime=0.8 --jitter bedrock-runtime=0.4 --fail s3=0.05
+    python backend/harness/run_harness.py --json
+    python backend/harness/run_harness.py --handlers textract_nova --result-cache
+
+Services for --latency/--jitter/--fail: s3, lambda, bedrock-runtime, textract, transcribe, secretsmanager, google.
+Handlers whose third party dependencies (e.g. bs4, jinja2) are not installed are reported with the import error.
+The result cache (common/result_cache.py) is off unless --result-cache is given, otherwise every warm call after
+the first would restore the cached output instead of running the handler. Cache hits are counted per handler.
+textract_nova's idempotency records are deleted before every call, a warm call would otherwise skip the document
+as a duplicate trigger.
+'''
+
+import argparse
+import contextlib
+import io
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+_harness_dir = os.path.dirname(os.path.abspath(__file__))
+_lambda_dir = os.path.join(os.path.dirname(_harness_dir), 'lambda')
+for _path in (_harness_dir, _lambda_dir):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from common import aws_clients, result_cache
+from fakes import (FakeBedrock, FakeGoogle, FakeLambda, FakeS3, FakeSecretsManager, FakeTextract, FakeTranscribe,
+                   Faults, patched)
+
+services = ['s3', 'lambda', 'bedrock-runtime', 'textract', 'transcribe', 'secretsmanager', 'google']
+
+
+class HandlerSpec:
+    """
+    :param name: Harness name of the handler
+    :param path: Handler file relative to backend/lambda
+    :param event: Callable() -> event dict
+    :param function_name: Name the app invokes it by, registered with the fake Lambda service
+    :param env: Environment variables the handler reads
+    :param reset: Callable(s3) run before every call, outside the timing, e.g. to drop the idempotency records
+                  that would make warm calls skip the work as duplicate triggers
+    """
+
+    def __init__(self, name: str, path: str, event, function_name: str = None, env: dict = None, reset=None):
+        self.name = name
+        self.path = path
+        self.event = event
+        self.function_name = function_name
+        self.env = env or {}
+        self.reset = reset
+
+
+def _s3_event(bucket_name: str, *object_keys: str) -> dict:
+    # One record per key, S3 batches several uploads into one notification
+    return {'Records': [{'eventSource': 'aws:s3', 's3': {'bucket': {'name': bucket_name},
+                                                           'object': {'key': object_key}}}
+                        for object_key in object_keys]}
+
+batch_documents = [f'batch/payslip_{i}.png' for i in range(20)]
+
+
+handler_specs = [
+    HandlerSpec('street_view', 'google_street_view/street_view.py',
+                lambda: {'CLNT_NBR': '123456704', 'ADDRESS': '270 Park Avenue,. New York City. ,. United States'},
+                function_name='street_view', env={'GM_API_KEY': 'fake-key', 'IMAGE_S3_BUCKET': 'streetviewimages'}),
+    HandlerSpec('web_search', 'amazon_titan_web_searching/amazon_titan_search.py',
+                lambda: {'CLNT_NBR': '123456704', 'CUSTOMER_NAME': 'Jamie Dimon', 'OCCUPATION': 'CEO',
+                         'COMPANY': 'JPMorgan Chase & Co.', 'LOCATION': '270 Park Avenue, New York'},
+                function_name='externaldataprocesscode',
+                env={'FUNC_S3_BUCKET': 'externaldataprocess', 'GOOGLE_API_KEY': 'fake-key', 'GOOGLE_CSE_ID': 'fake-cse'}),
+    HandlerSpec('transcribe', 'amazon_titan_transcribe_audio_to_text/audio_to_text.py',
+                lambda: {'mp3': 'banker_conversation_vo.mp3'}, function_name='rmcall'),
+    HandlerSpec('textract_titan', 'amazon_titan_textract_ocr/pdf_png_jpg_to_csv.py',
+                lambda: _s3_event('doc-input-external', 'Basic_Pay_stub_singledpage.png')),
+    HandlerSpec('textract_titan_batch', 'amazon_titan_textract_ocr/pdf_png_jpg_to_csv.py',
+                lambda: _s3_event('doc-input-external', *batch_documents)),
+    HandlerSpec('textract_titan_pdf', 'amazon_titan_textract_ocr/pdf_png_jpg_to_csv.py',
+                lambda: _s3_event('doc-input-external', 'bank_statement_bundle.pdf')),
+    HandlerSpec('textract_nova', 'amazon_nova_textract_ocr/pdf_png_jpg_to_csv.py',
+                lambda: _s3_event('output-internal-cld', 'output/filtered_bank_statement.csv'),
+                env={'BEDROCK_RATE': '0'}, reset=lambda s3: s3.clear('processed-output-cld', 'idempotency/')),
+    HandlerSpec('summarise', 'amazon_titan_summarise_narrative/summarise_text.py',
+                lambda: {'INPUT_TEXT': "{'CU Number':{'4':123456704},'Name':{'4':'Jamie Dimon'},'Position':{'4':'CEO'}}"},
+                function_name='deepseek-json-bedrock'),
+    HandlerSpec('sources_consolidation', 'source_of_wealth_report_generation/all_sources_consolidation.py',
+                lambda: {}),
+    HandlerSpec('sow_report', 'source_of_wealth_report_generation/sow_report_generation.py',
+                lambda: {}, function_name='sowreport'),
+]
+
+
+def build_world(faults: dict) -> dict:
+    """Create the fake services and the S3 objects the handlers read."""
+    s3 = FakeS3(faults['s3'])
+    for bucket_name in ('doc-input-external', 'output-internal-cld', 'processed-output-cld', 'rmcallprocess',
+                        'externaldataprocess', 'internaldataprocess', 'consolidation', 'sowreport', 'streetviewimages'):
+        s3.create_bucket(Bucket=bucket_name)
+    fixtures = {
+        ('doc-input-external', 'Basic_Pay_stub_singledpage.png'): b'\x89PNG\r\n\x1a\n' + b'\x00' * 4096,
+        ('doc-input-external', 'bank_statement_bundle.pdf'): b'%PDF-1.7\n' + b'\x00' * 16384,
+        ('output-internal-cld', 'output/filtered_bank_statement.csv'):
+            b'Filtered Transaction\nEnding balance 12,345.67\nStatement date 2025-07-31\nJamie Dimon\nExample Bank\n',
+        ('rmcallprocess', 'banker_conversation_vo.mp3'): b'ID3' + b'\x00' * 4096,
+        ('internaldataprocess', 'real_cu_list.csv'):
+            ('CU Number,Name,Age,Position,Employer,Employer Address\n'
+             + ''.join(f'{123456700 + i},Client {i},{30 + i % 40},Analyst,Example Corp,1 Main Street\n'
+                       for i in range(2000))).encode('utf-8'),
+        ('sowreport', 'sowreport_template.html'):
+            b'<html><body><h1>{{ customer_name }}</h1><p>{{ source_of_wealth }}</p></body></html>',
+        ('sowreport', 'sow_data.csv'): b'customer_name,source_of_wealth\nJamie Dimon,Employment income\n',
+    }
+    for object_key in batch_documents:
+        fixtures[('doc-input-external', object_key)] = b'\x89PNG\r\n\x1a\n' + object_key.encode('utf-8') * 64
+    sample = os.path.join(_lambda_dir, 'amazon_titan_web_searching', 'Jamie Dimon_1754546612.json')
+    with open(sample, 'rb') as f:
+        fixtures[('externaldataprocess', 'suggestions/Jamie Dimon_1754642273.json')] = f.read()
+    for (bucket_name, object_key), data in fixtures.items():
+        s3.put_object(Bucket=bucket_name, Key=object_key, Body=data)
+
+    return {
+        's3': s3,
+        'lambda': FakeLambda(faults=faults['lambda']),
+        'bedrock-runtime': FakeBedrock(faults['bedrock-runtime']),
+        'textract': FakeTextract(s3, faults['textract']),
+        'transcribe': FakeTranscribe(faults['transcribe']),
+        'secretsmanager': FakeSecretsManager(faults=faults['secretsmanager']),
+        'google': FakeGoogle(faults['google']),
+    }
+
+
+def load_handler(spec: HandlerSpec):
+    # Import the handler file fresh under a unique module name (two handlers share pdf_png_jpg_to_csv.py)
+    module_name = 'harness_' + spec.name
+    sys.modules.pop(module_name, None)
+    module_spec = importlib.util.spec_from_file_location(module_name, os.path.join(_lambda_dir, spec.path))
+    module = importlib.util.module_from_spec(module_spec)
+    sys.modules[module_name] = module
+    module_spec.loader.exec_module(module)
+    return module.lambda_handler
+
+
+def _lazy_handler(spec: HandlerSpec):
+    # Loaded on the first invoke through the fake Lambda service, then kept warm
+    loaded = []
+
+    def handler(event, context):
+        if not loaded:
+            loaded.append(load_handler(spec))
+        return loaded[0](event, context)
+    return handler
+
+
+class _CacheHits(logging.Handler):
+    # Counts the result_cache lines logged as hits
+    def __init__(self):
+        super().__init__(logging.INFO)
+        self.hits = 0
+
+    def emit(self, record):
+        if '"result": "hit"' in record.getMessage():
+            self.hits += 1
+
+
+def _ok(result) -> bool:
+    return isinstance(result, dict) and result.get('statusCode') == 200
+
+
+def measure(spec: HandlerSpec, warm_calls: int, verbose: bool = False) -> dict:
+    """Cold start (import + first call), warm latencies and peak traced memory of one handler."""
+    row = {'handler': spec.name, 'import_ms': None, 'cold_ms': None, 'warm_p50_ms': None, 'warm_p95_ms': None,
+           'warm_mean_ms': None, 'peak_kb': None, 'calls': 0, 'errors': 0, 'cache_hits': 0, 'error': None}
+    saved_env = {name: os.environ.get(name) for name in spec.env}
+    os.environ.update(spec.env)
+    cache_hits = _CacheHits()
+    result_cache.logger.addHandler(cache_hits)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        try:
+            handler = load_handler(spec)
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+            return row
+        row['import_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+        latencies = []
+        for i in range(warm_calls + 1):
+            if spec.reset:
+                spec.reset(aws_clients.get_client('s3'))
+            call_start = time.perf_counter()
+            try:
+                # Handler prints are discarded unless verbose, they would otherwise flood the report
+                with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+                    result = handler(spec.event(), None)
+            except Exception as e:
+                result = None
+                row['error'] = f"{type(e).__name__}: {e}"
+            elapsed = (time.perf_counter() - call_start) * 1000
+            row['calls'] += 1
+            row['errors'] += 0 if _ok(result) else 1
+            if i == 0:
+                row['cold_ms'] = round(row['import_ms'] + elapsed, 2)
+            else:
+                latencies.append(elapsed)
+        if latencies:
+            latencies.sort()
+            row['warm_p50_ms'] = round(statistics.median(latencies), 2)
+            row['warm_p95_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+            row['warm_mean_ms'] = round(statistics.fmean(latencies), 2)
+        return row
+    finally:
+        row['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+        result_cache.logger.removeHandler(cache_hits)
+        row['cache_hits'] = cache_hits.hits
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run(specs: list, warm_calls: int = 20, faults: dict = None, verbose: bool = False,
+        use_result_cache: bool = False) -> list:
+    """
+    Measure each handler against a fresh set of fakes.
+
+    :param faults: service name -> Faults, services not listed get no latency and no failures
+    :param use_result_cache: Keep the result cache on, warm calls then measure cache hits
+    :return: One measure() row per handler, in order
+    """
+    faults = {service: (faults or {}).get(service) or Faults() for service in services}
+    world = build_world(faults)
+    google, transcribe = world['google'], world['transcribe']
+    real_urlopen = urllib.request.urlopen
+
+    def fake_urlopen(url, *args, **kwargs):
+        url = getattr(url, 'full_url', url)
+        if url.startswith(transcribe.transcript_host):
+            faults['transcribe'].apply('GetTranscript')
+            from fakes import FakeHTTPResponse
+            return FakeHTTPResponse(url, text=transcribe.transcript(url).decode('utf-8'))
+        raise ConnectionError(f"Network access is disabled in the harness: {url}")
+
+    attributes = [(urllib.request, 'urlopen', fake_urlopen)]
+    try:
+        import requests
+        attributes.append((requests, 'get', google.get))
+    except ImportError:
+        pass
+
+    # The fake Lambda service invokes the handlers in-process, as the kyc-app would through invoke_lambda_function
+    world['lambda'].handlers.update({spec.function_name: _lazy_handler(spec) for spec in specs if spec.function_name})
+    for service in services:
+        if service != 'google':
+            aws_clients.override_client(service, world[service])
+    saved_cache = (result_cache.cache_enabled, result_cache.logger.propagate)
+    result_cache.cache_enabled = use_result_cache
+    # Cache hits are counted from the INFO lines, without printing them
+    result_cache.logger.propagate = False
+    try:
+        with patched(attributes, google.modules()):
+            return [measure(spec, warm_calls, verbose) for spec in specs]
+    finally:
+        for service in services:
+            if service != 'google':
+                aws_clients.override_client(service, None)
+        urllib.request.urlopen = real_urlopen
+        result_cache.cache_enabled, result_cache.logger.propagate = saved_cache
+
+
+def _service_values(values: list, option: str) -> dict:
+    parsed = {}
+    for value in values or []:
+        service, _, number = value.partition('=')
+        if service not in services or not number:
+            raise SystemExit(f"{option} expects service=value with service in {services}, got {value!r}")
+        parsed[service] = float(number)
+    return parsed
+
+
+def _print_table(rows: list):
+    columns = ['handler', 'import_ms', 'cold_ms', 'warm_p50_ms', 'warm_p95_ms', 'warm_mean_ms', 'peak_kb', 'calls',
+               'errors', 'cache_hits']
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for row in rows:
+        print('  '.join(str(row[column]).ljust(widths[column]) for column in columns))
+    for row in rows:
+        if row['error']:
+            print(f"{row['handler']}: {row['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--handlers', help='Comma separated handler names, default all: '
+                                           + ','.join(spec.name for spec in handler_specs))
+    parser.add_argument('--warm', type=int, default=20, help='Warm invocations per handler after the cold one')
+    parser.add_argument('--latency', action='append', metavar='SERVICE=SECONDS')
+    parser.add_argument('--jitter', action='append', metavar='SERVICE=SECONDS')
+    parser.add_argument('--fail', action='append', metavar='SERVICE=RATE')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='Show what the handlers print')
+    parser.add_argument('--result-cache', action='store_true', help='Keep the result cache on (off by default)')
+    parser.add_argument('--json', action='store_true', help='Print the rows as JSON')
+    args = parser.parse_args(argv)
+
+    specs = handler_specs
+    if args.handlers:
+        names = args.handlers.split(',')
+        unknown = set(names) - {spec.name for spec in handler_specs}
+        if unknown:
+            raise SystemExit(f"Unknown handlers: {sorted(unknown)}")
+        specs = [spec for spec in handler_specs if spec.name in names]
+
+    latency, jitter = _service_values(args.latency, '--latency'), _service_values(args.jitter, '--jitter')
+    failure_rate = _service_values(args.fail, '--fail')
+    faults = {service: Faults(latency.get(service, 0.0), jitter.get(service, 0.0), failure_rate.get(service, 0.0),
+                              seed=args.seed + i) for i, service in enumerate(services)}
+
+    rows = run(specs, args.warm, faults, args.verbose, args.result_cache)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        _print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
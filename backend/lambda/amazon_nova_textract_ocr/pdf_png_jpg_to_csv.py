@@ -1,37 +1,77 @@
-import boto3
+'''
+Extract the statement fields from a filtered Textract CSV with Nova Pro.
+
+Triggered by S3 events on output/. Only output/filtered_<name>.csv is acted on (the raw CSV, completion
+manifests and outputs of this Lambda are ignored), and an idempotency record per document version
+(idempotency/textract_nova/<name>/<sha256 of the CSV>.json, see common/idempotency.py) makes duplicate or
+repeated events for the same content skip: Nova runs once per document version.
+
+The records of one event are processed as a batch: CSVs are read and claimed concurrently, extractions
+run concurrently (NOVA_CONCURRENCY, BEDROCK_RATE), small statements can be packed several to a prompt
+answered with a JSON array (NOVA_PACK_DOCUMENTS), every result is validated against expected_fields
+(a packed result that does not validate is extracted again on its own) and the outputs are written in
+a parallel upload step. Each invocation logs a nova_batch line with its record throughput.
+
+Before Nova Pro, common/pre_extract.py reads the fields off the raw Textract lines (output/raw_<name>.csv)
+with rules and regexes. Confident values are kept, Nova Pro is asked only for the fields still missing,
+and a document whose four fields are all found skips Bedrock entirely (skip_rate in the nova_batch line).
+
+Environment Variables:
+    NOVA_CONCURRENCY : int, Nova Pro requests in flight at the same time (default 4)
+    BEDROCK_RATE : float, Nova Pro requests started per second, 0 for no limit (default 5)
+    NOVA_PACK_DOCUMENTS : int, statements per prompt, 1 disables packing (default 1)
+    NOVA_PACK_MAX_CHARS : int, only statements up to this size are packed (default 4000)
+    PRE_EXTRACT : string, "on" or "off", rule based pre-extraction (default on)
+    PRE_EXTRACT_MIN_CONFIDENCE : float, pre-extracted values at or above it skip the model (default 0.8)
+'''
+
 import csv
 import json
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from urllib.parse import unquote_plus
 
+from common.artifacts import put_artifact, read_artifact
+from common.aws_clients import get_client
+from common.idempotency import claim, finish, record_key
+from common.pre_extract import confident_fields, extract_fields, min_confidence
+from common.rate_limit import RateLimiter
+from common.result_cache import ResultCache, hash_bytes, log_cache_result
+
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Initialize AWS clients
-s3_client = boto3.client('s3')
-bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
+s3_client = get_client('s3')
+bedrock_client = get_client('bedrock-runtime', region_name='us-east-1')
 
 # Configuration
 input_bucket = 'output-internal-cld'  # Input S3 bucket
 output_bucket = 'processed-output-cld'  # Output S3 bucket
 input_folder = 'output/'  # Input folder
+ready_prefix = input_folder + 'filtered_'  # The Textract Lambda writes the filtered CSV once it is final
+idempotency_prefix = 'idempotency/'  # In the output bucket, outside the folder that triggers this Lambda
+nova_concurrency = int(os.environ.get('NOVA_CONCURRENCY', 4))
+bedrock_rate = float(os.environ.get('BEDROCK_RATE', 5))
+pack_documents = int(os.environ.get('NOVA_PACK_DOCUMENTS', 1))
+pack_max_chars = int(os.environ.get('NOVA_PACK_MAX_CHARS', 4000))
+pre_extract_enabled = os.environ.get('PRE_EXTRACT', 'on').lower() == 'on'
+expected_fields = ['client_balance', 'statement_issue_date', 'client_name', 'bank_name']
+# Field -> (description in prompts, placeholder in the output format)
+field_prompts = {
+    'client_balance': ('client balance', '<ending_balance>'),
+    'statement_issue_date': ('statement issue date', '<date>'),
+    'client_name': ('client name', '<name>'),
+    'bank_name': ('bank name', '<bank_name>'),
+}
 
-def read_csv_from_s3(bucket, key):
-    logger.info(f"Reading CSV from S3: bucket={bucket}, key={key}")
-    response = s3_client.get_object(Bucket=bucket, Key=key)
-    content = response['Body'].read().decode('utf-8')
-    return content
-
-def parse_csv(content):
-    csv_file = StringIO(content)
-    reader = csv.reader(csv_file)
-    data = [row for row in reader]
-    return data
-
-def extract_info_with_nova_pro(csv_content):
-    prompt = f"""
+# Nova Pro extraction, part of the result cache key: changing any of these invalidates cached results
+extraction_model_id = 'us.amazon.nova-pro-v1:0'
+extraction_prompt = """
     Analyze the following CSV content and extract the client balance, statement issue date, client name, and bank name. Return the extracted information in JSON format, with no additional text or markdown markers (e.g., ```json).
 
     CSV Content:
@@ -45,50 +85,159 @@ def extract_info_with_nova_pro(csv_content):
       "bank_name": "<bank_name>"
     }}
     """
+packed_prompt = """
+    Analyze the following {count} bank statements, each given as CSV content between <statement id="N"> and </statement>. For each statement extract the client balance, statement issue date, client name, and bank name. Return a JSON array with exactly one object per statement, in the same order, with no additional text or markdown markers (e.g., ```json).
+
+    {statements}
+
+    Desired Output Format:
+    [
+      {{
+        "id": <N>,
+        "client_balance": "<ending_balance>",
+        "statement_issue_date": "<date>",
+        "client_name": "<name>",
+        "bank_name": "<bank_name>"
+      }}
+    ]
+    """
+partial_prompt = """
+    Analyze the following CSV content and extract only the {field_names}. Return the extracted information in JSON format with exactly the keys below, with no additional text or markdown markers (e.g., ```json).
+
+    CSV Content:
+    {csv_content}
+
+    Desired Output Format:
+    {output_format}
+    """
+extraction_inference_config = {
+    "maxTokens": 512,
+    "temperature": 0.5,
+    "topP": 0.9
+}
+result_cache = ResultCache(s3_client, output_bucket, 'textract_nova', {
+    'model': extraction_model_id, 'prompt': extraction_prompt, 'packed_prompt': packed_prompt,
+    'partial_prompt': partial_prompt, 'inference': extraction_inference_config,
+    'pre_extract': {'enabled': pre_extract_enabled, 'min_confidence': min_confidence, 'version': 3}
+})
+# One limiter per container, shared by all worker threads
+bedrock_limiter = RateLimiter(bedrock_rate)
+
+def read_csv_from_s3(bucket, key):
+    logger.info(f"Reading CSV from S3: bucket={bucket}, key={key}")
+    content = read_artifact(s3_client, bucket, key).decode('utf-8')
+    return content
+
+def parse_csv(content):
+    csv_file = StringIO(content)
+    reader = csv.reader(csv_file)
+    data = [row for row in reader]
+    return data
+
+def statement_text(csv_content):
+    # CSV rows as plain comma joined lines, the form Nova Pro is prompted with
+    return '\n'.join([','.join(row) for row in parse_csv(csv_content)])
+
+def invoke_nova_pro(prompt, inference_config):
+    # One Nova Pro request, returns the response text
+    bedrock_limiter.acquire()
+    response = bedrock_client.invoke_model(
+        modelId=extraction_model_id,
+        body=json.dumps({
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"text": prompt}]
+                }
+            ],
+            "inferenceConfig": inference_config
+        }),
+        contentType='application/json',
+        accept='application/json'
+    )
+
+    # Parse response body
+    response_body = json.loads(response['body'].read().decode('utf-8'))
+    logger.info(f"Bedrock response: {json.dumps(response_body, indent=2)}")
+
+    # Extract content from response
+    if 'output' in response_body and 'message' in response_body['output'] and 'content' in response_body['output']['message']:
+        content = response_body['output']['message']['content'][0].get('text', '')
+        if content:
+            return content
+        raise ValueError("Empty response text from model")
+    raise ValueError(f"Unexpected Bedrock response structure: {json.dumps(response_body, indent=2)}")
+
+def extract_info_with_nova_pro(csv_content):
+    prompt = extraction_prompt.format(csv_content=csv_content)
     
     try:
-        response = bedrock_client.invoke_model(
-            modelId='us.amazon.nova-pro-v1:0',
-            body=json.dumps({
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [{"text": prompt}]
-                    }
-                ],
-                "inferenceConfig": {
-                    "maxTokens": 512,
-                    "temperature": 0.5,
-                    "topP": 0.9
-                }
-            }),
-            contentType='application/json',
-            accept='application/json'
-        )
-        
-        # Parse response body
-        response_body = json.loads(response['body'].read().decode('utf-8'))
-        logger.info(f"Bedrock response: {json.dumps(response_body, indent=2)}")
-        
-        # Extract content from response
-        if 'output' in response_body and 'message' in response_body['output'] and 'content' in response_body['output']['message']:
-            content = response_body['output']['message']['content'][0].get('text', '')
-            if content:
-                # Parse the JSON content directly (prompt ensures no ```json markers)
-                return json.loads(content)
-            else:
-                raise ValueError("Empty response text from model")
-        else:
-            raise ValueError(f"Unexpected Bedrock response structure: {json.dumps(response_body, indent=2)}")
-            
+        # Parse the JSON content directly (prompt ensures no ```json markers)
+        return json.loads(invoke_nova_pro(prompt, extraction_inference_config))
+    except Exception as e:
+        logger.error(f"Error invoking Bedrock: {str(e)}")
+        raise
+
+def extract_missing_with_nova_pro(csv_content, fields):
+    # Ask only for the fields the pre-extraction did not settle
+    prompt = partial_prompt.format(
+        field_names=', '.join(field_prompts[field][0] for field in fields), csv_content=csv_content,
+        output_format=json.dumps({field: field_prompts[field][1] for field in fields}, indent=2))
+    try:
+        answer = json.loads(invoke_nova_pro(prompt, extraction_inference_config))
     except Exception as e:
         logger.error(f"Error invoking Bedrock: {str(e)}")
         raise
+    return {field: answer[field] for field in fields if field in answer} if isinstance(answer, dict) else {}
 
-def write_csv_to_s3(data, bucket, key):
+def extract_packed_with_nova_pro(statements):
+    """
+    Extract several statements with one prompt.
+
+    :param statements: List of statement texts
+    :return: One result per statement, in order, None where the answer has no object for it
+    """
+    statements_text = '\n'.join(f'<statement id="{i}">\n{text}\n</statement>' for i, text in enumerate(statements, 1))
+    prompt = packed_prompt.format(count=len(statements), statements=statements_text)
+    # Each statement needs its own share of the completion
+    inference_config = {**extraction_inference_config,
+                        'maxTokens': min(extraction_inference_config['maxTokens'] * len(statements), 5000)}
+    try:
+        answer = json.loads(invoke_nova_pro(prompt, inference_config))
+    except Exception as e:
+        logger.error(f"Error invoking Bedrock for {len(statements)} packed statements: {str(e)}")
+        raise
+    if not isinstance(answer, list):
+        return [None] * len(statements)
+    # Match the objects by id, by position when the model left the ids out
+    by_id = {item.get('id'): item for item in answer if isinstance(item, dict)}
+    if len(by_id) != len(answer) or None in by_id:
+        by_id = {i: item for i, item in enumerate(answer, 1) if isinstance(item, dict)}
+    return [by_id.get(i) for i in range(1, len(statements) + 1)]
+
+def is_valid(data):
+    return isinstance(data, dict) and all(field in data for field in expected_fields)
+
+def pre_extract(bucket, key, csv_content):
+    """
+    Rule based extraction over the raw Textract lines of the document, the filtered CSV when there is none.
+
+    :return: field -> value for the confidently extracted fields
+    """
+    raw_key = key.replace(ready_prefix, input_folder + 'raw_', 1)
+    try:
+        rows = parse_csv(read_csv_from_s3(bucket, raw_key))
+    except s3_client.exceptions.NoSuchKey:
+        rows = parse_csv(csv_content)
+    # Skip the header row ('Extracted Text' / 'Filtered Transaction')
+    fields = extract_fields([','.join(row) for row in rows[1:]])
+    logger.info(json.dumps({'metric': 'pre_extract', 'source': key,
+                            'fields': {field: found['confidence'] for field, found in fields.items()}}))
+    return confident_fields(fields)
+
+def write_csv_to_s3(data, bucket, key, extraction='nova'):
     try:
         # Validate expected fields
-        expected_fields = ['client_balance', 'statement_issue_date', 'client_name', 'bank_name']
         if not all(field in data for field in expected_fields):
             raise ValueError(f"Missing required fields in data: {json.dumps(data)}")
         
@@ -97,52 +246,189 @@ def write_csv_to_s3(data, bucket, key):
         writer.writeheader()
         writer.writerow(data)
         
-        s3_client.put_object(
-            Bucket=bucket,
-            Key=key,
-            Body=csv_buffer.getvalue()
-        )
+        put_artifact(s3_client, bucket, key, csv_buffer.getvalue(), content_type='text/csv',
+                     Metadata={'result-cache': 'miss', 'extraction': extraction})
         logger.info(f"Successfully wrote CSV to S3: bucket={bucket}, key={key}")
     except Exception as e:
         logger.error(f"Error writing to S3: {str(e)}")
         raise
 
-def lambda_handler(event, context):
+def is_ready(key):
+    # Readiness rule: one trigger per document, on its final filtered CSV
+    return key.startswith(ready_prefix) and key.endswith('.csv') and not key.endswith('_processed.csv')
+
+def prepare(record):
+    """
+    Gate one event record: readiness rule, idempotency claim and result cache lookup.
+
+    :return: Job dict, status 'ignored', 'duplicate', 'hit' (output restored), 'pending' (to extract) or 'failed'
+    """
+    bucket = record['s3']['bucket']['name']
+    key = unquote_plus(record['s3']['object']['key'])
+    job = {'key': key, 'status': 'pending', 'cache': None, 'result': None, 'error': None, 'etag': None,
+           'extraction': None}
+
+    # Process only the filtered CSVs in the output/ folder
+    if not is_ready(key):
+        logger.info(f"Skipping file: {key}")
+        job['status'] = 'ignored'
+        return job
+
     try:
-        for record in event['Records']:
-            bucket = record['s3']['bucket']['name']
-            key = unquote_plus(record['s3']['object']['key'])
-            
-            # Process only files in the output/ folder
-            if not key.startswith(input_folder) or not key.endswith('.csv'):
-                logger.info(f"Skipping file: {key}")
-                continue
-                
-            # Read CSV from S3
-            csv_content = read_csv_from_s3(bucket, key)
-            
-            # Parse CSV
-            csv_data = parse_csv(csv_content)
-            
-            # Convert CSV data to string for Nova Pro
-            csv_str = '\n'.join([','.join(row) for row in csv_data])
-            
-            # Extract information using Nova Pro
-            extracted_info = extract_info_with_nova_pro(csv_str)
-            
-            # Generate output key
-            output_key = key.replace('.csv', '_processed.csv')
-            
+        # Read CSV from S3
+        csv_content = read_csv_from_s3(bucket, key)
+        job['content_hash'] = hash_bytes(csv_content.encode('utf-8'))
+        job['output_key'] = key.replace('.csv', '_processed.csv')
+
+        # One run per document version: the first trigger claims it, repeats and concurrent duplicates skip
+        job['claim_key'] = record_key(idempotency_prefix, 'textract_nova', key, job['content_hash'])
+        job['etag'], job['claim_record'] = claim(s3_client, output_bucket, job['claim_key'], key=key,
+                                                 content_hash=job['content_hash'])
+        if job['etag'] is None:
+            logger.info(f"Skipping duplicate trigger for {key}, already {job['claim_record'].get('status')}")
+            job['status'] = 'duplicate'
+            return job
+
+        # Same CSV content, model and prompt give the same extraction
+        manifest = result_cache.lookup(job['content_hash'])
+        if manifest is not None:
+            result_cache.restore(manifest, {'processed': (output_bucket, job['output_key'])})
+            log_cache_result('textract_nova', 'hit', job['content_hash'], source=key)
+            job['status'], job['cache'] = 'hit', 'hit'
+            return job
+
+        # Convert CSV data to string for Nova Pro
+        job['statement'] = statement_text(csv_content)
+
+        # Fields read off standard layouts need no model, Nova Pro only fills in the rest
+        job['pre_extracted'] = pre_extract(bucket, key, csv_content) if pre_extract_enabled else {}
+        job['missing'] = [field for field in expected_fields if field not in job['pre_extracted']]
+        if not job['missing']:
+            job['result'], job['extraction'] = dict(job['pre_extracted']), 'rules'
+        else:
+            job['extraction'] = 'rules+nova' if job['pre_extracted'] else 'nova'
+    except Exception as e:
+        logger.error(f"Error preparing {key}: {str(e)}")
+        job['status'], job['error'] = 'failed', str(e)
+    return job
+
+def pack_jobs(jobs):
+    # Small statements share a prompt, up to pack_documents at a time, larger ones go alone
+    packs, small = [], []
+    for job in jobs:
+        if pack_documents > 1 and len(job['statement']) <= pack_max_chars:
+            small.append(job)
+            if len(small) == pack_documents:
+                packs.append(small)
+                small = []
+        else:
+            packs.append([job])
+    if small:
+        packs.append(small)
+    return packs
+
+def extract_pack(pack):
+    """
+    Extract a pack of jobs, a packed result that does not validate is extracted again on its own.
+
+    :return: Number of Nova Pro requests made
+    """
+    requests, retry = 0, pack
+    if len(pack) > 1:
+        requests += 1
+        try:
+            results = extract_packed_with_nova_pro([job['statement'] for job in pack])
+        except Exception:
+            results = [None] * len(pack)
+        retry = []
+        for job, result in zip(pack, results):
+            if is_valid(result):
+                # Confident pre-extracted values take precedence over the model's
+                job['result'] = {**{field: result[field] for field in expected_fields}, **job['pre_extracted']}
+            else:
+                retry.append(job)
+    for job in retry:
+        requests += 1
+        try:
+            # Extract information using Nova Pro, only the missing fields when some were pre-extracted
+            if job['pre_extracted']:
+                result = {**extract_missing_with_nova_pro(job['statement'], job['missing']), **job['pre_extracted']}
+            else:
+                result = extract_info_with_nova_pro(job['statement'])
+            if not is_valid(result):
+                raise ValueError(f"Missing required fields in data: {json.dumps(result)}")
+            job['result'] = {field: result[field] for field in expected_fields}
+        except Exception as e:
+            job['status'], job['error'] = 'failed', str(e)
+    return requests
+
+def store(job):
+    # Upload step: write the output and cache it, then settle the idempotency claim
+    if job['status'] == 'pending':
+        try:
             # Write new CSV to output bucket
-            write_csv_to_s3(extracted_info, output_bucket, output_key)
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Processed successfully')
-        }
+            write_csv_to_s3(job['result'], output_bucket, job['output_key'], job['extraction'])
+            result_cache.save(job['content_hash'], {'processed': (output_bucket, job['output_key'])}, source=job['key'],
+                              extraction=job['extraction'])
+            log_cache_result('textract_nova', 'miss', job['content_hash'], source=job['key'])
+            job['status'], job['cache'] = 'completed', 'miss'
+        except Exception as e:
+            job['status'], job['error'] = 'failed', str(e)
+    if job['etag'] is None:
+        return
+    try:
+        if job['status'] == 'failed':
+            # Release the claim so the retry of this event can run
+            settled = finish(s3_client, output_bucket, job['claim_key'], job['etag'], job['claim_record'], 'failed',
+                             error=job['error'])
+        else:
+            settled = finish(s3_client, output_bucket, job['claim_key'], job['etag'], job['claim_record'], 'completed')
+        if not settled:
+            logger.warning(f"Claim {job['claim_key']} was taken over by another run")
+    except Exception as e:
+        # The claim stays in_progress until it times out, this record fails on its own
+        logger.error(f"Could not settle claim {job['claim_key']}: {str(e)}")
+        job['status'], job['error'] = 'failed', job['error'] or f'Claim update failed: {str(e)}'
+
+def lambda_handler(event, context):
+    start = time.perf_counter()
+    records = event.get('Records', [])
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, nova_concurrency)) as executor:
+            jobs = list(executor.map(prepare, records))
+            packs = pack_jobs([job for job in jobs if job['status'] == 'pending' and job['result'] is None])
+            requests = sum(executor.map(extract_pack, packs))
+            list(executor.map(store, [job for job in jobs if job['status'] not in ('ignored', 'duplicate')]))
     except Exception as e:
         logger.error(f"Lambda error: {str(e)}")
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error: {str(e)}')
         }
+
+    statuses = [job['status'] for job in jobs]
+    cache_results = {'hit': statuses.count('hit'), 'miss': statuses.count('completed')}
+    triggers = {'processed': statuses.count('hit') + statuses.count('completed'), 'ignored': statuses.count('ignored'),
+                'duplicate': statuses.count('duplicate'), 'failed': statuses.count('failed')}
+    seconds = time.perf_counter() - start
+    # Share of the documents needing an extraction that never went to Bedrock
+    extracted = [job['extraction'] for job in jobs if job['extraction'] is not None]
+    skipped = extracted.count('rules')
+    logger.info(json.dumps({'metric': 'nova_batch', 'records': len(records), **triggers, 'cache_hits': cache_results['hit'],
+                            'bedrock_skipped': skipped,
+                            'skip_rate': round(skipped / len(extracted), 3) if extracted else None,
+                            'nova_requests': requests, 'packed_prompts': sum(len(pack) > 1 for pack in packs),
+                            'seconds': round(seconds, 3),
+                            'records_per_s': round(len(records) / seconds, 2) if seconds > 0 else None}))
+
+    attempted = triggers['processed'] + triggers['failed']
+    return {
+        'statusCode': 200 if not triggers['failed'] else 207 if triggers['failed'] < attempted else 500,
+        'body': json.dumps({'results': [{k: job[k] for k in ('key', 'status', 'cache', 'error') if job[k] is not None}
+                                        for job in jobs]} if triggers['failed'] else 'Processed successfully'),
+        'cache': cache_results,
+        'triggers': triggers,
+        'nova_requests': requests,
+        'bedrock_skipped': skipped,
+        'seconds': round(seconds, 3)
+    }
@@ -5,25 +5,43 @@ Parameters:
     
     Parameters for event json:
     INPUT_TEXT : string, a consolidated result from textract, transcribe, web-scraping, street-view extraction, and internal database
+    INPUT_MANIFEST : dict, {"bucket": ..., "key": ...} of an evidence manifest (see common/evidence.py), used instead
+                     of INPUT_TEXT for inputs too large to send inline. The evidence is fetched from S3 by the function
     *sample json input : {
                             "INPUT_TEXT" : "{'CU Number':{'4':123456704},'Name':{'4':'Jamie Dimon'},'Age':{'4':68},'Position':{'4':'CEO'}"
                          }
+                         {
+                            "INPUT_MANIFEST" : {"bucket": "sowreport", "key": "manifests/123456704_1754539676.json"}
+                         }
 
 Returns:
     statusCode : integer, status code
     narratives : string, narratives result 
 '''
 
-import boto3, json
+import json
+
+from common.artifacts import read_artifact
+from common.aws_clients import get_client
+from common.evidence import resolve_manifest
+
+def read_input_text(event):
+    # Inline text, or the evidence manifest resolved from S3
+    if 'INPUT_MANIFEST' in event:
+        s3 = get_client('s3')
+        manifest_ref = event['INPUT_MANIFEST']
+        manifest = json.loads(read_artifact(s3, manifest_ref['bucket'], manifest_ref['key']))
+        return resolve_manifest(s3, manifest)
+    return str(event['INPUT_TEXT'])
 
 def lambda_handler(event, context):
     try:
-        input_text = str(event['INPUT_TEXT'])
+        input_text = read_input_text(event)
         # input_text = """
         # Elon Musk is a South African-born entrepreneur and business magnate best known for his ambitious ventures in technology and innovation. After co-founding Zip2 (a web software company sold to Compaq for $307 million in 1999) and X.com (which became PayPal after a merger, later acquired by eBay for $1.5 billion), Musk shifted focus to transformative industries. In 2002, he founded SpaceX with the goal of reducing space travel costs and enabling Mars colonization, achieving milestones like reusable rockets. He joined Tesla Motors (now Tesla, Inc.) in 2004, revolutionizing electric vehicles as CEO while promoting sustainable energy. Musk has since launched Neuralink (brain-computer interfaces), The Boring Company (tunnel infrastructure), and played a key role in OpenAI's early development. His career reflects a consistent focus on disruptive technologies addressing global challenges.
         # """
         
-        bedrock = boto3.client(service_name='bedrock-runtime')
+        bedrock = get_client('bedrock-runtime')
         
         # Titan-validated schema with political context
         body = json.dumps({
@@ -1,52 +1,103 @@
-import boto3
+'''
+Environment Variables:
+    TEXTRACT_MODE : string, "sync" (detect_document_text, single page), "async" (start/get document text
+                    detection, multi-page) or "auto" (async for pdf/tif/tiff, sync otherwise) (default auto)
+    DOCUMENT_CONCURRENCY : int, documents of one S3 notification processed at the same time (default 4)
+    BEDROCK_CONCURRENCY : int, text chunks filtered by Bedrock at the same time (default 4)
+    BEDROCK_RATE : float, Bedrock requests started per second across all workers, 0 for no limit (default 0)
+    CHUNK_TOKENS : int, estimated input tokens of OCR text per Bedrock request (default 3000)
+    CHUNK_OVERLAP_LINES : int, lines repeated between consecutive chunks of a page (default 2)
+    COMPACTION : string, "on" or "off", layout-aware compaction of the prompt text (default on)
+'''
+
 import csv
 import io
 import json
+import os
+import time
 import urllib.parse
 
-def lambda_handler(event, context):
-    # Initialize AWS clients
-    textract = boto3.client('textract')
-    s3 = boto3.client('s3')
-    bedrock = boto3.client('bedrock-runtime')
-
-    # Specify input and output buckets
-    input_bucket = 'doc-input-external'  # Replace with your input bucket
-    output_bucket = 'output-internal-cld'  # Replace with your output bucket
-    document = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'])
-    # document = '/bank statement.png'
-    raw_csv_key = f'output/raw_{document.split("/")[-1].split(".")[0]}.csv'
-    # raw_csv_key = f'output/raw_bank statement.csv'
-    filtered_csv_key = f'output/filtered_{document.split("/")[-1].split(".")[0]}.csv'
-    # filtered_csv_key = f'output/filtered_bank statement.csv'
-    # ttt = s3.list_objects_v2(Bucket=input_bucket)
-    # for s3_file in ttt.keys():
-    #     print(s3_file)
+from concurrent.futures import ThreadPoolExecutor
+from common.artifacts import put_artifact
+from common.aws_clients import get_client
+from common.chunking import chunk_lines, estimate_tokens, merge_lines, shared_lines
+from common.compaction import PageCompactor, line_records
+from common.rate_limit import RateLimiter
+from common.result_cache import ResultCache, hash_object, log_cache_result
+from common.textract_status import output_keys, write_status
 
-    # Extract text using Textract OCR
+textract_mode = os.environ.get('TEXTRACT_MODE', 'auto')
+document_concurrency = int(os.environ.get('DOCUMENT_CONCURRENCY', 4))
+bedrock_concurrency = int(os.environ.get('BEDROCK_CONCURRENCY', 4))
+bedrock_rate = float(os.environ.get('BEDROCK_RATE', 0))
+# 3000 input tokens + the prompt + maxTokenCount 2000 stays well inside Titan Text Express's 8k context
+chunk_tokens = int(os.environ.get('CHUNK_TOKENS', 3000))
+chunk_overlap_lines = int(os.environ.get('CHUNK_OVERLAP_LINES', 2))
+compaction_enabled = os.environ.get('COMPACTION', 'on').lower() == 'on'
+multi_page_extensions = ('pdf', 'tif', 'tiff')
+
+# Bedrock filtering, part of the result cache key: changing any of these invalidates cached results
+filter_model_id = 'amazon.titan-text-express-v1'
+filter_prompt = "You are a KYC document specialist. Given the following text, extract only the demographic and important information (e.g. balance, address, name, statement date, etc.) and return them as a concise list. Ignore account numbers, and other non-transaction details. Format the output as a list of strings. text: {text}"
+filter_generation_config = {
+    "maxTokenCount": 2000,
+    "temperature": 0.7,
+    "topP": 0.9
+}
+
+# One limiter per container, shared by all worker threads
+bedrock_limiter = RateLimiter(bedrock_rate)
+
+def use_async_mode(document):
+    if textract_mode == 'auto':
+        return document.rsplit('.', 1)[-1].lower() in multi_page_extensions
+    return textract_mode == 'async'
+
+def detect_lines(textract, bucket, document):
+    # Single page: one synchronous call, all LINE blocks with their geometry
     response = textract.detect_document_text(
-        Document={'S3Object': {'Bucket': input_bucket, 'Name': document}}
+        Document={'S3Object': {'Bucket': bucket, 'Name': document}}
     )
-    blocks = response['Blocks']
+    return line_records(response['Blocks'])
 
-    # Process text blocks
-    data = []
-    for block in blocks:
-        if block['BlockType'] == 'LINE':
-            data.append(block.get('Text', ''))
+def iter_async_pages(textract, bucket, document):
+    """
+    Run an asynchronous text detection job and yield (page_number, line records) as each page is complete,
+    while the remaining result pages are still being retrieved.
+    """
+    job_id = textract.start_document_text_detection(
+        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': document}}
+    )['JobId']
 
-    # Create raw CSV
-    raw_output = io.StringIO()
-    writer = csv.writer(raw_output)
-    writer.writerow(['Extracted Text'])
-    for line in data:
-        writer.writerow([line])
-    s3.put_object(
-        Bucket=output_bucket,
-        Key=raw_csv_key,
-        Body=raw_output.getvalue().encode('utf-8')
-    )
+    # Wait for the job with backoff
+    delay = 1.0
+    while True:
+        response = textract.get_document_text_detection(JobId=job_id, MaxResults=1000)
+        status = response['JobStatus']
+        if status != 'IN_PROGRESS':
+            break
+        time.sleep(delay)
+        delay = min(delay * 1.5, 5.0)
+    if status == 'FAILED':
+        raise RuntimeError(f"Textract job {job_id} failed: {response.get('StatusMessage')}")
 
+    # Blocks come in page order, a page is complete once a block of a later page shows up
+    page_number, lines = None, []
+    while True:
+        for line in line_records(response['Blocks']):
+            if page_number is not None and line['page'] != page_number:
+                yield page_number, lines
+                lines = []
+            page_number = line['page']
+            lines.append(line)
+        next_token = response.get('NextToken')
+        if not next_token:
+            break
+        response = textract.get_document_text_detection(JobId=job_id, MaxResults=1000, NextToken=next_token)
+    if page_number is not None:
+        yield page_number, lines
+
+def filter_lines_with_bedrock(bedrock, data):
     # Your custom Bedrock prompt
     # custom_prompt = f"You are a KYC document specialist. Given the following text, extract only the demographic and important information (e.g. balance, address, name, statement date, etc.) and return them as a concise list. Ignore account numbers, and other non-transaction details. Format the output as a list of strings. text: {text}"
     # Prepare text for Bedrock
@@ -66,18 +117,13 @@ def lambda_handler(event, context):
     #     })
     # )
     body = json.dumps({
-            "inputText": f"You are a KYC document specialist. Given the following text, extract only the demographic and important information (e.g. balance, address, name, statement date, etc.) and return them as a concise list. Ignore account numbers, and other non-transaction details. Format the output as a list of strings. text: {text_input}", 
+            "inputText": filter_prompt.format(text=text_input),
             #f"Summarize this statement: '{prompt}'. Provide a concise summary.",
-            "textGenerationConfig": {
-                "maxTokenCount": 2000,
-                "temperature": 0.7,
-                "topP": 0.9
-               
-            }
+            "textGenerationConfig": filter_generation_config
         })
     bedrock_response = bedrock.invoke_model(
         body=body,
-        modelId='amazon.titan-text-express-v1',
+        modelId=filter_model_id,
         accept='application/json',
         contentType='application/json'
     )
@@ -87,23 +133,179 @@ def lambda_handler(event, context):
         filtered_lines = json.loads(filtered_data) if filtered_data.startswith('[') else filtered_data.split('\n')
     except:
         filtered_lines = filtered_data.split('\n')
+    return filtered_lines
+
+def filter_chunk(bedrock, lines):
+    # Runs on a worker thread: wait for the rate limiter, then time the Bedrock call alone
+    waited = bedrock_limiter.acquire()
+    start = time.perf_counter()
+    filtered_lines = filter_lines_with_bedrock(bedrock, lines)
+    return filtered_lines, time.perf_counter() - start, waited
+
+def extract_and_filter(textract, bedrock, bucket, document):
+    """
+    Map-reduce over token-budgeted chunks: every page is compacted (COMPACTION, see common/compaction.py)
+    and split into windows of at most CHUNK_TOKENS, the windows are filtered by Bedrock concurrently
+    (BEDROCK_CONCURRENCY, BEDROCK_RATE) and the answers are merged in document order, without the lines
+    answered twice from the overlap of adjacent chunks.
+
+    :return: (all extracted lines, filtered lines) in page order
+    """
+    if use_async_mode(document):
+        # Multi-page: the chunks of a page are submitted as soon as Textract returns the page
+        pages_iter = iter_async_pages(textract, bucket, document)
+    else:
+        pages_iter = [(1, detect_lines(textract, bucket, document))]
+
+    pages, prompt_pages, futures, overlaps = {}, {}, {}, {}
+    compactor = PageCompactor()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=bedrock_concurrency) as executor:
+        for page_number, lines in pages_iter:
+            pages[page_number] = [line['text'] for line in lines]
+            # Prompts get the compacted page, the raw CSV keeps every line
+            prompt_pages[page_number] = compactor.compact_page(lines) if compaction_enabled else pages[page_number]
+            chunks = chunk_lines(prompt_pages[page_number], chunk_tokens, chunk_overlap_lines)
+            for index, chunk in enumerate(chunks):
+                overlaps[(page_number, index)] = shared_lines(chunks[index - 1], chunk, chunk_overlap_lines) if index else []
+                futures[(page_number, index)] = executor.submit(filter_chunk, bedrock, chunk)
+        results = {key: future.result() for key, future in futures.items()}
+    seconds = time.perf_counter() - start
+
+    data = [line for page_number in sorted(pages) for line in pages[page_number]]
+    chunk_answers = [results[key][0] for key in sorted(results)]
+    filtered_lines = merge_lines(chunk_answers, [overlaps[key] for key in sorted(results)])
+
+    # What compaction saved, and how chunk count and concurrency drive latency (wall time against the sum of
+    # the Bedrock calls)
+    chunk_seconds = [results[key][1] for key in results]
+    print(json.dumps({
+        'metric': 'bedrock_chunking', 'document': document, 'pages': len(pages), 'chunks': len(results),
+        'lines_before_compaction': len(data), 'rows_after_compaction': sum(len(rows) for rows in prompt_pages.values()),
+        'tokens_before_compaction': estimate_tokens("\n".join(data)),
+        'tokens_after_compaction': estimate_tokens("\n".join(row for rows in prompt_pages.values() for row in rows)),
+        'chunk_tokens': chunk_tokens,
+        'concurrency': bedrock_concurrency, 'rate': bedrock_rate, 'seconds': round(seconds, 3),
+        'bedrock_seconds_sum': round(sum(chunk_seconds), 3),
+        'bedrock_seconds_max': round(max(chunk_seconds, default=0), 3),
+        'rate_wait_seconds': round(sum(results[key][2] for key in results), 3),
+        'lines_before_merge': sum(len(answer) for answer in chunk_answers), 'lines_after_merge': len(filtered_lines)
+    }))
+    return data, filtered_lines
+
+# Specify input and output buckets
+input_bucket = 'doc-input-external'  # Replace with your input bucket
+output_bucket = 'output-internal-cld'  # Replace with your output bucket
+
+def process_record(textract, s3, bedrock, record):
+    """
+    Process the document of one S3 event record, failures are reported in the result instead of raised.
+
+    :return: {'document', 'status' ('completed' or 'failed'), 'seconds', 'filtered_key', 'cache' or 'error'}
+    """
+    document = urllib.parse.unquote_plus(record['s3']['object']['key'])
+    # document = '/bank statement.png'
+    raw_csv_key, filtered_csv_key = output_keys(document)
+    # raw_csv_key = f'output/raw_bank statement.csv'
+    # filtered_csv_key = f'output/filtered_bank statement.csv'
+    start = time.perf_counter()
+    source_etag = record['s3']['object'].get('eTag')
+
+    try:
+        # ETag of the uploaded document, the completion manifest is matched against it by the app
+        source_etag = source_etag or s3.head_object(Bucket=input_bucket, Key=document)['ETag']
+        cache_result = write_outputs(textract, s3, bedrock, input_bucket, output_bucket, document, raw_csv_key,
+                                     filtered_csv_key)
+        # Completion manifest, written once both CSVs exist, a failure to write it fails this document only
+        seconds = round(time.perf_counter() - start, 3)
+        write_status(s3, output_bucket, document, source_etag, 'completed', seconds=seconds, cache=cache_result)
+    except Exception as e:
+        print(f"Error processing {document}: {e}")
+        seconds = round(time.perf_counter() - start, 3)
+        # Tell the app right away instead of leaving it waiting for an output that will never come
+        try:
+            write_status(s3, output_bucket, document, source_etag, 'failed', seconds=seconds, error=str(e))
+        except Exception as status_error:
+            print(f"Error writing the failed status of {document}: {status_error}")
+        return {'document': document, 'status': 'failed', 'seconds': seconds, 'error': str(e)}
+
+    return {'document': document, 'status': 'completed', 'seconds': seconds, 'filtered_key': filtered_csv_key,
+            'cache': cache_result}
+
+def lambda_handler(event, context):
+    """
+    Process every record of the S3 notification, independent documents concurrently (DOCUMENT_CONCURRENCY).
+
+    :return: statusCode 200 when every document completed, 207 when some failed, 500 when all failed,
+             body: JSON summary with one result per record in event order
+    """
+    # Shared AWS clients, reused by warm invocations
+    textract = get_client('textract')
+    s3 = get_client('s3')
+    bedrock = get_client('bedrock-runtime')
+
+    records = event.get('Records', [])
+    # ttt = s3.list_objects_v2(Bucket=input_bucket)
+    # for s3_file in ttt.keys():
+    #     print(s3_file)
+    if len(records) == 1:
+        results = [process_record(textract, s3, bedrock, records[0])]
+    else:
+        # Each document filters its chunks on its own Bedrock pool, the shared rate limiter bounds the total
+        with ThreadPoolExecutor(max_workers=max(1, min(document_concurrency, len(records)))) as executor:
+            results = list(executor.map(lambda record: process_record(textract, s3, bedrock, record), records))
+
+    failed = sum(result['status'] == 'failed' for result in results)
+    summary = {'documents': len(results), 'completed': len(results) - failed, 'failed': failed, 'results': results}
+    print(json.dumps({'metric': 'textract_batch', **{k: v for k, v in summary.items() if k != 'results'}}))
+    return {
+        'statusCode': 200 if not failed else 207 if failed < len(results) else 500,
+        'body': json.dumps(summary)
+    }
+
+def write_outputs(textract, s3, bedrock, input_bucket, output_bucket, document, raw_csv_key, filtered_csv_key):
+    """
+    Write the raw and filtered CSVs, from the result cache when the same document was processed before.
+
+    :return: 'hit' or 'miss'
+    """
+    # Same document bytes, model, prompt and mode give the same outputs
+    content_hash = hash_object(s3, input_bucket, document)
+    cache = ResultCache(s3, output_bucket, 'textract_titan', {
+        'model': filter_model_id, 'prompt': filter_prompt, 'generation': filter_generation_config,
+        'mode': 'async' if use_async_mode(document) else 'sync',
+        'chunk_tokens': chunk_tokens, 'chunk_overlap_lines': chunk_overlap_lines, 'compaction': compaction_enabled
+    })
+    outputs = {'raw': (output_bucket, raw_csv_key), 'filtered': (output_bucket, filtered_csv_key)}
+    manifest = cache.lookup(content_hash)
+    if manifest is not None:
+        cache.restore(manifest, outputs)
+        log_cache_result('textract_titan', 'hit', content_hash, document=document)
+        return 'hit'
+
+    # Extract text using Textract OCR and filter it with Bedrock
+    data, filtered_lines = extract_and_filter(textract, bedrock, input_bucket, document)
+
+    # Create raw CSV
+    raw_output = io.StringIO()
+    writer = csv.writer(raw_output)
+    writer.writerow(['Extracted Text'])
+    for line in data:
+        writer.writerow([line])
+    put_artifact(s3, output_bucket, raw_csv_key, raw_output.getvalue(), content_type='text/csv',
+                 Metadata={'result-cache': 'miss'})
 
     # Create filtered CSV
     filtered_output = io.StringIO()
     writer = csv.writer(filtered_output)
     writer.writerow(['Filtered Transaction'])
     for line in filtered_lines:
-        if line.strip():
-            writer.writerow([line.strip()])
+        writer.writerow([line])
 
     # Upload filtered CSV to S3
-    s3.put_object(
-        Bucket=output_bucket,
-        Key=filtered_csv_key,
-        Body=filtered_output.getvalue().encode('utf-8')
-    )
+    put_artifact(s3, output_bucket, filtered_csv_key, filtered_output.getvalue(), content_type='text/csv',
+                 Metadata={'result-cache': 'miss'})
 
-    return {
-        'statusCode': 200,
-        'body': json.dumps(f'Filtered CSV uploaded to s3://{output_bucket}/{filtered_csv_key}')
-    }
+    cache.save(content_hash, outputs, document=document)
+    log_cache_result('textract_titan', 'miss', content_hash, document=document)
+    return 'miss'
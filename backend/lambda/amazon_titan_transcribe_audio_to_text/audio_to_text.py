@@ -8,16 +8,18 @@ Returns:
     body : .json, text result transcribed from audio
 '''
 
-import boto3
 import time
 import json
 import urllib.request
 import re
 
+from common.artifacts import put_artifact
+from common.aws_clients import get_client
+
 # Initialize AWS clients
-transcribe_client = boto3.client('transcribe')
-bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')  # Adjust region as needed
-s3_client = boto3.client('s3')
+transcribe_client = get_client('transcribe')
+bedrock_client = get_client('bedrock-runtime', region_name='us-east-1')  # Adjust region as needed
+s3_client = get_client('s3')
 
 def lambda_handler(event, context):
     # Configuration
@@ -126,11 +128,8 @@ Text: {transcript_text}
 
         # Step 3: Save extracted data to S3
         output_file = f'output/extracted_data_{job_name}.json'
-        s3_client.put_object(
-            Bucket=bucket_name,
-            Key=output_file,
-            Body=json.dumps(extracted_data, indent=2)
-        )
+        put_artifact(s3_client, bucket_name, output_file, json.dumps(extracted_data, separators=(',', ':')),
+                     content_type='application/json')
         print(f"Extracted data saved to s3://{bucket_name}/{output_file}")
 
         # Return success response
@@ -36,13 +36,15 @@ import os
 from botocore.exceptions import ClientError
 from bs4 import BeautifulSoup
 import json
-import boto3
 import logging
 import time
 import re
 import urllib.parse
 import requests
 
+from common.artifacts import put_artifact
+from common.aws_clients import get_client
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
@@ -148,7 +150,7 @@ def validate_credentials(api_key, cse_id):
 def select_top_urls_with_bedrock(search_results, customer_name, employer, location, occupation):
     """Use Bedrock (Amazon Titan) to select top 5 URLs based on prioritization rules."""
     try:
-        bedrock_client = boto3.client('bedrock-runtime', region_name='us-east-1')
+        bedrock_client = get_client('bedrock-runtime', region_name='us-east-1')
         prompt = f"""
 You are a KYC analyst selecting the top 5 most relevant URLs for due diligence on {customer_name}, employed by {employer} in {location} ({occupation} occupation). 
 Prioritize URLs in this order:
@@ -253,7 +255,7 @@ def rule_based_url_selection(search_results, customer_name, employer):
 def lambda_handler(event, context):
     try:
         # Initialize S3 client
-        s3_client = boto3.client('s3')
+        s3_client = get_client('s3')
 
         # Initialize bucket name
         bucket_name = os.environ.get("FUNC_S3_BUCKET")
@@ -330,7 +332,7 @@ def lambda_handler(event, context):
         # bucket_name = 'externaldataprocess'
 
         # Fetch Google API credentials
-        secrets_client = boto3.client('secretsmanager')
+        secrets_client = get_client('secretsmanager')
         try:
             # secret = secrets_client.get_secret_value(SecretId='google-search-credentials')
             # credentials = json.loads(secret['SecretString'])
@@ -373,16 +375,18 @@ def lambda_handler(event, context):
         # Store results in S3
         s3_key = f'suggestions/{customer_name}_{int(time.time())}.json'
         try:
-            s3_client.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=json.dumps({
+            put_artifact(
+                s3_client,
+                bucket_name,
+                s3_key,
+                json.dumps({
                     'customer_name': customer_name,
                     'employer': employer,
                     'location': location,
                     'occupation': occupation,
                     'url_statements': url_statements
-                })
+                }),
+                content_type='application/json'
             )
         except ClientError as e:
             logger.error(f"Failed to write to S3: {e.response['Error']['Code']} - {e.response['Error']['Message']}")
@@ -0,0 +1,77 @@
+'''
+Compressed storage of intermediate artifacts (CSVs, JSON, HTML) shared by the Lambdas and the kyc-app.
+
+Payloads are stored gzip (or zstd) compressed with the S3 Content-Encoding set accordingly, and
+decoded transparently on read. Objects without a Content-Encoding are returned as they are, so
+existing uncompressed artifacts keep working.
+
+Environment Variables:
+    ARTIFACT_ENCODING : string, "gzip", "zstd" or "identity" (default gzip)
+    ARTIFACT_MIN_BYTES : int, payloads smaller than this are stored uncompressed (default 1024)
+'''
+
+import gzip
+import io
+import os
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+default_encoding = os.environ.get('ARTIFACT_ENCODING', 'gzip')
+min_bytes = int(os.environ.get('ARTIFACT_MIN_BYTES', 1024))
+
+
+def encode_payload(data, encoding: str = None) -> tuple:
+    """
+    Compress a str/bytes payload.
+
+    :return: (payload bytes, content encoding or None when stored uncompressed)
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    encoding = encoding or default_encoding
+    if encoding == 'identity' or len(data) < min_bytes:
+        return data, None
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6), 'gzip'
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstd artifact encoding requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(data), 'zstd'
+    raise ValueError(f"Unsupported artifact encoding: {encoding}")
+
+
+def open_body(response: dict):
+    # File-like over the decoded body of an s3.get_object response, decompressing as it streams
+    body, encoding = response['Body'], response.get('ContentEncoding')
+    if not encoding or encoding == 'identity':
+        return body
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=body, mode='rb')
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise ImportError("Reading a zstd artifact requires the zstandard package")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(body))
+    raise ValueError(f"Unsupported artifact encoding: {encoding}")
+
+
+def read_body(response: dict) -> bytes:
+    return open_body(response).read()
+
+
+def put_artifact(s3, bucket_name: str, object_key: str, data, content_type: str = None,
+                 encoding: str = None, **kwargs) -> dict:
+    # Drop-in for s3.put_object(Bucket, Key, Body) on text artifacts
+    payload, content_encoding = encode_payload(data, encoding)
+    if content_encoding:
+        kwargs['ContentEncoding'] = content_encoding
+    if content_type:
+        kwargs['ContentType'] = content_type
+    return s3.put_object(Bucket=bucket_name, Key=object_key, Body=payload, **kwargs)
+
+
+def read_artifact(s3, bucket_name: str, object_key: str) -> bytes:
+    # Drop-in for s3.get_object(Bucket, Key)['Body'].read()
+    return read_body(s3.get_object(Bucket=bucket_name, Key=object_key))
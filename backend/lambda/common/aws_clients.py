@@ -0,0 +1,92 @@
+'''
+Shared boto3 client factory for the Lambdas (deployed as the `common` layer) and the kyc-app.
+
+Clients are created once per (service, region, config) and reused, so warm Lambda invocations
+and Streamlit reruns keep their connection pools instead of paying for a new client and TLS
+handshake on every call.
+
+Environment Variables:
+    AWS_MAX_POOL_CONNECTIONS : int, connection pool size per client (default 50)
+    AWS_TCP_KEEPALIVE : "true"/"false", enable TCP keep-alive on pooled connections (default true)
+    AWS_RETRY_MODE : string, botocore retry mode, "standard" or "adaptive" (default standard)
+    AWS_MAX_ATTEMPTS : int, maximum attempts including the first call (default 5)
+'''
+
+import os
+import threading
+import boto3
+
+from botocore.config import Config
+
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_overrides = {}
+_stats = {'created': 0, 'reused': 0}
+
+client_defaults = {
+    'max_pool_connections': int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50)),
+    'tcp_keepalive': os.environ.get('AWS_TCP_KEEPALIVE', 'true').lower() == 'true',
+    'retry_mode': os.environ.get('AWS_RETRY_MODE', 'standard'),
+    'max_attempts': int(os.environ.get('AWS_MAX_ATTEMPTS', 5)),
+}
+
+
+def configure(**settings):
+    # Change the defaults used for clients created from now on, e.g. configure(max_pool_connections=100)
+    unknown = set(settings) - set(client_defaults)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {sorted(unknown)}")
+    with _lock:
+        client_defaults.update(settings)
+
+
+def get_session() -> boto3.session.Session:
+    # boto3 sessions are not thread-safe, so every client is created from this one session under the lock
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        return _session
+
+
+def get_client(service_name: str, region_name: str = None, **config):
+    """
+    Return the shared client for (service, region, config), creating it on first use.
+
+    :param service_name: e.g. 's3', 'lambda', 'bedrock-runtime', 'textract'
+    :param region_name: AWS region, defaults to the session's region
+    :param config: Overrides of client_defaults or extra botocore Config options (e.g. read_timeout)
+    """
+    if service_name in _overrides:
+        return _overrides[service_name]
+    session = get_session()
+    settings = {**client_defaults, **config}
+    key = (service_name, region_name or session.region_name, tuple(sorted(settings.items())))
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _stats['reused'] += 1
+            return client
+        retry_mode, max_attempts = settings.pop('retry_mode'), settings.pop('max_attempts')
+        client = session.client(service_name, region_name=region_name,
+                                config=Config(retries={'mode': retry_mode, 'total_max_attempts': max_attempts}, **settings))
+        _clients[key] = client
+        _stats['created'] += 1
+        return client
+
+
+def override_client(service_name: str, client):
+    # Serve `client` for every get_client(service_name, ...) call, e.g. local stand-ins in backend/harness.
+    # override_client(service_name, None) removes the override
+    with _lock:
+        if client is None:
+            _overrides.pop(service_name, None)
+        else:
+            _overrides[service_name] = client
+
+
+def client_stats() -> dict:
+    # {'created': n, 'reused': n, 'clients': n}
+    with _lock:
+        return {**_stats, 'clients': len(_clients)}
@@ -0,0 +1,97 @@
+'''
+Token-budgeted chunking of OCR lines for Bedrock prompts, and the merge of the per-chunk answers.
+
+Titan Text Express has an 8k token context shared by the prompt and the completion, a whole document
+joined into one prompt is truncated or rejected once it gets long. chunk_lines packs consecutive lines
+into windows of at most max_tokens (estimated), each window is sent on its own and merge_lines
+concatenates the answers in order, dropping the lines answered twice because they sat in the overlap of
+two adjacent windows. Equal lines anywhere else (two identical transactions) are kept.
+'''
+
+import json
+import re
+
+# Roughly 4 characters per token for English prose, OCR output (digits, dates, amounts, short lines)
+# tokenises denser, so budgets are estimated at 3 characters per token to stay on the safe side.
+chars_per_token = 3
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // chars_per_token + 1
+
+
+def chunk_lines(lines: list, max_tokens: int, overlap_lines: int = 0) -> list:
+    """
+    Split lines into consecutive windows of at most max_tokens estimated tokens.
+
+    :param overlap_lines: Trailing lines of a window repeated at the start of the next one, so a label
+                          and its value split across a boundary are still seen together
+    :return: List of lists of lines, a single window when everything fits
+    """
+    chunks, current, current_tokens = [], [], 0
+    for line in lines:
+        line_tokens = estimate_tokens(line)
+        # A single line over the budget is cut into budget sized pieces
+        if line_tokens > max_tokens:
+            step = max(1, max_tokens - 1) * chars_per_token
+            pieces = [line[i:i + step] for i in range(0, len(line), step)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(current)
+                current = current[-overlap_lines:] if overlap_lines else []
+                current_tokens = sum(estimate_tokens(line) for line in current)
+                # The overlap never pushes a window over the budget
+                while current and current_tokens + piece_tokens > max_tokens:
+                    current_tokens -= estimate_tokens(current.pop(0))
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def normalise_line(line: str) -> str:
+    # Bullets, quotes and case or spacing differences do not make two answers different
+    return re.sub(r'\s+', ' ', line.strip().strip('-*•"\',').strip()).lower()
+
+
+def shared_lines(previous: list, chunk: list, overlap_lines: int) -> list:
+    """
+    :param overlap_lines: The overlap_lines chunk_lines was called with
+    :return: The leading lines of chunk repeated from the end of previous, the overlap chunk_lines added
+    """
+    for size in range(min(len(previous), len(chunk), overlap_lines), 0, -1):
+        if previous[-size:] == chunk[:size]:
+            return chunk[:size]
+    return []
+
+
+def merge_lines(chunk_results: list, overlaps: list = None) -> list:
+    """
+    Concatenate per-chunk answers in order, dropping a line when the previous chunk already answered it
+    and it comes from the overlap the two chunks share.
+
+    :param chunk_results: List of lists of lines, in document order
+    :param overlaps: Per chunk, the input lines it shares with the previous chunk (see shared_lines), an
+                     empty list when it shares none (first chunk of a page). Without it any line the
+                     previous chunk also answered counts as overlap.
+    """
+    merged, previous = [], set()
+    for index, lines in enumerate(chunk_results):
+        overlap = None if overlaps is None else {normalise_line(line) for line in overlaps[index]}
+        answered = set()
+        for line in lines:
+            # Models sometimes answer with numbers or objects inside the JSON list
+            line = line if isinstance(line, str) else json.dumps(line)
+            key = normalise_line(line)
+            if not key:
+                continue
+            answered.add(key)
+            if key in previous and (overlap is None or key in overlap):
+                continue
+            merged.append(line.strip())
+        previous = answered
+    return merged
@@ -0,0 +1,116 @@
+'''
+Layout-aware compaction of Textract LINE blocks before they are put into a Bedrock prompt.
+
+A statement's OCR text is mostly page furniture and table layout: the bank's letterhead and the
+"Page 2 of 6" footer on every page, column headers repeated above each page's transactions, and one LINE
+per table cell. PageCompactor uses the block geometry and the page structure to
+    * drop page numbers, and header/footer band lines repeated verbatim from the band of an earlier page,
+    * collapse the cells sharing a baseline into one tab separated row, "07/03\tDeposit\t1,200.00\t13,545.67"
+      (one separator token instead of a newline per cell, and the model sees which values belong together),
+    * drop rows repeated from an earlier page (column headers, disclaimers).
+A line or row holding an amount is never dropped: a closing balance in every page's footer and two equal
+transactions on different pages are data, not furniture.
+Pages are compacted as they arrive, so multi-page documents still stream page by page to Bedrock.
+The raw CSV keeps every line, only the prompt text is compacted.
+'''
+
+import re
+
+# Fractions of the page height holding the letterhead and the footer
+header_band = 0.1
+footer_band = 0.9
+# Cells belong to the same row when their vertical centres are within this fraction of the line height
+row_tolerance = 0.5
+
+# "Page 2", "Page 2 of 6", "2 of 6", "Continued", a bare "2/6" is left alone as it may be a date
+_page_furniture = re.compile(r'^(?:page\s*\d+(?:\s*(?:of|/)\s*\d+)?|\d+\s+of\s+\d+|continued(?: on next page)?)$',
+                             re.IGNORECASE)
+# "1,200.00", "13545.67"
+_amount = re.compile(r'\d[\d,]*\.\d{2}\b')
+
+
+def line_records(blocks: list) -> list:
+    """
+    LINE blocks as {'text', 'page', 'top', 'left', 'width', 'height'}, geometry is None when the block has none.
+    """
+    records = []
+    for block in blocks:
+        if block['BlockType'] != 'LINE':
+            continue
+        box = block.get('Geometry', {}).get('BoundingBox') or {}
+        records.append({'text': block.get('Text', ''), 'page': block.get('Page', 1), 'top': box.get('Top'),
+                        'left': box.get('Left'), 'width': box.get('Width'), 'height': box.get('Height')})
+    return records
+
+
+def _key(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+
+def _same_row(row: list, line: dict) -> bool:
+    # Aligned with the row's first cell, and beside (not overlapping) every cell already in it
+    anchor = row[0]
+    centre, anchor_centre = line['top'] + line['height'] / 2, anchor['top'] + anchor['height'] / 2
+    if abs(centre - anchor_centre) > row_tolerance * min(line['height'], anchor['height']):
+        return False
+    return all(line['left'] >= cell['left'] + cell['width'] or line['left'] + line['width'] <= cell['left']
+               for cell in row)
+
+
+def _rows(lines: list) -> list:
+    # Group cells sharing a baseline, top to bottom then left to right
+    if any(None in (line['top'], line['left'], line['width'], line['height']) for line in lines):
+        return [[line] for line in lines]
+    rows = []
+    for line in sorted(lines, key=lambda line: (line['top'], line['left'])):
+        if rows and _same_row(rows[-1], line):
+            rows[-1].append(line)
+        else:
+            rows.append([line])
+    return [sorted(row, key=lambda line: line['left']) for row in rows]
+
+
+class PageCompactor:
+    """Compacts the pages of one document in order, remembering what earlier pages already showed."""
+
+    def __init__(self):
+        self.band_lines = set()
+        self.seen_rows = set()
+        self.lines_before = 0
+        self.rows_after = 0
+
+    def compact_page(self, lines: list) -> list:
+        """
+        :param lines: line_records of one page
+        :return: Compacted text rows of the page
+        """
+        self.lines_before += len(lines)
+        kept, band_lines = [], set()
+        for line in lines:
+            text = line['text'].strip()
+            if not text or _page_furniture.match(text):
+                continue
+            in_band = line['top'] is not None and (line['top'] < header_band or
+                                                   line['top'] + (line['height'] or 0) > footer_band)
+            if in_band and not _amount.search(text):
+                key = _key(text)
+                band_lines.add(key)
+                if key in self.band_lines:
+                    continue
+            kept.append(line)
+
+        rows, page_rows = [], set()
+        for row in _rows(kept):
+            text = '\t'.join(line['text'].strip() for line in row)
+            # Repeats within a page are real (two equal transactions), repeats of an earlier page are
+            # furniture unless they hold an amount
+            if not _amount.search(text):
+                key = _key(text)
+                if key in self.seen_rows:
+                    continue
+                page_rows.add(key)
+            rows.append(text)
+        self.seen_rows |= page_rows
+        self.band_lines |= band_lines
+        self.rows_after += len(rows)
+        return rows
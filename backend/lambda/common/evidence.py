@@ -0,0 +1,82 @@
+'''
+Evidence manifests, used to pass large Lambda inputs by S3 reference instead of inline.
+
+A manifest lists the evidence that makes up a narrative, in order:
+    {
+        "version": 1,
+        "parts": [
+            {"text": "{'CU Number':{'4':123456704}}"},
+            {"bucket": "externaldataprocess", "key": "suggestions/Jamie Dimon_1754539676.json", "format": "json"},
+            {"bucket": "output-internal-cld", "key": "output/filtered_payslip.csv", "format": "csv"}
+        ]
+    }
+
+Text parts are used as they are, object parts are fetched from S3 and rendered as text ("json" re-serialised,
+"csv" in the column-oriented layout of pandas DataFrame.to_json, "text" decoded as utf-8).
+'''
+
+import csv
+import io
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+from common.artifacts import read_artifact
+
+manifest_version = 1
+
+
+def text_part(text: str) -> dict:
+    return {'text': text}
+
+
+def object_part(bucket_name: str, object_key: str, format: str) -> dict:
+    if format not in ('json', 'csv', 'text'):
+        raise ValueError(f"Unsupported evidence format: {format}")
+    return {'bucket': bucket_name, 'key': object_key, 'format': format}
+
+
+def build_manifest(parts: list) -> dict:
+    return {'version': manifest_version, 'parts': parts}
+
+
+def normalise_narrative(text: str) -> str:
+    # Same clean up the app always applied to the consolidated narrative, applying it twice changes nothing
+    return text.strip(' ').replace('"', "'")
+
+
+def _csv_to_json(data: str) -> str:
+    # {"column": {"0": value, "1": value}}, the layout DataFrame.to_json() gives the app for the same CSV
+    rows = list(csv.reader(io.StringIO(data)))
+    if not rows:
+        return '{}'
+    header, records = rows[0], rows[1:]
+    return json.dumps({column: {str(i): (record[j] if j < len(record) else None) for i, record in enumerate(records)}
+                       for j, column in enumerate(header)}, separators=(',', ':'))
+
+
+def render_part(s3, part: dict) -> str:
+    if 'text' in part:
+        return part['text']
+    data = read_artifact(s3, part['bucket'], part['key']).decode('utf-8')
+    if part['format'] == 'json':
+        return json.dumps(json.loads(data))
+    if part['format'] == 'csv':
+        return _csv_to_json(data)
+    return data
+
+
+def resolve_manifest(s3, manifest: dict, max_workers: int = 8) -> str:
+    """
+    Fetch every part of the manifest concurrently and return the consolidated narrative.
+
+    :param manifest: dict as produced by build_manifest
+    :return: Normalised narrative text, parts concatenated in manifest order
+    """
+    if manifest.get('version') != manifest_version:
+        raise ValueError(f"Unsupported manifest version: {manifest.get('version')}")
+    parts = manifest['parts']
+    if not parts:
+        return ''
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(parts))) as executor:
+        rendered = list(executor.map(lambda part: render_part(s3, part), parts))
+    return normalise_narrative(''.join(rendered))
@@ -0,0 +1,77 @@
+'''
+Idempotency records, so a Lambda acts once per document version however many S3 events it receives.
+
+A record is a small JSON object created with a conditional put (IfNoneMatch='*'): of several concurrent
+or repeated triggers for the same document version exactly one creates it and does the work, the others
+see it and skip. The record goes from "in_progress" to "completed" or "failed"; a failed record, or an
+in_progress one older than the claim timeout (the run died), can be claimed again with IfMatch on its
+ETag, so retries still happen but never twice at once.
+
+    {"key": "<document>", "content_hash": "<sha256>", "status": "in_progress" | "completed" | "failed",
+     "claimed": 1754546612, "updated": 1754546615, ...}
+
+Environment Variables:
+    CLAIM_TIMEOUT : int, seconds after which an in_progress claim is considered abandoned (default 900,
+                    the maximum Lambda run time)
+'''
+
+import json
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+claim_timeout = int(os.environ.get('CLAIM_TIMEOUT', 900))
+_conflict_codes = ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def record_key(prefix: str, stage: str, document: str, content_hash: str) -> str:
+    stem = document.split("/")[-1].rsplit(".", 1)[0]
+    return f'{prefix}{stage}/{stem}/{content_hash}.json'
+
+
+def _put_record(s3, bucket_name: str, object_key: str, record: dict, **conditions):
+    # The ETag of the new record, or None when the condition did not hold
+    try:
+        return s3.put_object(Bucket=bucket_name, Key=object_key, Body=json.dumps(record).encode('utf-8'),
+                             ContentType='application/json', **conditions)['ETag']
+    except ClientError as e:
+        if e.response['Error']['Code'] in _conflict_codes:
+            return None
+        raise
+
+
+def claim(s3, bucket_name: str, object_key: str, **fields):
+    """
+    Try to become the one run processing this document version.
+
+    :return: (claimed, record): the ETag of our in_progress record and the record when claimed,
+             (None, existing record) when another run has it or has completed it
+    """
+    now = int(time.time())
+    record = {'status': 'in_progress', 'claimed': now, 'updated': now, 'attempt': 1, **fields}
+    etag = _put_record(s3, bucket_name, object_key, record, IfNoneMatch='*')
+    if etag is not None:
+        return etag, record
+
+    response = s3.get_object(Bucket=bucket_name, Key=object_key)
+    existing = json.loads(response['Body'].read())
+    abandoned = existing.get('status') == 'in_progress' and now - existing.get('updated', 0) > claim_timeout
+    if existing.get('status') == 'failed' or abandoned:
+        # Retry, conditional on the record we just read so only one of the retries wins
+        record['attempt'] = existing.get('attempt', 1) + 1
+        etag = _put_record(s3, bucket_name, object_key, record, IfMatch=response['ETag'])
+        if etag is not None:
+            return etag, record
+    return None, existing
+
+
+def finish(s3, bucket_name: str, object_key: str, etag: str, record: dict, status: str, **fields) -> bool:
+    """
+    Mark a claimed record completed or failed.
+
+    :param etag: ETag returned by claim, the update is skipped if the claim was taken over meanwhile
+    :return: False when another run took the claim over
+    """
+    updated = {**record, 'status': status, 'updated': int(time.time()), **fields}
+    return _put_record(s3, bucket_name, object_key, updated, IfMatch=etag) is not None
@@ -0,0 +1,173 @@
+'''
+Rule and regex based extraction of the statement fields from Textract LINE text, run before Nova Pro.
+
+Standard statements and payslips print the balance, issue date, holder and bank on predictable labelled
+lines ("Ending balance", "Statement date", "Account holder", a known bank name). extract_fields finds
+them and scores each value; only fields missing or below the confidence threshold are left to the model.
+
+Confidence guide:
+    0.95  labelled value on the same line (e.g. "Closing balance: $12,345.67")
+    0.85  labelled value on the next line, or a known bank name in the letterhead (first header_lines lines)
+    0.6   unlabelled or ambiguous match (a bare "balance", a dd/mm vs mm/dd date, a known bank further down,
+          "... Bank" pattern)
+
+Negative balances keep their sign: "-$1,234.56", "(1,234.56)" and "1,234.56 DR" all give "-1,234.56", a dash
+set apart by a space is a separator. Only holder names are labels, "Product name: ..." is not the client.
+Lines holding an amount are transactions ("Transfer to Chase 100.00") and never give the bank name.
+
+Environment Variables:
+    PRE_EXTRACT_MIN_CONFIDENCE : float, values at or above it are used without asking the model (default 0.8)
+'''
+
+import os
+import re
+from datetime import datetime
+
+min_confidence = float(os.environ.get('PRE_EXTRACT_MIN_CONFIDENCE', 0.8))
+
+known_banks = [
+    'JPMorgan Chase', 'Chase', 'Bank of America', 'Wells Fargo', 'Citibank', 'HSBC', 'Barclays', 'Lloyds Bank',
+    'NatWest', 'Santander', 'Standard Chartered', 'DBS Bank', 'OCBC Bank', 'UOB', 'Bank of China', 'Hang Seng Bank',
+    'Deutsche Bank', 'BNP Paribas', 'UBS', 'Credit Suisse', 'Goldman Sachs', 'Morgan Stanley', 'Commonwealth Bank',
+    'Westpac', 'ANZ', 'NAB', 'TD Bank', 'RBC', 'Scotiabank', 'Capital One',
+]
+# The letterhead, where the issuing bank is printed
+header_lines = 5
+
+_currency = r'(?:[$£€¥]|USD|GBP|EUR|HKD|SGD|AUD)'
+# A sign counts only when attached to the currency or the digits, "Closing balance - 1,234.56" is a separator
+_amount = (rf'(?P<open>\()?(?:(?<![\w.])(?P<sign>[-−])(?={_currency}|\d))?(?:{_currency}\s*)?(?P<inner_sign>[-−])?'
+           r'(?P<value>\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+\.\d{2})(?P<close>\))?(?P<debit>\s*DR\b)?')
+_balance_label = r'\b(?:ending|closing|new|current|available|statement|net)\s+balance\b|\bbalance\s+(?:carried forward|at end)\b|\bnet\s+pay\b'
+_date_label = r'\b(?:statement(?:\s+issue)?\s+date|date\s+of\s+(?:issue|statement)|issue\s+date|statement\s+period|pay\s+date|period\s+ending)\b'
+_name_label = r'\b(?:account\s+holder(?:\s+name)?|(?:account|customer|client|employee)\s+name)\s*[:\-]\s*'
+_title_name = r'\b(?:Mr|Mrs|Ms|Miss|Dr)\.?\s+([A-Z][A-Za-z\'\-]+(?:\s+[A-Z][A-Za-z\'\-]+){1,3})'
+_bank_pattern = r'\b((?:[A-Z][A-Za-z&\.]+\s+){1,3}Bank)\b'
+
+_month = r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?'
+_date_patterns = [
+    (r'\b(\d{4}-\d{2}-\d{2})\b', ['%Y-%m-%d']),
+    (rf'\b(\d{{1,2}}\s+{_month}\s+\d{{4}})\b', ['%d %b %Y', '%d %B %Y']),
+    (rf'\b({_month}\s+\d{{1,2}},?\s+\d{{4}})\b', ['%b %d %Y', '%B %d %Y']),
+    (r'\b(\d{1,2}[/.]\d{1,2}[/.]\d{4})\b', None),
+]
+
+
+def _field(value, confidence, line):
+    return {'value': value, 'confidence': confidence, 'source': line}
+
+
+def _better(current, candidate):
+    # Keep the first of equally confident matches, documents print the headline value first
+    return candidate if current is None or candidate['confidence'] > current['confidence'] else current
+
+
+def find_date(text: str):
+    """
+    :return: (ISO date string, confidence) or None, numeric dates where day and month could swap score 0.6
+    """
+    for pattern, formats in _date_patterns:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if not match:
+            continue
+        if formats is None:
+            first, second, year = (int(part) for part in re.split(r'[/.]', match.group(1)))
+            if first > 12 >= second:
+                day, month, confidence = first, second, 1.0
+            elif second > 12 >= first:
+                day, month, confidence = second, first, 1.0
+            else:
+                # dd/mm/yyyy assumed, outside the US that is the common layout
+                day, month, confidence = first, second, 0.6
+            try:
+                return datetime(year, month, day).strftime('%Y-%m-%d'), confidence
+            except ValueError:
+                continue
+        # "31 Jul. 2025", "July 31, 2025" -> "31 Jul 2025", "July 31 2025"
+        raw = ' '.join(re.sub(r'[,.]', ' ', match.group(1)).split()).replace('Sept', 'Sep')
+        for date_format in formats:
+            try:
+                return datetime.strptime(raw, date_format).strftime('%Y-%m-%d'), 1.0
+            except ValueError:
+                continue
+    return None
+
+
+def _last_amount(text: str):
+    # Balance lines often print debit/credit columns first and the balance last
+    amounts = list(re.finditer(_amount, text))
+    if not amounts:
+        return None
+    match = amounts[-1]
+    negative = (match.group('sign') or match.group('inner_sign') or match.group('debit') or
+                (match.group('open') and match.group('close')))
+    return '-' + match.group('value') if negative else match.group('value')
+
+
+def extract_fields(lines: list) -> dict:
+    """
+    Pull client_balance, statement_issue_date, client_name and bank_name out of OCR lines.
+
+    :param lines: Textract LINE texts in reading order
+    :return: field -> {'value', 'confidence', 'source'} for the fields found, missing fields are absent
+    """
+    lines = [line.strip() for line in lines if line and line.strip()]
+    found = {'client_balance': None, 'statement_issue_date': None, 'client_name': None, 'bank_name': None}
+    for i, line in enumerate(lines):
+        next_line = lines[i + 1] if i + 1 < len(lines) else ''
+
+        # Balance: a labelled amount, on the line or right below it
+        if re.search(_balance_label, line, re.IGNORECASE):
+            amount = _last_amount(line)
+            if amount:
+                found['client_balance'] = _better(found['client_balance'], _field(amount, 0.95, line))
+            elif _last_amount(next_line):
+                found['client_balance'] = _better(found['client_balance'],
+                                                  _field(_last_amount(next_line), 0.85, next_line))
+        elif re.search(r'\bbalance\b', line, re.IGNORECASE) and _last_amount(line):
+            found['client_balance'] = _better(found['client_balance'], _field(_last_amount(line), 0.6, line))
+
+        # Issue date: a labelled date, for a period the end date
+        if re.search(_date_label, line, re.IGNORECASE):
+            label_end = re.search(_date_label, line, re.IGNORECASE).end()
+            text = line[label_end:]
+            period = re.split(r'\s+(?:to|-|–|through)\s+', text)
+            date = find_date(period[-1]) or find_date(text)
+            confidence = 0.95
+            if not date:
+                date, confidence = find_date(next_line), 0.85
+            if date:
+                found['statement_issue_date'] = _better(found['statement_issue_date'],
+                                                        _field(date[0], round(confidence * date[1], 2), line))
+
+        # Client name: a labelled name, or a titled name (Mr/Mrs/Ms/Dr)
+        label = re.search(_name_label, line, re.IGNORECASE)
+        if label:
+            name = line[label.end():].strip()
+            if re.match(r"^[A-Za-z][A-Za-z'\.\- ]+$", name):
+                found['client_name'] = _better(found['client_name'], _field(name, 0.95, line))
+        else:
+            titled = re.search(_title_name, line)
+            if titled:
+                found['client_name'] = _better(found['client_name'], _field(titled.group(1), 0.7, line))
+
+        # Bank name: a known bank, trusted in the letterhead, or a "<Name> Bank" pattern
+        if _last_amount(line):
+            continue
+        for bank in known_banks:
+            if re.search(rf'\b{re.escape(bank)}\b', line, re.IGNORECASE):
+                confidence = 0.85 if i < header_lines else 0.6
+                found['bank_name'] = _better(found['bank_name'], _field(bank, confidence, line))
+                break
+        else:
+            pattern = re.search(_bank_pattern, line)
+            if pattern:
+                found['bank_name'] = _better(found['bank_name'], _field(pattern.group(1), 0.6, line))
+
+    return {field: value for field, value in found.items() if value is not None}
+
+
+def confident_fields(fields: dict, threshold: float = None) -> dict:
+    # field -> value for the values good enough to skip the model
+    threshold = min_confidence if threshold is None else threshold
+    return {field: found['value'] for field, found in fields.items() if found['confidence'] >= threshold}
@@ -0,0 +1,47 @@
+'''
+Thread-safe request rate limiter, shared by the worker threads of a Lambda calling Bedrock concurrently.
+
+Concurrency bounds how many requests are in flight, the rate limit bounds how many start per second.
+Both are needed: short completions at high concurrency otherwise exceed the account's requests per
+minute quota and come back as ThrottlingException.
+'''
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second on average and bursts of up to `burst`.
+
+    :param rate: Requests per second, 0 or less disables the limit
+    :param burst: Requests allowed back to back after an idle period (default 1, evenly spaced)
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Block until a request may start.
+
+        :return: Seconds spent waiting
+        """
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,116 @@
+'''
+Content-addressed cache of OCR/extraction results, shared by the Textract and Nova Lambdas.
+
+An entry is keyed by the SHA-256 of the input document and a hash of the stage configuration (model id,
+prompt, generation settings), so changing the prompt or model never serves stale results. The cached
+artifacts are copies of the stage outputs under <prefix><stage>/<content hash>-<config hash>/, listed in a
+small JSON manifest. A hit restores them with server-side S3 copies, no AI service is called.
+
+Every output object records how it was produced in its S3 metadata: result-cache = hit | miss.
+
+Environment Variables:
+    RESULT_CACHE : "on"/"off" (default on)
+    RESULT_CACHE_BUCKET : string, bucket holding the cache (default the stage's output bucket)
+'''
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+from botocore.exceptions import ClientError
+from common.artifacts import put_artifact, read_artifact
+
+logger = logging.getLogger(__name__)
+# The hit/miss metric is logged at INFO, emitted whatever level the importing Lambda left the root logger at
+logger.setLevel(logging.INFO)
+
+cache_enabled = os.environ.get('RESULT_CACHE', 'on').lower() == 'on'
+cache_bucket = os.environ.get('RESULT_CACHE_BUCKET')
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_object(s3, bucket_name: str, object_key: str, chunk_size: int = 1024 * 1024) -> str:
+    # Stream the object through SHA-256, memory stays at one chunk whatever the document size
+    digest = hashlib.sha256()
+    body = s3.get_object(Bucket=bucket_name, Key=object_key)['Body']
+    for chunk in iter(lambda: body.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    :param stage: Name of the producing stage, e.g. 'textract_titan'
+    :param config: Everything besides the input that determines the outputs (model, prompt, settings)
+    :param bucket_name: Cache bucket, RESULT_CACHE_BUCKET overrides it
+    """
+
+    def __init__(self, s3, bucket_name: str, stage: str, config: dict, prefix: str = 'cache/'):
+        self.s3 = s3
+        self.bucket_name = cache_bucket or bucket_name
+        self.stage = stage
+        self.config_hash = hash_bytes(json.dumps(config, sort_keys=True).encode('utf-8'))[:16]
+        self.prefix = prefix
+
+    def _entry_prefix(self, content_hash: str) -> str:
+        return f'{self.prefix}{self.stage}/{content_hash}-{self.config_hash}/'
+
+    def lookup(self, content_hash: str):
+        # The entry manifest on a hit, None on a miss. Cache errors count as a miss, they never fail the stage
+        if not cache_enabled:
+            return None
+        try:
+            return json.loads(read_artifact(self.s3, self.bucket_name, self._entry_prefix(content_hash) + 'manifest.json'))
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                logger.warning("Result cache lookup failed, treating as a miss: %s", e)
+            return None
+
+    def restore(self, manifest: dict, targets: dict):
+        """
+        Copy the cached artifacts to the stage outputs.
+
+        :param targets: artifact name -> (bucket_name, object_key)
+        """
+        for name, (bucket_name, object_key) in targets.items():
+            self._copy(self.bucket_name, manifest['artifacts'][name], bucket_name, object_key, 'hit')
+
+    def save(self, content_hash: str, sources: dict, **fields):
+        """
+        Store copies of the stage outputs for later hits.
+
+        :param sources: artifact name -> (bucket_name, object_key) of the outputs just written
+        """
+        if not cache_enabled:
+            return
+        entry_prefix = self._entry_prefix(content_hash)
+        try:
+            artifacts = {}
+            for name, (bucket_name, object_key) in sources.items():
+                artifacts[name] = entry_prefix + name
+                self._copy(bucket_name, object_key, self.bucket_name, artifacts[name], 'miss')
+            # The manifest goes last, a half written entry is never served
+            put_artifact(self.s3, self.bucket_name, entry_prefix + 'manifest.json',
+                         json.dumps({'stage': self.stage, 'content_hash': content_hash, 'config_hash': self.config_hash,
+                                     'artifacts': artifacts, 'created': int(time.time()), **fields}),
+                         content_type='application/json')
+        except ClientError as e:
+            logger.warning("Result cache save failed: %s", e)
+
+    def _copy(self, source_bucket: str, source_key: str, bucket_name: str, object_key: str, result: str):
+        # Server-side copy, the content type and encoding are kept and the metadata records hit or miss
+        head = self.s3.head_object(Bucket=source_bucket, Key=source_key)
+        extra_args = {k: head[k] for k in ('ContentType', 'ContentEncoding') if head.get(k)}
+        self.s3.copy_object(Bucket=bucket_name, Key=object_key, CopySource={'Bucket': source_bucket, 'Key': source_key},
+                            MetadataDirective='REPLACE', Metadata={'result-cache': result}, **extra_args)
+
+
+def log_cache_result(stage: str, result: str, content_hash: str, **fields):
+    # One structured line per lookup, a CloudWatch metric filter on "result_cache" counts hits and misses
+    logger.info(json.dumps({'metric': 'result_cache', 'stage': stage, 'result': result,
+                            'content_hash': content_hash, **fields}))
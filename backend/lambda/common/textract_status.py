@@ -0,0 +1,60 @@
+'''
+Completion manifests of the Textract pipeline, shared by the Textract Lambda (writer) and the kyc-app (reader).
+
+For every processed document the Lambda writes output/_status/<name>.json next to its CSV outputs:
+    {
+        "document": "bank statement.pdf",
+        "source_etag": "<ETag of the uploaded document>",
+        "status": "completed" | "failed",
+        "raw_key": "output/raw_bank statement.csv",
+        "filtered_key": "output/filtered_bank statement.csv",
+        "seconds": 4.2,
+        "error": "..."  (failed only)
+    }
+The source ETag ties the manifest to one upload, so a manifest left by an earlier upload of the same file
+name is not mistaken for the completion of the current one.
+'''
+
+import json
+
+from botocore.exceptions import ClientError
+from common.artifacts import put_artifact, read_artifact
+
+status_prefix = 'output/_status/'
+
+
+def document_stem(document: str) -> str:
+    return document.split("/")[-1].split(".")[0]
+
+
+def output_keys(document: str) -> tuple:
+    # (raw_csv_key, filtered_csv_key)
+    stem = document_stem(document)
+    return f'output/raw_{stem}.csv', f'output/filtered_{stem}.csv'
+
+
+def status_key(document: str) -> str:
+    return f'{status_prefix}{document_stem(document)}.json'
+
+
+def normalise_etag(etag: str) -> str:
+    # S3 events carry the ETag without quotes, API responses with them
+    return (etag or '').strip('"')
+
+
+def write_status(s3, bucket_name: str, document: str, source_etag: str, status: str, **fields) -> dict:
+    raw_key, filtered_key = output_keys(document)
+    manifest = {'document': document, 'source_etag': normalise_etag(source_etag), 'status': status,
+                'raw_key': raw_key, 'filtered_key': filtered_key, **fields}
+    put_artifact(s3, bucket_name, status_key(document), json.dumps(manifest), content_type='application/json')
+    return manifest
+
+
+def read_status(s3, bucket_name: str, document: str):
+    # The manifest dict, or None while the document has not been processed yet
+    try:
+        return json.loads(read_artifact(s3, bucket_name, status_key(document)))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
@@ -27,7 +27,9 @@ Returns:
 
 from geopy.geocoders import GoogleV3
 import google_streetview.api
-import boto3, csv, io, json, os
+import csv, io, json, os
+
+from common.aws_clients import get_client
 
 def lambda_handler(event, context):
     # Extract Google API Key from evironment variable
@@ -35,7 +37,7 @@ def lambda_handler(event, context):
     geolocator = GoogleV3(api_key=os.environ.get("GM_API_KEY"))
 
     # Initialize S3 client
-    s3 = boto3.client('s3')
+    s3 = get_client('s3')
 
     # Initialize bucket name
     img_bucket_name = os.environ.get("IMAGE_S3_BUCKET")
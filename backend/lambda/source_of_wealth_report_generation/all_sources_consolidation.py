@@ -1,11 +1,13 @@
 import json
-import boto3
 import csv
 from io import StringIO
 
+from common.artifacts import put_artifact, read_artifact
+from common.aws_clients import get_client
+
 def lambda_handler(event, context):
     # Initialize S3 client
-    s3_client = boto3.client('s3')
+    s3_client = get_client('s3')
     
     # Define source and target buckets
     csv_bucket = 'internaldataprocess'
@@ -17,8 +19,7 @@ def lambda_handler(event, context):
     
     try:
         # Read CSV file from S3
-        csv_obj = s3_client.get_object(Bucket=csv_bucket, Key=csv_key)
-        csv_content = csv_obj['Body'].read().decode('utf-8')
+        csv_content = read_artifact(s3_client, csv_bucket, csv_key).decode('utf-8')
         csv_reader = csv.reader(StringIO(csv_content))
         
         # Get CSV headers and rows
@@ -31,8 +32,7 @@ def lambda_handler(event, context):
         csv_rows = [row for row in csv_reader]
         
         # Read JSON file from S3
-        json_obj = s3_client.get_object(Bucket=json_bucket, Key=json_key)
-        json_content = json_obj['Body'].read().decode('utf-8')
+        json_content = read_artifact(s3_client, json_bucket, json_key).decode('utf-8')
         json_data = json.loads(json_content)
         
         # Handle JSON data (list or single record)
@@ -71,11 +71,7 @@ def lambda_handler(event, context):
         csv_writer.writerows(combined_rows)  # Write data
         
         # Upload to target S3 bucket
-        s3_client.put_object(
-            Bucket=target_bucket,
-            Key=target_key,
-            Body=csv_buffer.getvalue()
-        )
+        put_artifact(s3_client, target_bucket, target_key, csv_buffer.getvalue(), content_type='text/csv')
         
         return {
             'statusCode': 200,
@@ -1,18 +1,20 @@
 import json
-import boto3
 import csv
 from io import StringIO
 from jinja2 import Template, TemplateError
 import logging
 import re
 
+from common.artifacts import put_artifact, read_artifact
+from common.aws_clients import get_client
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
 def lambda_handler(event, context):
     # Initialize AWS S3 client
-    s3_client = boto3.client('s3')
+    s3_client = get_client('s3')
     
     # Define S3 bucket and file keys
     input_bucket = 'sowreport'
@@ -44,13 +46,11 @@ def lambda_handler(event, context):
             raise
         
         # Download the HTML template from S3
-        template_obj = s3_client.get_object(Bucket=input_bucket, Key=template_key)
-        template_data = template_obj['Body'].read().decode('utf-8')
+        template_data = read_artifact(s3_client, input_bucket, template_key).decode('utf-8')
         logger.info("Successfully downloaded HTML template")
         
         # Download the CSV file from S3
-        csv_obj = s3_client.get_object(Bucket=input_bucket, Key=csv_key)
-        csv_data = csv_obj['Body'].read().decode('utf-8')
+        csv_data = read_artifact(s3_client, input_bucket, csv_key).decode('utf-8')
         logger.info("Successfully downloaded CSV file")
         
         # Parse CSV data
@@ -113,12 +113,7 @@ def lambda_handler(event, context):
             output_key = f'reports/kyc_report_{index + 1}.html'
             
             # Upload the generated report to S3
-            s3_client.put_object(
-                Bucket=output_bucket,
-                Key=output_key,
-                Body=html_bytes,
-                ContentType='text/html'
-            )
+            put_artifact(s3_client, output_bucket, output_key, html_bytes, content_type='text/html')
             logger.info(f"Uploaded report to '{output_bucket}/{output_key}'")
         
         return {
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Import the common layer as the Lambdas do, and the harness fakes as run_harness.py does
+_backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for _path in (os.path.join(_backend_dir, 'lambda'), os.path.join(_backend_dir, 'harness')):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
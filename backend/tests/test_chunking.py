@@ -0,0 +1,35 @@
+from common.chunking import chunk_lines, estimate_tokens, merge_lines, shared_lines
+
+
+def test_chunks_stay_within_the_budget():
+    lines = [f'line {i} ' + 'x' * 40 for i in range(50)]
+    chunks = chunk_lines(lines, 100, overlap_lines=2)
+    assert len(chunks) > 1
+    assert all(sum(estimate_tokens(line) for line in chunk) <= 100 for chunk in chunks)
+    assert chunks[1][:2] == chunks[0][-2:]
+
+
+def test_overlong_line_is_split():
+    chunks = chunk_lines(['y' * 1000], 30)
+    assert ''.join(line for chunk in chunks for line in chunk) == 'y' * 1000
+    assert all(estimate_tokens(chunk[0]) <= 30 for chunk in chunks)
+
+
+def test_shared_lines_is_capped_at_the_overlap():
+    assert shared_lines(['a', 'b', 'c'], ['b', 'c', 'd'], 2) == ['b', 'c']
+    assert shared_lines(['a', 'b'], ['b', 'c'], 0) == []
+
+
+def test_merge_drops_only_answers_from_the_overlap():
+    answers = [['Salary 5,000.00', 'Rent 1,200.00'], ['Rent 1,200.00', 'Card 25.00'], ['Card 25.00']]
+    overlaps = [[], ['Rent 1,200.00'], []]
+    # The last chunk repeats "Card 25.00" outside any overlap, it is a second transaction
+    assert merge_lines(answers, overlaps) == ['Salary 5,000.00', 'Rent 1,200.00', 'Card 25.00', 'Card 25.00']
+
+
+def test_merge_keeps_repeats_that_are_not_adjacent():
+    assert merge_lines([['a'], ['b'], ['a']]) == ['a', 'b', 'a']
+
+
+def test_merge_stringifies_non_text_answers():
+    assert merge_lines([[12, {'a': 1}, ' - text ']]) == ['12', '{"a": 1}', '- text']
@@ -0,0 +1,47 @@
+from common.compaction import PageCompactor, line_records
+
+
+def _line(text, top, left=0.05, width=0.28, height=0.012):
+    return {'text': text, 'page': 1, 'top': top, 'left': left, 'width': width, 'height': height}
+
+
+def test_footer_balance_of_a_later_page_is_kept():
+    compactor = PageCompactor()
+    first = compactor.compact_page([_line('Example Bank', 0.03), _line('Deposit 200.00', 0.5),
+                                    _line('Closing balance 10,000.00', 0.95)])
+    second = compactor.compact_page([_line('Example Bank', 0.03), _line('Deposit 200.00', 0.5),
+                                     _line('Closing balance 12,345.67', 0.95)])
+    assert first == ['Example Bank', 'Deposit 200.00', 'Closing balance 10,000.00']
+    assert second == ['Deposit 200.00', 'Closing balance 12,345.67']
+
+
+def test_identical_transactions_on_different_pages_are_kept():
+    compactor = PageCompactor()
+    row = [_line('01/07', 0.5), _line('Card payment', 0.5, left=0.35), _line('25.00', 0.5, left=0.65)]
+    assert compactor.compact_page(row) == ['01/07\tCard payment\t25.00']
+    assert compactor.compact_page(row) == ['01/07\tCard payment\t25.00']
+
+
+def test_repeated_headers_and_page_numbers_are_dropped():
+    compactor = PageCompactor()
+    header = [_line('Description', 0.12), _line('Amount', 0.12, left=0.35)]
+    compactor.compact_page(header + [_line('Page 1 of 2', 0.96), _line('Salary 5,000.00', 0.5)])
+    rows = compactor.compact_page(header + [_line('Page 2 of 2', 0.96), _line('Rent 1,200.00', 0.5)])
+    assert rows == ['Rent 1,200.00']
+
+
+def test_changed_band_line_without_amount_is_kept():
+    compactor = PageCompactor()
+    compactor.compact_page([_line('Statement 31/07/2025', 0.03)])
+    assert compactor.compact_page([_line('Statement 31/07/2025', 0.03)]) == []
+    assert compactor.compact_page([_line('Statement 31/08/2025', 0.03)]) == ['Statement 31/08/2025']
+
+
+def test_bare_fraction_is_not_page_furniture():
+    assert PageCompactor().compact_page([_line('07/03', 0.5)]) == ['07/03']
+
+
+def test_lines_without_geometry_stay_one_per_row():
+    blocks = [{'BlockType': 'LINE', 'Text': 'a', 'Page': 1}, {'BlockType': 'WORD', 'Text': 'a'},
+              {'BlockType': 'LINE', 'Text': 'b', 'Page': 1}]
+    assert PageCompactor().compact_page(line_records(blocks)) == ['a', 'b']
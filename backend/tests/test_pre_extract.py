@@ -0,0 +1,72 @@
+from common.pre_extract import confident_fields, extract_fields
+
+
+def test_negative_balance_keeps_its_sign():
+    fields = extract_fields(['Lloyds Bank', 'Statement of Account', 'Closing balance -$1,234.56'])
+    assert fields['client_balance']['value'] == '-1,234.56'
+    assert confident_fields(fields)['client_balance'] == '-1,234.56'
+
+
+def test_bracketed_and_debit_balances_are_negative():
+    assert extract_fields(['Closing balance (1,234.56)'])['client_balance']['value'] == '-1,234.56'
+    assert extract_fields(['Closing balance 1,234.56 DR'])['client_balance']['value'] == '-1,234.56'
+    assert extract_fields(['Closing balance: $-12.00'])['client_balance']['value'] == '-12.00'
+
+
+def test_positive_balance_is_last_amount_on_the_line():
+    fields = extract_fields(['Ending balance 100.00 250.00 $12,345.67'])
+    assert fields['client_balance'] == {'value': '12,345.67', 'confidence': 0.95,
+                                        'source': 'Ending balance 100.00 250.00 $12,345.67'}
+
+
+def test_balance_on_the_next_line():
+    fields = extract_fields(['Closing balance', '£4,000.00'])
+    assert fields['client_balance']['value'] == '4,000.00'
+    assert fields['client_balance']['confidence'] == 0.85
+
+
+def test_bank_comes_from_the_letterhead_not_transactions():
+    lines = ['Lloyds Bank plc', 'Statement of Account', 'Mr John Smith', '1 Main Street', 'London',
+             '01/07 Transfer to Chase 100.00', 'Deposit from HSBC']
+    fields = extract_fields(lines)
+    assert fields['bank_name']['value'] == 'Lloyds Bank'
+    assert fields['bank_name']['confidence'] == 0.85
+
+
+def test_bank_in_a_transaction_line_is_ignored():
+    fields = extract_fields(['Statement of Account', 'Transfer to Chase 100.00'])
+    assert 'bank_name' not in fields
+
+
+def test_known_bank_below_the_letterhead_is_not_confident():
+    lines = ['Statement of Account', 'a', 'b', 'c', 'd', 'Deposit from HSBC']
+    fields = extract_fields(lines)
+    assert fields['bank_name']['value'] == 'HSBC'
+    assert 'bank_name' not in confident_fields(fields)
+
+
+def test_example_bank_is_only_a_pattern_match():
+    fields = extract_fields(['Example Bank Statement of Account'])
+    assert fields['bank_name'] == {'value': 'Example Bank', 'confidence': 0.6,
+                                   'source': 'Example Bank Statement of Account'}
+
+
+def test_statement_period_gives_the_end_date():
+    fields = extract_fields(['Statement period 01/07/2025 - 31/07/2025'])
+    assert fields['statement_issue_date']['value'] == '2025-07-31'
+
+
+def test_labelled_client_name():
+    fields = extract_fields(['Account holder: Jamie Dimon', 'Bank name: Chase'])
+    assert fields['client_name']['value'] == 'Jamie Dimon'
+
+
+def test_separator_dash_is_not_a_minus_sign():
+    assert extract_fields(['Closing balance - 1,234.56'])['client_balance']['value'] == '1,234.56'
+    assert extract_fields(['Closing balance -1,234.56'])['client_balance']['value'] == '-1,234.56'
+
+
+def test_product_name_is_not_the_client():
+    fields = extract_fields(['Product name: Premier Checking', 'Account name: Jane Doe'])
+    assert fields['client_name']['value'] == 'Jane Doe'
+    assert 'client_name' not in extract_fields(['Product name: Premier Checking'])
@@ -1,42 +1,84 @@
 import streamlit as st
 import pandas as pd
-import boto3
 import io
 import json
+import logging
 import time 
 import streamlit.components.v1 as components
 import zipfile 
 
 from io import StringIO
-from utils.folder_manager import create_client_entry, check_client_entry, get_client_entry
-from utils.invoke_lambda_function import invoke_lambda_function
-from utils.invoke_s3 import s3_read_csv, s3_write_csv, s3_file_exists, s3_read_json
-
+from utils.aws_clients import get_client
+from utils.case_pipeline import run_pipeline
+from utils.case_store import S3CaseStore, entry_schema
+from utils.change_log import start_compactor
+from utils.client_master import ClientMasterIndex
+from utils.entry_cache import EntryCache
+from utils.folder_manager import create_client_entry, check_client_entry
+from utils.evidence import normalise_narrative, object_part, text_part
+from utils.invoke_lambda_function import invoke_lambda_function, invoke_lambda_many, invoke_lambda_with_evidence
+from utils.invoke_s3 import (WriteConflict, s3_read_csv, s3_file_exists, s3_read_json, s3_read_bytes, s3_fetch_many,
+                             decode_bytes, decode_csv, decode_json, set_s3_cache)
+from utils.s3_cache import S3DiskCache
+from utils.textract_tracker import wait_for_documents
+from utils.uploader import upload_files
+
+# basicConfig is a no-op on Streamlit reruns, the handler is installed once per process
+logging.basicConfig(format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+# Timings and decisions of the app and utils/ at INFO, third party libraries stay at WARNING
+for logger_name in (__name__, 'utils'):
+    logging.getLogger(logger_name).setLevel(logging.INFO)
+
+
+@st.cache_resource
+def migrate_legacy_entries(bucket_name: str, object_key: str) -> int:
+    # Copies the legacy entry table to cases/ once, later processes only find the migration marker
+    return S3CaseStore(get_client('s3'), bucket_name).migrate_legacy(object_key)
+
+@st.cache_resource
+def start_entry_compactor(bucket_name: str, object_key: str):
+    # One background compactor per app process folds the entry change log into clnt_master_entry.csv
+    return start_compactor(get_client('s3'), bucket_name, object_key, list(entry_schema))
+
+@st.cache_resource
+def get_entry_cache() -> EntryCache:
+    # Shared by every session, so a rerun with nothing changed reads the case entry from memory
+    return EntryCache()
+
+@st.cache_resource
+def get_s3_cache() -> S3DiskCache:
+    # Local copies of case artifacts (images, Textract CSVs, transcripts), revalidated by ETag on every read
+    return S3DiskCache(max_bytes=512 * 1024 * 1024)
+
+@st.cache_resource
+def get_client_master(bucket_name: str = "internaldataprocess", object_key: str = "real_cu_list.csv") -> ClientMasterIndex:
+    # Indexed once per process, rebuilt only when the internal database object changes
+    return ClientMasterIndex(get_client('s3'), bucket_name, object_key, column='CU Number', skiprows=10)
 
 def main():
     st.title("KYC Intelligent Agent Management")
 
     # Get client ID from user input
     client_id = st.text_input("Enter Client ID:")
-    s3 = boto3.client('s3')
+    s3 = get_client('s3')
+    set_s3_cache(get_s3_cache())
 
     # Get entry details
     entry_bucket_name = 'client-master-entry'
     entry_object_key = 'clnt_master_entry.csv'
+    case_store = S3CaseStore(s3, entry_bucket_name, cache=get_entry_cache())
+    # Before the compactor starts rewriting clnt_master_entry.csv as the snapshot of cases/
+    migrate_legacy_entries(entry_bucket_name, entry_object_key)
+    start_entry_compactor(entry_bucket_name, entry_object_key)
 
     # Initialize session state variables
-    if 'client_entry' not in st.session_state:
-        st.session_state.client_entry = None 
     if 'df_clnt_info' not in st.session_state:
         st.session_state.df_clnt_info = None
-    if 'df_entry_table' not in st.session_state:
-        st.session_state.df_entry_table = None
+    if 'client_entry' not in st.session_state:
+        st.session_state.client_entry = None 
     else: 
-        st.session_state.df_entry_table = s3_read_csv(s3, entry_bucket_name, entry_object_key)
-        try:
-            st.session_state.client_entry = get_client_entry(st.session_state.df_entry_table, str(client_id)).iloc[0].to_dict()
-        except: 
-            st.session_state.client_entry = None 
+        st.session_state.client_entry = case_store.get(str(client_id)) if client_id else None
     # Create New Case
     # if st.button("Create New Case"):
     #     if client_id and len(str(client_id)) == 9:
@@ -53,10 +95,11 @@ def main():
     # Check if client entry exists 
     if st.button("Check Client ID"):
         if client_id and len(str(client_id)) == 9:
-            is_new_case, client_entry = check_client_entry(str(client_id), entry_bucket_name, entry_object_key)
+            is_new_case, client_entry = check_client_entry(str(client_id), case_store)
             if is_new_case:
                 st.info(f"The client for '{client_id}' does not exist.")
-                _, st.session_state.client_entry = create_client_entry(str(client_id), entry_bucket_name, entry_object_key) 
+                _, client_entry = create_client_entry(str(client_id), case_store) 
+                st.session_state.client_entry = client_entry.iloc[0].to_dict()
                 st.success(f"New case for client '{client_id}' created successfully!")
             else:
                 st.success(f"The client for '{client_id}' exists.")
@@ -69,19 +112,52 @@ def main():
     if st.button("Run Data Processing"):
         if client_id:
             with st.spinner("Running Data Processing..."):
-                internal_data_bucket = "internaldataprocess"
-                internal_data_object = "real_cu_list.csv"
-                df = s3_read_csv(s3, internal_data_bucket, internal_data_object, skiprows=10)
-                df_clnt_info = get_client_entry(df, str(client_id), 'CU Number')
+                df_clnt_info = get_client_master().lookup(str(client_id))
             st.session_state.df_clnt_info = df_clnt_info.iloc[0].to_dict()
 
             st.dataframe(df_clnt_info)                
         else:
             st.info("This client ID does not exist. Please create a new case first.")
 
+    # Run StreetView (B4.1) and Webscraping (B4.2) agents in parallel
+    if st.button("Run External Agents"):
+        client_entry = st.session_state.client_entry
+        df_clnt_info = st.session_state.df_clnt_info
+        calls = {}
+        if pd.isna(client_entry['Proc1']):
+            calls['Proc1'] = ("street_view", {
+                'CLNT_NBR': df_clnt_info['CU Number'],
+                'ADDRESS': df_clnt_info['Employer Address']
+            })
+        if pd.isna(client_entry['Proc2']):
+            calls['Proc2'] = ("externaldataprocesscode", {
+                "CLNT_NBR" : df_clnt_info['CU Number'],
+                "CUSTOMER_NAME" : df_clnt_info['Name'],
+                "OCCUPATION" : df_clnt_info['Position'],
+                "COMPANY" : df_clnt_info['Employer'],
+                "LOCATION" : df_clnt_info['Employer Address']
+            })
+        if not calls:
+            st.info("This client has already been processed by the StreetView and Webscraping Agents.")
+        else:
+            with st.spinner("Running AI agents..."):
+                responses, timings = invoke_lambda_many(list(calls.values()), timeout=300)
+            logger.info("External agent timings: %s", timings)
+            for proc, response in zip(calls, responses):
+                agent = "StreetView" if proc == 'Proc1' else "Webscraping"
+                if isinstance(response, Exception) or response.get('statusCode') != 200:
+                    st.error(f"{agent} Agent failed to run. Please try again later.")
+                    continue
+                result_object = response['image_name'] if proc == 'Proc1' else response['s3_key']
+                st.session_state.client_entry = case_store.update(str(client_id), {
+                    proc: 'Completed', proc + '_Bucket': response['bucket'], proc + '_Object': result_object
+                })
+                st.success(f"{agent} Agent completed successfully!")
+                if proc == 'Proc1':
+                    st.image(s3_read_bytes(s3, response['bucket'], result_object), width=200)
+
     # Run Webscraping agent
     if st.button("Run Webscraping Agent"):
-        st.session_state.df_entry_table = s3_read_csv(s3, entry_bucket_name, entry_object_key)
         if pd.isna(st.session_state.client_entry['Proc2']):
             with st.spinner("Running AI agents..."):
                 payload = {
@@ -99,11 +175,9 @@ def main():
 
                     st.success("Webscraping Agent completed successfully!")
 
-                    cu_pointer = st.session_state.df_entry_table['CLNT_NBR'].astype(str) == str(client_id)
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc2'] = 'Completed'
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc2_Bucket'] = external_data_bucket
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc2_Object'] = external_data_object
-                    s3_write_csv(s3, st.session_state.df_entry_table, entry_bucket_name, entry_object_key)
+                    st.session_state.client_entry = case_store.update(str(client_id), {
+                        'Proc2': 'Completed', 'Proc2_Bucket': external_data_bucket, 'Proc2_Object': external_data_object
+                    })
 
                     # response = s3.get_object(Bucket=external_data_bucket, Key=external_data_object)
                     # json_bytes = response['Body'].read()
@@ -130,7 +204,6 @@ def main():
 
     # Run StreetView agent
     if st.button("Run StreetView Agent"):
-        st.session_state.df_entry_table = s3_read_csv(s3, entry_bucket_name, entry_object_key)
         if pd.isna(st.session_state.client_entry['Proc1']):
             with st.spinner("Running AI agents..."):
                 payload = {
@@ -145,15 +218,12 @@ def main():
                     st.success("StreetView Agent completed successfully!")
 
                     # update entry table 
-                    cu_pointer = st.session_state.df_entry_table['CLNT_NBR'].astype(str) == str(client_id)
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc1'] = 'Completed'
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc1_Bucket'] = streetview_bucket
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc1_Object'] = streetview_object
-                    s3_write_csv(s3, st.session_state.df_entry_table, entry_bucket_name, entry_object_key)
+                    st.session_state.client_entry = case_store.update(str(client_id), {
+                        'Proc1': 'Completed', 'Proc1_Bucket': streetview_bucket, 'Proc1_Object': streetview_object
+                    })
                     
                     # display image
-                    response = s3.get_object(Bucket=streetview_bucket, Key=streetview_object)
-                    image_bytes = response['Body'].read()
+                    image_bytes = s3_read_bytes(s3, streetview_bucket, streetview_object)
                     st.image(image_bytes, width=200)
                 else:
                     st.info("StreetView Agent failed to run. Please try again later.")
@@ -161,8 +231,7 @@ def main():
             streetview_bucket = st.session_state.client_entry['Proc1_Bucket']
             streetview_object = st.session_state.client_entry['Proc1_Object']
 
-            response = s3.get_object(Bucket=streetview_bucket, Key=streetview_object)
-            image_bytes = response['Body'].read()
+            image_bytes = s3_read_bytes(s3, streetview_bucket, streetview_object)
 
             st.info("This client has already been processed by the StreetView Agent.")
             st.image(image_bytes, width=200)    
@@ -178,35 +247,40 @@ def main():
         st.session_state.show_voice_to_text = False
 
     if st.session_state.show_textract_uploader:
-        st.session_state.df_entry_table = s3_read_csv(s3, entry_bucket_name, entry_object_key)
         if pd.isna(st.session_state.client_entry['Proc3']):
             uploaded_files = st.file_uploader("Choose a file to upload", accept_multiple_files=True)
             output_keys = ''
-            for i, uploaded_file in enumerate(uploaded_files):
-                if uploaded_file is not None:
-                    # Read file bytes
-                    file_bytes = uploaded_file.read()
-                    # Define S3 bucket and object key (filename)
-                    upload_bucket = "doc-input-external"
-                    upload_key = uploaded_file.name
-                    output_bucket = "output-internal-cld"
-
-                    # Upload to S3
-                    s3.put_object(Bucket=upload_bucket, Key=upload_key, Body=file_bytes)
-                    st.success(f"File '{uploaded_file.name}' uploaded to S3 bucket '{upload_bucket}'.")
-
-                    # Give it some buffer time and only show download button if the file is processed
-                    output_key = "output/filtered_" + uploaded_file.name.split('.')[0] + ".csv"
-                    with st.spinner("Running AI agents for document " + str(i+1)):
-                        time.sleep(30)
-                    
-                    # Anyway, Textract should always extract something, let write it to the entry table and wait for its completion
-                    cu_pointer = st.session_state.df_entry_table['CLNT_NBR'].astype(str) == str(client_id)
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc3'] = 'Completed'
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc3_Bucket'] = output_bucket
-                    output_keys = output_keys + ';' + output_key
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc3_Object'] = output_keys
-                    s3_write_csv(s3, st.session_state.df_entry_table, entry_bucket_name, entry_object_key)
+            # Define S3 bucket and object keys (filenames)
+            upload_bucket = "doc-input-external"
+            output_bucket = "output-internal-cld"
+            uploaded_files = [uploaded_file for uploaded_file in uploaded_files if uploaded_file is not None]
+            if uploaded_files:
+                # Stream the files to S3 in parallel, multipart for large documents
+                with st.spinner("Uploading " + str(len(uploaded_files)) + " document(s)"):
+                    uploads = upload_files(s3, [(uploaded_file, uploaded_file.name) for uploaded_file in uploaded_files],
+                                           upload_bucket)
+                st.success(f"{len(uploads)} file(s) uploaded to S3 bucket '{upload_bucket}'.")
+                st.dataframe(pd.DataFrame(uploads).drop(columns='etag').rename(
+                    columns={'key': 'File', 'bytes': 'Bytes', 'seconds': 'Seconds', 'mb_per_s': 'MB/s'}))
+
+                # Wait for the completion manifests the Textract Lambda writes, all documents at once
+                with st.spinner("Running AI agents for " + str(len(uploads)) + " document(s)"):
+                    statuses = wait_for_documents(s3, output_bucket, [(upload['key'], upload['etag']) for upload in uploads])
+                for status in statuses:
+                    if status['status'] == 'completed':
+                        output_keys = output_keys + ';' + status['filtered_key']
+                    elif status['status'] == 'failed':
+                        st.error(f"Textract Agent failed for '{status['document']}': {status.get('error')}")
+                    else:
+                        st.error(f"Textract Agent did not finish '{status['document']}' in time. Please try again later.")
+
+                # Only record the stage once every document has its output
+                if all(status['status'] == 'completed' for status in statuses):
+                    st.session_state.client_entry = case_store.update(str(client_id), {
+                        'Proc3': 'Completed', 'Proc3_Bucket': output_bucket, 'Proc3_Object': output_keys
+                    })
+                else:
+                    output_keys = ''
             if output_keys != '':
                 st.success("Textract Agent completed successfully! The following files are processed: " + output_keys)
 
@@ -225,7 +299,6 @@ def main():
     if st.session_state.show_voice_to_text:
         audio_file = 'banker_conversation_vo.mp3' # audio file should be automatically generated from source system. For demo, we use a static file.
         st.info(f"The following audio file is found and will be transcribed to text: {audio_file}")
-        st.session_state.df_entry_table = s3_read_csv(s3, entry_bucket_name, entry_object_key)
 
         if pd.isna(st.session_state.client_entry['Proc4']):
             with st.spinner("Running AI agents..."):
@@ -237,15 +310,12 @@ def main():
                     st.success("Voice-to-text completed successfully!")
 
                     # update entry table 
-                    cu_pointer = st.session_state.df_entry_table['CLNT_NBR'].astype(str) == str(client_id)
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc4'] = 'Completed'
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc4_Bucket'] = transcribe_bucket
-                    st.session_state.df_entry_table.loc[cu_pointer, 'Proc4_Object'] = transcribe_object
-                    s3_write_csv(s3, st.session_state.df_entry_table, entry_bucket_name, entry_object_key)
+                    st.session_state.client_entry = case_store.update(str(client_id), {
+                        'Proc4': 'Completed', 'Proc4_Bucket': transcribe_bucket, 'Proc4_Object': transcribe_object
+                    })
                     
                     # display json
-                    response = s3.get_object(Bucket=transcribe_bucket, Key=transcribe_object)
-                    dict_from_json = json.load(response['Body'])
+                    dict_from_json = s3_read_json(s3, transcribe_bucket, transcribe_object)
                     st.success("Voice-to-Text Agent completed successfully! Message preview: " + str(dict_from_json))
                 else:
                     st.info("Voice-to-Text Agent failed to run. Please try again later.")
@@ -253,60 +323,57 @@ def main():
             transcribe_bucket = st.session_state.client_entry['Proc4_Bucket']
             transcribe_object = st.session_state.client_entry['Proc4_Object']
 
-            response = s3.get_object(Bucket=transcribe_bucket, Key=transcribe_object)
-            dict_from_json = json.load(response['Body'])
+            dict_from_json = s3_read_json(s3, transcribe_bucket, transcribe_object)
             st.success("Voice-to-Text Agent completed successfully! Message preview: " + str(dict_from_json))
 
     if st.button("Run SOW Report"): 
-        st.session_state.df_entry_table = s3_read_csv(s3, entry_bucket_name, entry_object_key)
+        client_entry = st.session_state.client_entry
+        # Fetch all evidence objects concurrently
         # textract csv ouputs
         # bucket: output-internal-cld
         # file name: filtered_Basic_Pay_stub_singledpage.csv
-        cu_pointer = st.session_state.df_entry_table['CLNT_NBR'].astype(str) == str(client_id)
-        df_textract = s3_read_csv(s3, st.session_state.client_entry['Proc3_Bucket'],
-                                  st.session_state.client_entry['Proc3_Object'].split(';')[1])
-        df_textract2 = s3_read_csv(s3, st.session_state.client_entry['Proc3_Bucket'],
-                                  st.session_state.client_entry['Proc3_Object'].split(';')[2])
-        json_textract = df_textract.to_json()
-        json_textract2 = df_textract2.to_json()
-
-        # citi internal database csv
-        internal_data_bucket = "internaldataprocess"
-        internal_data_object = "real_cu_list.csv"
-        df = s3_read_csv(s3, internal_data_bucket, internal_data_object, skiprows=10)
-        df_clnt_info = get_client_entry(df, str(client_id), 'CU Number').to_json()
-
         # transcribe json outputs
         # bucket: rmcallprocess/output/
         # file name: extracted_data_transcription-job-1754614054.json
-        transcribe_bucket = st.session_state.client_entry['Proc4_Bucket']
-        transcribe_object = st.session_state.client_entry['Proc4_Object']
-        response_transcribe = s3.get_object(Bucket=transcribe_bucket,  Key=transcribe_object)
-        json_transcribe = json.load(response_transcribe['Body'])
-        transcribe_txt = json.dumps(json_transcribe)
-
         # webscrape json outputs
         # bucket: externaldataprocess/suggestions/
         # file name: Jamie Dimon_1754539676.json
-        external_data_bucket = st.session_state.client_entry['Proc2_Bucket']
-        external_data_object = st.session_state.client_entry['Proc2_Object']
-        external_data = s3_read_json(s3, external_data_bucket, external_data_object)
+        (df_textract, df_textract2, json_transcribe, external_data, image_bytes), fetch_timings = s3_fetch_many(s3, [
+            (client_entry['Proc3_Bucket'], client_entry['Proc3_Object'].split(';')[1], decode_csv),
+            (client_entry['Proc3_Bucket'], client_entry['Proc3_Object'].split(';')[2], decode_csv),
+            (client_entry['Proc4_Bucket'], client_entry['Proc4_Object'], decode_json),
+            (client_entry['Proc2_Bucket'], client_entry['Proc2_Object'], decode_json),
+            (client_entry['Proc1_Bucket'], client_entry['Proc1_Object'], decode_bytes),
+        ])
+        logger.info("Evidence fetch timings: %s", fetch_timings)
+        json_textract = df_textract.to_json()
+        json_textract2 = df_textract2.to_json()
+        transcribe_txt = json.dumps(json_transcribe)
         webscrape_txt = json.dumps(external_data)
 
-        input_narratives = (df_clnt_info + webscrape_txt + json_textract + json_textract2 + transcribe_txt).strip(' ').replace('"', "'")
-        print(input_narratives)
+        # citi internal database csv
+        df_clnt_info = get_client_master().lookup(str(client_id)).to_json()
+
+        input_narratives = normalise_narrative(df_clnt_info + webscrape_txt + json_textract + json_textract2 + transcribe_txt)
+        logger.debug("Input narratives: %s", input_narratives)
+        # The same narrative by reference, for when it is too large to send inline
+        evidence_parts = [
+            text_part(df_clnt_info),
+            object_part(client_entry['Proc2_Bucket'], client_entry['Proc2_Object'], 'json'),
+            object_part(client_entry['Proc3_Bucket'], client_entry['Proc3_Object'].split(';')[1], 'csv'),
+            object_part(client_entry['Proc3_Bucket'], client_entry['Proc3_Object'].split(';')[2], 'csv'),
+            object_part(client_entry['Proc4_Bucket'], client_entry['Proc4_Object'], 'json'),
+        ]
         df_consol = None 
         sow_report = None 
         with st.spinner("Running AI agents..."):
-            response = invoke_lambda_function("deepseek-json-bedrock", payload={'INPUT_TEXT': input_narratives})
+            response, input_mode = invoke_lambda_with_evidence(
+                "deepseek-json-bedrock", s3, input_narratives, evidence_parts,
+                'sowreport', f"manifests/{client_id}_{int(time.time())}.json")
+            logger.info("Narrative input sent %s", input_mode)
             df_consol = s3_read_csv(s3, 'sowreport', 'sow_data.csv')
             sow_report = invoke_lambda_function("sowreport", payload={})
 
-            streetview_bucket = st.session_state.client_entry['Proc1_Bucket']
-            streetview_object = st.session_state.client_entry['Proc1_Object']
-            response = s3.get_object(Bucket=streetview_bucket, Key=streetview_object)
-            image_bytes = response['Body'].read()
-
             zip_dict = {'webscraped_data': webscrape_txt, 'json_textract': json_textract, 'json_textract2': json_textract2, 
                         'transcribe_txt': transcribe_txt, 'df_clnt_info': df_clnt_info}
             zip_buffer = io.BytesIO()
@@ -316,8 +383,7 @@ def main():
             zip_buffer.seek(0)
 
             if sow_report['statusCode'] == 200:
-                response = s3.get_object(Bucket="sowreport", Key="reports/kyc_report_1.html")
-                html_content = response['Body'].read().decode('utf-8')
+                html_content = s3_read_bytes(s3, "sowreport", "reports/kyc_report_1.html").decode('utf-8')
                 components.html(html_content, height=800, width=400, scrolling=True)
 
             st.download_button(
@@ -343,6 +409,38 @@ def main():
 
 
     
+    # Run B3-B9 as one dependency-ordered pipeline, stages already Completed in the entry table are skipped
+    pipeline_documents = st.file_uploader("Client documents for the case pipeline", accept_multiple_files=True,
+                                          key="pipeline_documents")
+    if st.button("Run Case Pipeline"):
+        if client_id and len(str(client_id)) == 9:
+            with st.spinner("Running case pipeline..."):
+                pipeline_results, pipeline_report = run_pipeline({
+                    's3': s3, 'case_store': case_store, 'clnt_nbr': str(client_id),
+                    'client_master': get_client_master(), 'timeout': 300,
+                    'documents': [(document, document.name) for document in pipeline_documents or []],
+                })
+            st.session_state.client_entry = case_store.get(str(client_id))
+            st.dataframe(pd.DataFrame(pipeline_report))
+            if 'sow_report' in pipeline_results:
+                html_content = s3_read_bytes(s3, pipeline_results['sow_report']['bucket'],
+                                             pipeline_results['sow_report']['key']).decode('utf-8')
+                components.html(html_content, height=800, width=400, scrolling=True)
+            else:
+                st.error("Case pipeline did not complete, see the stage report above.")
+        else:
+            st.info("Please enter a valid Client ID.")
+
+    # Export the entry table in the legacy clnt_master_entry.csv layout, next to the snapshot the compactor maintains
+    if st.button("Export Entry Table"):
+        export_object_key = 'exports/' + entry_object_key
+        try:
+            with st.spinner("Exporting entry table..."):
+                df_entry_table = case_store.export_csv(s3, entry_bucket_name, export_object_key)
+            st.success(f"Entry table exported to s3://{entry_bucket_name}/{export_object_key} ({len(df_entry_table)} cases)")
+        except WriteConflict:
+            st.error("The entry table export was written by someone else meanwhile. Please export again.")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,3 @@
+import utils.common_layer  # noqa: F401
+
+from common.artifacts import encode_payload, open_body, put_artifact, read_artifact, read_body
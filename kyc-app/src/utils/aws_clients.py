@@ -0,0 +1,3 @@
+import utils.common_layer  # noqa: F401
+
+from common.aws_clients import client_defaults, client_stats, configure, get_client, get_session, override_client
@@ -0,0 +1,235 @@
+import json
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from utils.case_store import CaseStore
+from utils.evidence import normalise_narrative, object_part, text_part
+from utils.invoke_lambda_function import invoke_lambda_function, invoke_lambda_with_evidence
+from utils.invoke_s3 import decode_csv, decode_json, s3_fetch_many
+from utils.textract_tracker import wait_for_documents
+from utils.uploader import upload_files
+
+
+class Stage:
+    """
+    One step of the case pipeline.
+
+    :param name: Stage name, also the key of its result in the pipeline results
+    :param run: Callable(context, results) -> dict, results holds the outputs of the finished stages
+    :param deps: Names of the stages whose outputs this stage reads
+    :param proc: Entry table column (e.g. 'Proc1') recording the stage, a stage already 'Completed' is not run again
+    :param resume: Callable(entry) -> dict rebuilding the stage output from the entry table when it is skipped
+    """
+
+    def __init__(self, name: str, run, deps: tuple = (), proc: str = None, resume=None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.proc = proc
+        self.resume = resume
+
+
+def _check_response(function_name: str, response: dict) -> dict:
+    if response.get('statusCode') != 200:
+        raise RuntimeError(f"{function_name} failed: {response}")
+    return response
+
+
+def _record(context: dict, proc: str, bucket_name: str, object_key: str) -> dict:
+    context['case_store'].update(context['clnt_nbr'], {
+        proc: 'Completed', proc + '_Bucket': bucket_name, proc + '_Object': object_key
+    })
+    return {'bucket': bucket_name, 'key': object_key}
+
+
+def _from_entry(proc: str):
+    def resume(entry: dict) -> dict:
+        return {'bucket': entry[proc + '_Bucket'], 'key': entry[proc + '_Object']}
+    return resume
+
+
+# B3: internal database
+def run_client_info(context: dict, results: dict) -> dict:
+    df_clnt_info = context['client_master'].lookup(context['clnt_nbr'])
+    if df_clnt_info.empty:
+        raise KeyError(f"Client {context['clnt_nbr']} not found in the internal database")
+    return {'record': df_clnt_info.iloc[0].to_dict(), 'json': df_clnt_info.to_json()}
+
+
+# B4.1: StreetView
+def run_street_view(context: dict, results: dict) -> dict:
+    record = results['client_info']['record']
+    response = _check_response("street_view", invoke_lambda_function("street_view", payload={
+        'CLNT_NBR': record['CU Number'],
+        'ADDRESS': record['Employer Address']
+    }, timeout=context.get('timeout')))
+    return _record(context, 'Proc1', response['bucket'], response['image_name'])
+
+
+# B4.2: web scraping
+def run_web_scraping(context: dict, results: dict) -> dict:
+    record = results['client_info']['record']
+    response = _check_response("externaldataprocesscode", invoke_lambda_function("externaldataprocesscode", payload={
+        "CLNT_NBR" : record['CU Number'],
+        "CUSTOMER_NAME" : record['Name'],
+        "OCCUPATION" : record['Position'],
+        "COMPANY" : record['Employer'],
+        "LOCATION" : record['Employer Address']
+    }, timeout=context.get('timeout')))
+    return _record(context, 'Proc2', response['bucket'], response['s3_key'])
+
+
+# B8.1: call recording transcription
+def run_transcribe(context: dict, results: dict) -> dict:
+    response = _check_response("rmcall", invoke_lambda_function(
+        "rmcall", payload={'mp3': context.get('audio_file', 'banker_conversation_vo.mp3')}, timeout=context.get('timeout')))
+    return _record(context, 'Proc4', response['body']['bucket'], response['body']['s3_key'])
+
+
+# B8.2/B8.3: uploaded documents, Textract OCR and Bedrock filtering run by the S3 triggered Lambda
+def run_textract(context: dict, results: dict) -> dict:
+    documents = context.get('documents')
+    if not documents:
+        raise ValueError("No client documents uploaded for the Textract Agent")
+    s3, output_bucket = context['s3'], context.get('textract_output_bucket', 'output-internal-cld')
+    uploads = upload_files(s3, documents, context.get('textract_input_bucket', 'doc-input-external'))
+
+    # Wait for the completion manifest of every document
+    statuses = wait_for_documents(s3, output_bucket, [(upload['key'], upload['etag']) for upload in uploads],
+                                  timeout=context.get('textract_timeout', 600))
+    unfinished = [f"{status['document']} ({status['status']})" for status in statuses if status['status'] != 'completed']
+    if unfinished:
+        raise RuntimeError(f"Textract did not complete: {unfinished}")
+    output_keys = [status['filtered_key'] for status in statuses]
+    return _record(context, 'Proc3', output_bucket, ''.join(';' + key for key in output_keys))
+
+
+# B5-B7: consolidate all evidence with the Bedrock model
+def run_consolidation(context: dict, results: dict) -> dict:
+    textract_keys = [key for key in results['textract']['key'].split(';') if key]
+    evidence, fetch_timings = s3_fetch_many(context['s3'], [
+        *[(results['textract']['bucket'], key, decode_csv) for key in textract_keys],
+        (results['transcribe']['bucket'], results['transcribe']['key'], decode_json),
+        (results['web_scraping']['bucket'], results['web_scraping']['key'], decode_json),
+    ])
+    *df_textracts, json_transcribe, external_data = evidence
+    input_narratives = normalise_narrative(results['client_info']['json'] + json.dumps(external_data)
+                                           + ''.join(df_textract.to_json() for df_textract in df_textracts)
+                                           + json.dumps(json_transcribe))
+    evidence_parts = [
+        text_part(results['client_info']['json']),
+        object_part(results['web_scraping']['bucket'], results['web_scraping']['key'], 'json'),
+        *[object_part(results['textract']['bucket'], key, 'csv') for key in textract_keys],
+        object_part(results['transcribe']['bucket'], results['transcribe']['key'], 'json'),
+    ]
+    response, input_mode = invoke_lambda_with_evidence(
+        "deepseek-json-bedrock", context['s3'], input_narratives, evidence_parts,
+        'sowreport', f"manifests/{context['clnt_nbr']}_{int(time.time())}.json", timeout=context.get('timeout'))
+    # A failed summary leaves the previous sow_data.csv in place, the report must not run on it
+    _check_response("deepseek-json-bedrock", response)
+    return {'bucket': 'sowreport', 'key': 'sow_data.csv', 'fetch_timings': fetch_timings, 'input_mode': input_mode}
+
+
+# B9: SOW report
+def run_sow_report(context: dict, results: dict) -> dict:
+    _check_response("sowreport", invoke_lambda_function("sowreport", payload={}, timeout=context.get('timeout')))
+    return {'bucket': 'sowreport', 'key': 'reports/kyc_report_1.html'}
+
+
+case_stages = [
+    Stage('client_info', run_client_info),
+    Stage('street_view', run_street_view, deps=('client_info',), proc='Proc1', resume=_from_entry('Proc1')),
+    Stage('web_scraping', run_web_scraping, deps=('client_info',), proc='Proc2', resume=_from_entry('Proc2')),
+    Stage('transcribe', run_transcribe, proc='Proc4', resume=_from_entry('Proc4')),
+    Stage('textract', run_textract, proc='Proc3', resume=_from_entry('Proc3')),
+    # The Street View image is not part of the consolidated evidence, it runs alongside without gating the report
+    Stage('consolidation', run_consolidation, deps=('client_info', 'web_scraping', 'transcribe', 'textract')),
+    Stage('sow_report', run_sow_report, deps=('consolidation',)),
+]
+
+
+def _critical_path(stages: dict, report: dict) -> list:
+    # Walk back from the last stage to finish through the dependency that finished last
+    finished = [name for name, row in report.items() if row['end'] is not None]
+    if not finished:
+        return []
+    path = [max(finished, key=lambda name: report[name]['end'])]
+    while True:
+        deps = [dep for dep in stages[path[-1]].deps if report[dep]['end'] is not None]
+        if not deps:
+            return path[::-1]
+        path.append(max(deps, key=lambda dep: report[dep]['end']))
+
+
+def run_pipeline(context: dict, stages: list = None, max_workers: int = 4) -> tuple:
+    """
+    Run the case stages as a DAG: each stage starts as soon as its dependencies finish, independent
+    stages overlap, and stages already 'Completed' in the entry table are resumed instead of rerun.
+
+    :param context: {'s3', 'case_store', 'clnt_nbr', 'client_master'} plus optional 'documents' (list of
+                    (fileobj, object_key) for Textract), 'audio_file', 'timeout' (per Lambda call)
+    :return: (results, report). results maps stage name -> output. report is one row per stage:
+             {'stage', 'status' (completed/skipped/failed/blocked), 'start', 'end', 'seconds', 'critical', 'error'}
+             with times in seconds from the pipeline start
+    """
+    stages = {stage.name: stage for stage in (stages or case_stages)}
+    case_store: CaseStore = context['case_store']
+    entry = case_store.get(context['clnt_nbr']) or {}
+    results, report = {}, {name: {'stage': name, 'status': 'pending', 'start': None, 'end': None, 'seconds': None,
+                                  'critical': False, 'error': None} for name in stages}
+    start = time.perf_counter()
+
+    def elapsed():
+        return round(time.perf_counter() - start, 3)
+
+    def timed(stage):
+        report[stage.name]['start'] = elapsed()
+        try:
+            return stage.run(context, results)
+        finally:
+            report[stage.name]['end'] = elapsed()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        def schedule():
+            # Repeat until nothing changes, a skipped stage can make its dependents ready in the same pass
+            changed = True
+            while changed:
+                changed = False
+                for name, stage in stages.items():
+                    row = report[name]
+                    if row['status'] != 'pending':
+                        continue
+                    dep_status = [report[dep]['status'] for dep in stage.deps]
+                    # A stage Completed earlier resumes from the entry table, whatever its dependencies do now
+                    if stage.proc and entry.get(stage.proc) == 'Completed':
+                        results[name] = stage.resume(entry) if stage.resume else {}
+                        row['status'], row['start'], row['end'] = 'skipped', elapsed(), elapsed()
+                    elif any(status in ('failed', 'blocked') for status in dep_status):
+                        row['status'] = 'blocked'
+                    elif all(status in ('completed', 'skipped') for status in dep_status):
+                        row['status'] = 'running'
+                        running[executor.submit(timed, stage)] = name
+                    else:
+                        continue
+                    changed = True
+
+        schedule()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                    report[name]['status'] = 'completed'
+                except Exception as e:
+                    report[name]['status'], report[name]['error'] = 'failed', repr(e)
+            schedule()
+
+    for name in _critical_path(stages, report):
+        report[name]['critical'] = True
+    for row in report.values():
+        if row['end'] is not None:
+            row['seconds'] = round(row['end'] - row['start'], 3)
+    return results, list(report.values())
@@ -0,0 +1,296 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+from abc import ABC, abstractmethod
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+from utils.change_log import append_change, default_log_prefix
+from utils.entry_cache import EntryCache
+from utils.invoke_s3 import WriteConflict, s3_put_object, s3_read_csv, s3_write_csv
+
+# Written once the legacy entry table has been copied to the per-client layout
+default_migration_marker = 'migrations/clnt_master_entry.json'
+
+# Entry schema
+entry_schema = {'CLNT_NBR': None,
+                'Proc1': None, 'Proc1_Bucket': None, 'Proc1_Object': None,
+                'Proc2': None, 'Proc2_Bucket': None, 'Proc2_Object': None,
+                'Proc3': None, 'Proc3_Bucket': None, 'Proc3_Object': None,
+                'Proc4': None, 'Proc4_Bucket': None, 'Proc4_Object': None,
+                'Score': None}
+
+
+def new_entry(clnt_nbr: str) -> dict:
+    entry = entry_schema.copy()
+    entry['CLNT_NBR'] = str(clnt_nbr)
+    return entry
+
+
+def _check_columns(changes: dict):
+    unknown = [column for column in changes if column not in entry_schema]
+    if unknown:
+        raise KeyError(f"Unknown entry columns: {unknown}")
+
+
+def _legacy_entry(row: dict) -> dict:
+    # One row of the legacy entry table as an entry, NaN cells as None
+    entry = new_entry(row['CLNT_NBR'])
+    entry.update({k: (None if pd.isna(v) else v) for k, v in row.items() if k in entry_schema and k != 'CLNT_NBR'})
+    return entry
+
+
+class CaseStore(ABC):
+    """
+    Keyed access to the client case entries, one row of `entry_schema` per CLNT_NBR.
+
+    Backends only have to implement get/put/entries, so a single case costs one
+    small read and one small write instead of a round trip of the whole entry table.
+    """
+
+    @abstractmethod
+    def get(self, clnt_nbr: str):
+        """The entry of the client, None if it has none"""
+
+    @abstractmethod
+    def put(self, entry: dict) -> dict:
+        """Create or replace the entry"""
+
+    @abstractmethod
+    def entries(self):
+        """Iterate over every entry"""
+
+    def update(self, clnt_nbr: str, changes: dict) -> dict:
+        _check_columns(changes)
+        entry = self.get(clnt_nbr)
+        if entry is None:
+            raise KeyError(f"Client entry '{clnt_nbr}' does not exist")
+        entry.update(changes)
+        return self.put(entry)
+
+    def create(self, clnt_nbr: str) -> tuple:
+        # Returns (is_new_case, entry)
+        entry = self.get(clnt_nbr)
+        if entry is not None:
+            return False, entry
+        return True, self.put(new_entry(clnt_nbr))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.entries()), columns=list(entry_schema))
+
+    def export_csv(self, s3: BaseClient, bucket_name: str, object_key: str) -> pd.DataFrame:
+        # Write the full entry table in the legacy clnt_master_entry.csv layout. The write is conditional on
+        # the object read before listing the entries, so a concurrent writer raises WriteConflict instead
+        # of being overwritten
+        try:
+            etag = s3.head_object(Bucket=bucket_name, Key=object_key)['ETag']
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+            etag = None
+        df = self.to_dataframe()
+        s3_write_csv(s3, df, bucket_name, object_key, if_match=etag, if_none_match='*' if etag is None else None)
+        return df
+
+    def import_dataframe(self, df: pd.DataFrame) -> int:
+        # One-off migration from the legacy entry table
+        count = 0
+        for row in df.to_dict(orient='records'):
+            self.put(_legacy_entry(row))
+            count += 1
+        return count
+
+
+class S3CaseStore(CaseStore):
+    """
+    One JSON object per client under `prefix`, e.g. s3://client-master-entry/cases/123456704.json
+
+    Creates and updates are conditional on the object's ETag and retried on conflict, so two
+    analysts updating different ProcN columns of the same case both land. Each applied delta
+    is also appended to the change log (see utils.change_log) unless `log_prefix` is None.
+    Pass a shared EntryCache to serve repeated reads without downloading the entry again.
+    Existing cases of the legacy entry table are copied over once with migrate_legacy().
+    """
+
+    def __init__(self, s3: BaseClient, bucket_name: str, prefix: str = 'cases/',
+                 log_prefix: str = default_log_prefix, max_retries: int = 5, cache: EntryCache = None):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.log_prefix = log_prefix
+        self.max_retries = max_retries
+        self.cache = cache
+
+    def _key(self, clnt_nbr: str) -> str:
+        return f"{self.prefix}{clnt_nbr}.json"
+
+    def _fetch(self, clnt_nbr: str) -> tuple:
+        try:
+            response = self.s3.get_object(Bucket=self.bucket_name, Key=self._key(clnt_nbr))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None, None
+            raise
+        return json.load(response['Body']), response['ETag']
+
+    def _read(self, clnt_nbr: str, use_cache: bool = True) -> tuple:
+        # Returns (entry, etag), or (None, None) if the client has no entry
+        if self.cache is not None and use_cache:
+            return self.cache.get(self.s3, self.bucket_name, self._key(clnt_nbr), lambda: self._fetch(clnt_nbr))
+        return self._fetch(clnt_nbr)
+
+    def _write(self, entry: dict, if_match: str = None, if_none_match: str = None) -> str:
+        object_key = self._key(entry['CLNT_NBR'])
+        try:
+            etag = s3_put_object(self.s3, self.bucket_name, object_key, json.dumps(entry),
+                                 if_match=if_match, if_none_match=if_none_match, ContentType='application/json')
+        except WriteConflict:
+            if self.cache is not None:
+                self.cache.invalidate(self.bucket_name, object_key)
+            raise
+        if self.cache is not None:
+            self.cache.store(self.bucket_name, object_key, entry, etag)
+        return etag
+
+    def _log(self, clnt_nbr: str, changes: dict):
+        if self.log_prefix is not None:
+            append_change(self.s3, self.bucket_name, clnt_nbr, changes, self.log_prefix)
+
+    def get(self, clnt_nbr: str):
+        return self._read(clnt_nbr)[0]
+
+    def put(self, entry: dict) -> dict:
+        self._write(entry)
+        self._log(entry['CLNT_NBR'], {k: v for k, v in entry.items() if k != 'CLNT_NBR'})
+        return entry
+
+    def create(self, clnt_nbr: str) -> tuple:
+        entry = new_entry(clnt_nbr)
+        try:
+            self._write(entry, if_none_match='*')
+        except WriteConflict:
+            # Someone else created the case first
+            return False, self.get(clnt_nbr)
+        self._log(entry['CLNT_NBR'], {k: v for k, v in entry.items() if k != 'CLNT_NBR'})
+        return True, entry
+
+    def update(self, clnt_nbr: str, changes: dict) -> dict:
+        # Optimistic concurrency: re-read and re-apply the delta whenever the ETag moved underneath us
+        _check_columns(changes)
+        for attempt in range(self.max_retries):
+            # After a conflict the cached copy is stale by definition, so go to S3
+            entry, etag = self._read(clnt_nbr, use_cache=attempt == 0)
+            if entry is None:
+                raise KeyError(f"Client entry '{clnt_nbr}' does not exist")
+            entry.update(changes)
+            try:
+                self._write(entry, if_match=etag)
+            except WriteConflict:
+                time.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+                continue
+            self._log(clnt_nbr, changes)
+            return entry
+        raise WriteConflict(f"Client entry '{clnt_nbr}' kept changing, gave up after {self.max_retries} attempts")
+
+    def entries(self):
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                response = self.s3.get_object(Bucket=self.bucket_name, Key=obj['Key'])
+                yield json.load(response['Body'])
+
+    def import_dataframe(self, df: pd.DataFrame) -> int:
+        # Create-only, a case that already exists is newer than its legacy row and is kept
+        count = 0
+        for row in df.to_dict(orient='records'):
+            try:
+                self._write(_legacy_entry(row), if_none_match='*')
+            except WriteConflict:
+                continue
+            count += 1
+        return count
+
+    def migrate_legacy(self, legacy_key: str, marker_key: str = default_migration_marker) -> int:
+        """
+        One-off copy of the legacy entry table (clnt_master_entry.csv) to one object per client.
+
+        Runs once per bucket: after a full pass a marker object is written and later calls only
+        check it (one HEAD request), the table itself is never read again.
+
+        :return: Number of cases created, 0 when the migration already ran or there is no legacy table
+        """
+        try:
+            self.s3.head_object(Bucket=self.bucket_name, Key=marker_key)
+            return 0
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+        try:
+            df = s3_read_csv(self.s3, self.bucket_name, legacy_key, dtype={'CLNT_NBR': str})
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+            df = pd.DataFrame(columns=list(entry_schema))
+        count = self.import_dataframe(df)
+        try:
+            s3_put_object(self.s3, self.bucket_name, marker_key,
+                          json.dumps({'source': legacy_key, 'rows': len(df), 'created': count,
+                                      'migrated': int(time.time())}),
+                          if_none_match='*', ContentType='application/json')
+        except WriteConflict:
+            pass  # another process finished the same migration
+        return count
+
+
+class SQLiteCaseStore(CaseStore):
+    """Embedded store for a single app host, indexed by CLNT_NBR (primary key)."""
+
+    def __init__(self, path: str = 'clnt_master_entry.db'):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ', '.join(f'"{c}"' if c != 'CLNT_NBR' else '"CLNT_NBR" TEXT PRIMARY KEY' for c in entry_schema)
+        with self._lock, self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS case_entry ({columns})")
+
+    def get(self, clnt_nbr: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM case_entry WHERE CLNT_NBR = ?", (str(clnt_nbr),)).fetchone()
+        return None if row is None else dict(zip(entry_schema, row))
+
+    def put(self, entry: dict) -> dict:
+        columns = list(entry_schema)
+        placeholders = ', '.join('?' for _ in columns)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO case_entry ({', '.join(columns)}) VALUES ({placeholders})",
+                [entry.get(c) for c in columns]
+            )
+        return entry
+
+    def update(self, clnt_nbr: str, changes: dict) -> dict:
+        # Single-row UPDATE in place, no read-modify-write round trip
+        _check_columns(changes)
+        assignments = ', '.join(f'"{c}" = ?' for c in changes)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(f"UPDATE case_entry SET {assignments} WHERE CLNT_NBR = ?",
+                                        [*changes.values(), str(clnt_nbr)])
+        if cursor.rowcount == 0:
+            raise KeyError(f"Client entry '{clnt_nbr}' does not exist")
+        return self.get(clnt_nbr)
+
+    def entries(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM case_entry ORDER BY CLNT_NBR").fetchall()
+        for row in rows:
+            yield dict(zip(entry_schema, row))
+
+
+# Example usage: migrate the legacy entry table into the per-client layout
+if __name__ == "__main__":
+    from utils.aws_clients import get_client
+
+    store = S3CaseStore(get_client('s3'), 'client-master-entry')
+    print(store.migrate_legacy('clnt_master_entry.csv'), "entries migrated")
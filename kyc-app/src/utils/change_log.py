@@ -0,0 +1,130 @@
+import json
+import logging
+import threading
+import time
+import uuid
+import pandas as pd
+
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+from utils.artifacts import open_body
+from utils.invoke_s3 import WriteConflict, s3_write_csv
+
+logger = logging.getLogger(__name__)
+
+# Change log layout: one small object per row delta, named <time>-<CLNT_NBR>-<random>.json
+# e.g. s3://client-master-entry/changes/00001754614054123456789-123456704-1a2b3c4d.json
+# The time only keeps listings roughly chronological, writers' clocks differ, so compaction never
+# orders deltas by it and reads each changed client's case object instead
+default_log_prefix = 'changes/'
+default_case_prefix = 'cases/'
+
+
+def append_change(s3: BaseClient, bucket_name: str, clnt_nbr: str, changes: dict,
+                  log_prefix: str = default_log_prefix) -> str:
+    # Every writer creates its own object, so appends never contend with each other
+    log_key = f"{log_prefix}{time.time_ns():023d}-{clnt_nbr}-{uuid.uuid4().hex[:8]}.json"
+    record = {'CLNT_NBR': str(clnt_nbr), 'changes': changes}
+    s3.put_object(Bucket=bucket_name, Key=log_key, Body=json.dumps(record), ContentType='application/json')
+    return log_key
+
+
+def list_changes(s3: BaseClient, bucket_name: str, log_prefix: str = default_log_prefix) -> list:
+    paginator = s3.get_paginator('list_objects_v2')
+    keys = []
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=log_prefix):
+        keys.extend(obj['Key'] for obj in page.get('Contents', []))
+    return sorted(keys)
+
+
+def _log_client(log_key: str, log_prefix: str) -> str:
+    # CLNT_NBR from <time>-<CLNT_NBR>-<random>.json
+    name = log_key[len(log_prefix):].rsplit('.', 1)[0]
+    return name.split('-', 1)[1].rsplit('-', 1)[0]
+
+
+def _read_case(s3: BaseClient, bucket_name: str, case_key: str):
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=case_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.load(response['Body'])
+
+
+def _read_snapshot(s3: BaseClient, bucket_name: str, snapshot_key: str) -> tuple:
+    try:
+        response = s3.get_object(Bucket=bucket_name, Key=snapshot_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None, None
+        raise
+    df = pd.read_csv(open_body(response), dtype={'CLNT_NBR': str})
+    return df, response['ETag']
+
+
+def compact_change_log(s3: BaseClient, bucket_name: str, snapshot_key: str, columns: list,
+                       log_prefix: str = default_log_prefix, max_changes: int = 10000,
+                       case_prefix: str = default_case_prefix) -> int:
+    """
+    Fold pending row deltas into the snapshot table and drop the folded log objects.
+
+    The log says which clients changed; their rows are taken from the case objects under
+    `case_prefix`, the state the conditional case writes settled on, so deltas stamped by
+    skewed clocks cannot be applied out of order. The case objects are read after the log
+    is listed, so they include every listed delta. A client without a case object gets its
+    deltas applied in listing order.
+
+    The snapshot is replaced with a conditional write, so two compactors racing each
+    other cannot lose deltas; the loser simply leaves them for the next run.
+
+    :return: Number of deltas folded into the snapshot
+    """
+    log_keys = list_changes(s3, bucket_name, log_prefix)[:max_changes]
+    if not log_keys:
+        return 0
+
+    df, etag = _read_snapshot(s3, bucket_name, snapshot_key)
+    rows = {} if df is None else {str(r['CLNT_NBR']): r for r in df.to_dict(orient='records')}
+    pending = {}
+    for log_key in log_keys:
+        pending.setdefault(_log_client(log_key, log_prefix), []).append(log_key)
+    for clnt_nbr, client_log_keys in pending.items():
+        case = _read_case(s3, bucket_name, f"{case_prefix}{clnt_nbr}.json")
+        if case is not None:
+            rows[clnt_nbr] = case
+            continue
+        row = rows.setdefault(clnt_nbr, {'CLNT_NBR': clnt_nbr})
+        for log_key in client_log_keys:
+            row.update(json.load(s3.get_object(Bucket=bucket_name, Key=log_key)['Body'])['changes'])
+
+    snapshot = pd.DataFrame(list(rows.values()), columns=columns)
+    s3_write_csv(s3, snapshot, bucket_name, snapshot_key, if_match=etag, if_none_match='*' if etag is None else None)
+
+    # delete_objects takes at most 1000 keys per call
+    for i in range(0, len(log_keys), 1000):
+        s3.delete_objects(Bucket=bucket_name,
+                          Delete={'Objects': [{'Key': k} for k in log_keys[i:i + 1000]], 'Quiet': True})
+    return len(log_keys)
+
+
+def start_compactor(s3: BaseClient, bucket_name: str, snapshot_key: str, columns: list,
+                    log_prefix: str = default_log_prefix, interval: float = 60.0,
+                    case_prefix: str = default_case_prefix) -> threading.Event:
+    # Run compact_change_log every `interval` seconds on a daemon thread; set the returned event to stop it
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                folded = compact_change_log(s3, bucket_name, snapshot_key, columns, log_prefix, case_prefix=case_prefix)
+                if folded:
+                    logger.info("Compacted %d entry changes into s3://%s/%s", folded, bucket_name, snapshot_key)
+            except WriteConflict:
+                pass  # another compactor won, the remaining deltas are picked up next round
+            except Exception:
+                logger.exception("Error compacting entry change log")
+
+    threading.Thread(target=run, name='entry-log-compactor', daemon=True).start()
+    return stop
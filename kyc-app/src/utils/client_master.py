@@ -0,0 +1,147 @@
+import csv
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import pandas as pd
+
+from botocore.client import BaseClient
+from io import BytesIO
+from utils.artifacts import open_body
+
+
+class ClientMasterIndex:
+    """
+    Point lookups into the internal client database (e.g. s3://internaldataprocess/real_cu_list.csv).
+
+    The object is downloaded once to local disk and scanned into a hash map of
+    key -> [(row number, byte offset, byte length)]. A lookup then reads and parses only
+    the header and the matching row(s), with the column dtypes pandas inferred over the whole
+    file at build time, so a lookup returns the same values as parsing the full file (an Income
+    column holding a blank somewhere stays float even when the matching row has 5000).
+    The index is rebuilt when the object's ETag changes, checked with a HEAD request at most
+    every `revalidate_after` seconds.
+    """
+
+    def __init__(self, s3: BaseClient, bucket_name: str, object_key: str, column: str = 'CU Number',
+                 skiprows: int = 10, revalidate_after: float = 60.0, cache_dir: str = None):
+        self.s3 = s3
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.column = column
+        self.skiprows = skiprows
+        self.revalidate_after = revalidate_after
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'client_master')
+        self._lock = threading.Lock()
+        self._etag = None
+        self._checked_at = None
+        self._path = None
+        self._header = b''
+        self._offsets = {}
+        self._dtypes = None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the index if the source object changed. Returns True if it was rebuilt."""
+        with self._lock:
+            if not force and self._checked_at is not None and time.monotonic() - self._checked_at < self.revalidate_after:
+                return False
+            etag = self.s3.head_object(Bucket=self.bucket_name, Key=self.object_key)['ETag']
+            self._checked_at = time.monotonic()
+            if not force and etag == self._etag:
+                return False
+            self._build()
+            return True
+
+    def _build(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=self.object_key)
+        etag = response['ETag']
+        version = etag.strip('"')
+        name = re.sub(r'[^\w.-]', '_', f"{self.bucket_name}_{self.object_key}_{version}")
+        path = os.path.join(self.cache_dir, name)
+        with open(path + '.part', 'wb') as f:
+            shutil.copyfileobj(open_body(response), f)
+        os.replace(path + '.part', path)
+
+        header, offsets = b'', {}
+        with open(path, 'rb') as f:
+            records = _iter_records(f)
+            for _ in range(self.skiprows):
+                next(records, None)
+            # Like pd.read_csv, blank lines neither hold the header nor count as rows
+            records = ((offset, record) for offset, record in records if record.strip())
+            _, header = next(records, (0, b''))
+            columns = next(csv.reader([header.decode('utf-8')]), [])
+            key_index = columns.index(self.column)
+            for row_number, (offset, record) in enumerate(records):
+                fields = next(csv.reader([record.decode('utf-8')]), [])
+                if len(fields) > key_index:
+                    offsets.setdefault(fields[key_index].strip(), []).append((row_number, offset, len(record)))
+
+        # Types depend on every row, one full parse per build so row-wise parses agree with it
+        dtypes = pd.read_csv(path, skiprows=self.skiprows).dtypes.to_dict()
+
+        old_path = self._path
+        self._path, self._header, self._offsets, self._dtypes, self._etag = path, header, offsets, dtypes, etag
+        if old_path and old_path != path and os.path.exists(old_path):
+            os.remove(old_path)
+
+    def lookup(self, clnt_nbr: str) -> pd.DataFrame:
+        # Same result as get_client_entry(df, clnt_nbr, column) on the fully parsed file, including the row index
+        self.refresh()
+        with self._lock:
+            locations = self._offsets.get(str(clnt_nbr).strip(), [])
+            df = self._parse_rows(locations)
+        df.index = [row_number for row_number, _, _ in locations]
+        return df
+
+    def lookup_many(self, clnt_nbrs) -> tuple:
+        """
+        Batch lookup: one hash probe per ID and a single parse of all matching rows.
+
+        :return: (matching rows indexed by client number, list of client numbers with no row)
+        """
+        self.refresh()
+        wanted = list(dict.fromkeys(str(c).strip() for c in clnt_nbrs))
+        locations, index, missing = [], [], []
+        with self._lock:
+            for clnt_nbr in wanted:
+                found = self._offsets.get(clnt_nbr, [])
+                if not found:
+                    missing.append(clnt_nbr)
+                locations.extend(found)
+                index.extend([clnt_nbr] * len(found))
+            df = self._parse_rows(locations)
+        df.index = pd.Index(index, name='clnt_nbr', dtype=object)
+        return df, missing
+
+    def _parse_rows(self, locations: list) -> pd.DataFrame:
+        # Caller holds the lock, so the file and offsets belong to the same index build
+        rows = []
+        with open(self._path, 'rb') as f:
+            for _, offset, length in locations:
+                f.seek(offset)
+                row = f.read(length)
+                rows.append(row if row.endswith(b'\n') else row + b'\n')
+        return pd.read_csv(BytesIO(self._header + b''.join(rows)), dtype=self._dtypes)
+
+    def __len__(self) -> int:
+        return sum(len(locations) for locations in self._offsets.values())
+
+
+def _iter_records(f):
+    # Yields (byte offset, raw record) per CSV record; a record spans several lines while a quoted field is open
+    offset, start, record, quotes = 0, 0, b'', 0
+    for line in f:
+        if not record:
+            start = offset
+        record += line
+        quotes += line.count(b'"')
+        offset += len(line)
+        if quotes % 2 == 0:
+            yield start, record
+            record, quotes = b'', 0
+    if record:
+        yield start, record
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Code shared with the Lambdas lives in their common layer (backend/lambda/common), put it on the import path
+_lambda_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'backend', 'lambda'))
+if _lambda_dir not in sys.path:
+    sys.path.append(_lambda_dir)
@@ -0,0 +1,74 @@
+import copy
+import threading
+import time
+
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+
+class EntryCache:
+    """
+    Process-wide cache of parsed S3 objects (the case entries), validated by ETag.
+
+    A cached value younger than `revalidate_after` seconds is returned without touching S3.
+    Older values are revalidated with a HEAD request and only re-downloaded and re-parsed
+    when the ETag changed. A missing object is cached too, as (None, None) with the same
+    `revalidate_after`, so looking up a client with no case does not go to S3 on every rerun.
+    Writers should call store() or invalidate() after their own writes, which replaces a cached miss.
+    """
+
+    def __init__(self, revalidate_after: float = 5.0):
+        self.revalidate_after = revalidate_after
+        self._lock = threading.Lock()
+        self._items = {}
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def get(self, s3: BaseClient, bucket_name: str, object_key: str, loader):
+        """
+        :param loader: Called as loader() on a miss, returns (value, etag) or (None, None) if the object is missing
+        :return: (value, etag) with value deep-copied so callers can mutate it
+        """
+        key = (bucket_name, object_key)
+        with self._lock:
+            item = self._items.get(key)
+        if item is not None:
+            value, etag, checked_at = item
+            if time.monotonic() - checked_at < self.revalidate_after:
+                self._count('hits')
+                return copy.deepcopy(value), etag
+            if self._head_etag(s3, bucket_name, object_key) == etag:
+                self._count('revalidated')
+                with self._lock:
+                    self._items[key] = (value, etag, time.monotonic())
+                return copy.deepcopy(value), etag
+
+        self._count('misses')
+        value, etag = loader()
+        # A miss is stored as (None, None) and revalidated like any value, HEAD answering 404 keeps it
+        self.store(bucket_name, object_key, value, etag)
+        return copy.deepcopy(value), etag
+
+    def store(self, bucket_name: str, object_key: str, value, etag: str):
+        # Write-through after our own successful write, so the next rerun needs no request at all
+        with self._lock:
+            self._items[(bucket_name, object_key)] = (copy.deepcopy(value), etag, time.monotonic())
+
+    def invalidate(self, bucket_name: str = None, object_key: str = None):
+        with self._lock:
+            if bucket_name is None:
+                self._items.clear()
+            else:
+                self._items.pop((bucket_name, object_key), None)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    @staticmethod
+    def _head_etag(s3: BaseClient, bucket_name: str, object_key: str):
+        try:
+            return s3.head_object(Bucket=bucket_name, Key=object_key)['ETag']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
@@ -0,0 +1,3 @@
+import utils.common_layer  # noqa: F401
+
+from common.evidence import build_manifest, normalise_narrative, object_part, resolve_manifest, text_part
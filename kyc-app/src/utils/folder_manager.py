@@ -1,55 +1,109 @@
-import boto3
+import tracemalloc
 import pandas as pd
 
-from utils.invoke_s3 import s3_read_csv, s3_write_csv
-from io import StringIO
-
-# Entry schema
-entry_schema = {'CLNT_NBR': None, 
-                'Proc1': None, 'Proc1_Bucket': None, 'Proc1_Object': None,
-                'Proc2': None, 'Proc2_Bucket': None, 'Proc2_Object': None,
-                'Proc3': None, 'Proc3_Bucket': None, 'Proc3_Object': None,
-                'Proc4': None, 'Proc4_Bucket': None, 'Proc4_Object': None,
-                'Score': None}
+from botocore.client import BaseClient
+from utils.artifacts import open_body
+from utils.case_store import CaseStore, entry_schema
 
 def get_client_entry(df: pd.DataFrame, clnt_nbr: str, column: str='CLNT_NBR') -> pd.DataFrame:
     return df[df[column].astype(str) == clnt_nbr]
 
+def get_client_entries(df: pd.DataFrame, clnt_nbrs, column: str='CLNT_NBR') -> tuple:
+    """
+    Batch get_client_entry, e.g. for the B1-2 KYC alert list: one string cast and one hash join for all IDs.
+
+    :return: (matching rows indexed by client number, list of client numbers with no row)
+    """
+    wanted = pd.Index(pd.unique(pd.Series([str(c) for c in clnt_nbrs], dtype=object)), name='clnt_nbr')
+    keys = df[column].astype(str)
+    hit = keys.isin(wanted)
+    result = df[hit].set_axis(pd.Index(keys[hit], name='clnt_nbr'))
+    missing = wanted[~wanted.isin(result.index)].tolist()
+    return result, missing
+
+class _CountingReader:
+    # File-like wrapper over the S3 streaming body that counts the bytes pulled by the parser
+    def __init__(self, body):
+        self.body = body
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.body.read(size if size is not None and size >= 0 else None)
+        self.bytes_read += len(data)
+        return data
+
+def scan_client_entry(s3: BaseClient, bucket_name: str, object_key: str, clnt_nbrs, column: str='CLNT_NBR',
+                      skiprows=None, chunksize: int=50000) -> tuple:
+    """
+    Streaming variant of get_client_entry for client files too large to load in memory.
+
+    The S3 body is parsed `chunksize` rows at a time, so memory stays bounded by one chunk
+    whatever the file size, and the download stops as soon as every requested client was seen.
+
+    :param clnt_nbrs: A client number or a list of client numbers
+    :return: (matching rows, stats) where stats has rows_scanned, bytes_read, chunks, stopped_early and peak_memory_bytes
+    """
+    wanted = {str(clnt_nbrs)} if isinstance(clnt_nbrs, (str, int)) else {str(c) for c in clnt_nbrs}
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+
+    response = s3.get_object(Bucket=bucket_name, Key=object_key)
+    body = response['Body']
+    reader = _CountingReader(open_body(response))
+    matches, found, rows_scanned, chunks, stopped_early = [], set(), 0, 0, False
+    columns = [column]
+    try:
+        with pd.read_csv(reader, skiprows=skiprows, chunksize=chunksize) as chunk_reader:
+            for chunk in chunk_reader:
+                chunks += 1
+                rows_scanned += len(chunk)
+                columns = chunk.columns
+                keys = chunk[column].astype(str)
+                hit = keys.isin(wanted)
+                if hit.any():
+                    matches.append(chunk[hit])
+                    found.update(keys[hit])
+                if found >= wanted:
+                    stopped_early = True
+                    break
+    finally:
+        body.close()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+
+    df = pd.concat(matches) if matches else pd.DataFrame(columns=columns)
+    stats = {'rows_scanned': rows_scanned, 'bytes_read': reader.bytes_read, 'chunks': chunks,
+             'stopped_early': stopped_early, 'peak_memory_bytes': peak_memory}
+    return df, stats
+
 # Function to create a new client entry
-def create_client_entry(clnt_nbr: str, bucket_name: str, object_key: str) -> tuple:
-    # Initialize S3 client
-    s3 = boto3.client('s3')
-    df = s3_read_csv(s3, bucket_name, object_key)
+def create_client_entry(clnt_nbr: str, store: CaseStore) -> tuple:
+    # Only the client's own entry is read and written
+    is_new_case, entry = store.create(clnt_nbr)
 
-    # Check if customer_id already exists
-    is_new_case = clnt_nbr not in df['CLNT_NBR'].astype(str).values
-
-    # Check if customer_id exists
-    if is_new_case:
-        # Append new row (customize columns as needed)
-        new_row = entry_schema.copy()
-        new_row['CLNT_NBR'] = clnt_nbr
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        s3_write_csv(s3, df, bucket_name, object_key)  # Upload updated CSV back to S3
-
-    # Filter the DataFrame for the specific client number
-    client_entry = get_client_entry(df, clnt_nbr)
+    # Return the entry in the same one-row DataFrame layout as the entry table
+    client_entry = pd.DataFrame([entry], columns=list(entry_schema))
     return is_new_case, client_entry
 
 # Function to check if a client entry exists
-def check_client_entry(clnt_nbr: str, bucket_name: str, object_key: str) -> tuple:
-    # Initialize S3 client
-    s3 = boto3.client('s3')
-    df = s3_read_csv(s3, bucket_name, object_key)
+def check_client_entry(clnt_nbr: str, store: CaseStore) -> tuple:
+    entry = store.get(clnt_nbr)
 
     # Check if customer_id already exists
-    is_new_case = clnt_nbr not in df['CLNT_NBR'].astype(str).values
+    is_new_case = entry is None
 
-    # Check if customer_id exists
-    client_entry = get_client_entry(df, clnt_nbr)
+    client_entry = pd.DataFrame([entry] if entry else [], columns=list(entry_schema))
     return is_new_case, client_entry
 
 # Example usage
 if __name__ == "__main__":
-    bool_clnt_found, this_record = create_client_entry('123456')
-    print(bool_clnt_found, this_record)
\ No newline at end of file
+    from utils.aws_clients import get_client
+    from utils.case_store import S3CaseStore
+
+    store = S3CaseStore(get_client('s3'), 'client-master-entry')
+    bool_clnt_found, this_record = create_client_entry('123456', store)
+    print(bool_clnt_found, this_record)
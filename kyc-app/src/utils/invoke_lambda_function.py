@@ -1,17 +1,44 @@
-import boto3
 import json
+import threading
+import time
 
-def invoke_lambda_function(function_name, payload=None, region_name='us-east-1'):
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.artifacts import put_artifact
+from utils.aws_clients import get_client
+from utils.evidence import build_manifest
+
+# Synchronous invocations are capped at 6 MB of request payload, keep a margin for the JSON envelope
+max_inline_payload_bytes = 5 * 1024 * 1024
+
+# Background pool behind invoke_lambda_async, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='lambda-invoke')
+        return _executor
+
+def _lambda_client(region_name, timeout=None):
+    if timeout is None:
+        return get_client('lambda', region_name=region_name)
+    # Bounded call: the read times out after `timeout` seconds and is not retried, a retry would run the agent twice
+    return get_client('lambda', region_name=region_name, read_timeout=timeout, max_attempts=1)
+
+def invoke_lambda_function(function_name, payload=None, region_name='us-east-1', timeout=None):
     """
     Invokes an AWS Lambda function from an EC2 instance
     
     :param function_name: Name of the Lambda function to invoke
     :param payload: Input data for the Lambda function (dict)
     :param region_name: AWS region where the Lambda function resides
+    :param timeout: Optional limit in seconds on waiting for the response
     :return: Response from the Lambda function
     """
-    # Initialize a Lambda client
-    lambda_client = boto3.client('lambda', region_name=region_name)
+    # Shared Lambda client, reused across calls
+    lambda_client = _lambda_client(region_name, timeout)
     
     # Convert payload to JSON string if provided
     if payload is not None and not isinstance(payload, str):
@@ -33,6 +60,60 @@ def invoke_lambda_function(function_name, payload=None, region_name='us-east-1')
         print(f"Error invoking Lambda function: {e}")
         raise
 
+def invoke_lambda_with_evidence(function_name, s3, input_text: str, parts: list, manifest_bucket: str,
+                                manifest_key: str, max_inline_bytes: int = max_inline_payload_bytes,
+                                region_name='us-east-1', timeout=None) -> tuple:
+    """
+    Send a consolidated narrative inline as INPUT_TEXT when it fits in a synchronous payload, otherwise write
+    an evidence manifest to S3 and send INPUT_MANIFEST so the Lambda fetches the evidence itself.
+
+    :param input_text: The narrative as it would be sent inline
+    :param parts: The same narrative as manifest parts (utils.evidence text_part/object_part), in order
+    :param manifest_bucket: Where to write the manifest in by-reference mode
+    :param manifest_key: Object key of the manifest
+    :return: (response, mode) with mode 'inline' or 'reference'
+    """
+    payload = json.dumps({'INPUT_TEXT': input_text})
+    if len(payload.encode('utf-8')) <= max_inline_bytes:
+        return invoke_lambda_function(function_name, payload, region_name, timeout), 'inline'
+    put_artifact(s3, manifest_bucket, manifest_key, json.dumps(build_manifest(parts)), content_type='application/json')
+    payload = {'INPUT_MANIFEST': {'bucket': manifest_bucket, 'key': manifest_key}}
+    return invoke_lambda_function(function_name, payload, region_name, timeout), 'reference'
+
+def invoke_lambda_async(function_name, payload=None, region_name='us-east-1', timeout=None) -> Future:
+    """
+    Start invoke_lambda_function on a background thread and return immediately.
+
+    :return: concurrent.futures.Future resolving to the Lambda response, wrap it with asyncio.wrap_future
+             to await it from a coroutine
+    """
+    return _get_executor().submit(invoke_lambda_function, function_name, payload, region_name, timeout)
+
+def invoke_lambda_many(calls: list, max_concurrency: int = 4, timeout=None, region_name='us-east-1') -> tuple:
+    """
+    Invoke several Lambda functions concurrently, the whole fan-out takes about as long as the slowest call.
+
+    :param calls: List of (function_name, payload)
+    :param max_concurrency: Upper bound on calls in flight
+    :param timeout: Per-call limit in seconds on waiting for a response
+    :return: (results, timings) both in call order. results[i] is the Lambda response, or the exception the call
+             raised so one failing agent does not lose the others. timings[i] = {'function', 'seconds', 'ok'}
+    """
+    def invoke(call):
+        function_name, payload = call
+        start = time.perf_counter()
+        try:
+            result, ok = invoke_lambda_function(function_name, payload, region_name, timeout), True
+        except Exception as e:
+            result, ok = e, False
+        return result, {'function': function_name, 'seconds': round(time.perf_counter() - start, 3), 'ok': ok}
+
+    if not calls:
+        return [], []
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(calls))) as executor:
+        invoked = list(executor.map(invoke, calls))
+    return [result for result, _ in invoked], [timing for _, timing in invoked]
+
 if __name__ == "__main__":
     # Example usage
     lambda_function_name = "street_view"
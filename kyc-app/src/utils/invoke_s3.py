@@ -1,27 +1,113 @@
 import pandas as pd
 import json 
+import time
 
 from botocore.client import BaseClient
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
-from io import StringIO
+from io import BytesIO
+from utils.artifacts import encode_payload, open_body, read_body
 
-def s3_write_csv(s3: BaseClient, df: pd.DataFrame, bucket_name: str, object_key: str):
-    # Convert DataFrame to CSV and upload to S3
-    csv_buffer = StringIO()
-    df.to_csv(csv_buffer, index=False)
-    s3.put_object(Bucket=bucket_name, Key=object_key, Body=csv_buffer.getvalue())
+# Optional read-through local cache (utils.s3_cache.S3DiskCache) used by the read helpers below
+_s3_cache = None
 
-def s3_read_csv(s3: BaseClient, bucket_name: str, object_key: str, skiprows = None) -> pd.DataFrame:
-    # Read CSV from S3 and return as DataFrame
-    csv_obj = s3.get_object(Bucket=bucket_name, Key=object_key)
-    body = csv_obj['Body'].read().decode('utf-8')
-    return pd.read_csv(StringIO(body), skiprows=skiprows)
+def set_s3_cache(cache):
+    global _s3_cache
+    _s3_cache = cache
+
+def _get_object(s3: BaseClient, bucket_name: str, object_key: str) -> dict:
+    if _s3_cache is not None:
+        return _s3_cache.get_object(s3, bucket_name, object_key)
+    return s3.get_object(Bucket=bucket_name, Key=object_key)
+
+class WriteConflict(Exception):
+    """The object changed (or already exists) since it was read, so a conditional write was rejected."""
+
+
+def s3_put_object(s3: BaseClient, bucket_name: str, object_key: str, body, if_match: str = None,
+                  if_none_match: str = None, **kwargs) -> str:
+    # Conditional put: if_match=<ETag> only overwrites the version we read, if_none_match='*' only creates
+    if if_match is not None:
+        kwargs['IfMatch'] = if_match
+    if if_none_match is not None:
+        kwargs['IfNoneMatch'] = if_none_match
+    try:
+        response = s3.put_object(Bucket=bucket_name, Key=object_key, Body=body, **kwargs)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+            raise WriteConflict(f"s3://{bucket_name}/{object_key} was modified concurrently") from e
+        raise
+    return response['ETag']
+
+def s3_write_csv(s3: BaseClient, df: pd.DataFrame, bucket_name: str, object_key: str, if_match: str = None,
+                 if_none_match: str = None) -> str:
+    # Encode the DataFrame into one bytes buffer, compress it (see common.artifacts) and upload, returns the new ETag
+    csv_buffer = BytesIO()
+    df.to_csv(csv_buffer, index=False, encoding='utf-8')
+    payload, content_encoding = encode_payload(csv_buffer.getvalue())
+    extra_args = {'ContentEncoding': content_encoding} if content_encoding else {}
+    return s3_put_object(s3, bucket_name, object_key, payload, if_match=if_match, if_none_match=if_none_match,
+                         ContentType='text/csv', **extra_args)
+
+def s3_read_csv(s3: BaseClient, bucket_name: str, object_key: str, skiprows = None, usecols = None,
+                dtype = None, **kwargs) -> pd.DataFrame:
+    # Parse the CSV directly from the S3 streaming body, no intermediate bytes/str copies of the whole file
+    # usecols projects columns while parsing, dtype skips type inference for the given columns
+    csv_obj = _get_object(s3, bucket_name, object_key)
+    return pd.read_csv(open_body(csv_obj), skiprows=skiprows, usecols=usecols, dtype=dtype, **kwargs)
 
 def s3_read_json(s3: BaseClient, bucket_name: str, object_key: str):
-    # Read json from S3 and return as DataFrame
-    json_obj = s3.get_object(Bucket=bucket_name, Key=object_key)
-    body = json_obj['Body'].read()
-    return json.loads(body)
+    # Parse json directly from the S3 streaming body
+    json_obj = _get_object(s3, bucket_name, object_key)
+    return json.load(open_body(json_obj))
+
+def s3_read_bytes(s3: BaseClient, bucket_name: str, object_key: str) -> bytes:
+    return read_body(_get_object(s3, bucket_name, object_key))
+
+def s3_write_parquet(s3: BaseClient, df: pd.DataFrame, bucket_name: str, object_key: str,
+                     compression: str = 'snappy') -> str:
+    # Columnar copy of a table for fast, typed, column-projected reads (needs pyarrow)
+    parquet_buffer = BytesIO()
+    df.to_parquet(parquet_buffer, index=False, compression=compression)
+    parquet_buffer.seek(0)
+    return s3_put_object(s3, bucket_name, object_key, parquet_buffer)
+
+def s3_read_parquet(s3: BaseClient, bucket_name: str, object_key: str, columns: list = None) -> pd.DataFrame:
+    # Parquet needs random access to its footer, so the body is read once into a single buffer and parsed in place
+    parquet_obj = _get_object(s3, bucket_name, object_key)
+    return pd.read_parquet(BytesIO(read_body(parquet_obj)), columns=columns)
+
+# Decoders for s3_fetch_many, each takes the (decompressed) S3 streaming body
+def decode_bytes(body) -> bytes:
+    return body.read()
+
+def decode_json(body):
+    return json.load(body)
+
+def decode_csv(body, **kwargs) -> pd.DataFrame:
+    # e.g. functools.partial(decode_csv, skiprows=10)
+    return pd.read_csv(body, **kwargs)
+
+def s3_fetch_many(s3: BaseClient, requests: list, max_workers: int = 8) -> tuple:
+    """
+    Fetch and decode several objects concurrently on a bounded thread pool.
+
+    :param requests: List of (bucket_name, object_key, decoder)
+    :param max_workers: Upper bound on concurrent GETs, keep it within the client's max_pool_connections
+    :return: (results, timings) both in request order, timings[i] = {'bucket', 'key', 'seconds'}
+    """
+    def fetch(request):
+        bucket_name, object_key, decoder = request
+        start = time.perf_counter()
+        response = _get_object(s3, bucket_name, object_key)
+        result = decoder(open_body(response))
+        return result, {'bucket': bucket_name, 'key': object_key, 'seconds': time.perf_counter() - start}
+
+    if not requests:
+        return [], []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(requests))) as executor:
+        fetched = list(executor.map(fetch, requests))
+    return [result for result, _ in fetched], [timing for _, timing in fetched]
 
 def s3_file_exists(s3, bucket_name, object_key):
     try:
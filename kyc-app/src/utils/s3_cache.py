@@ -0,0 +1,177 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+from collections import OrderedDict
+from io import BytesIO
+
+
+class S3DiskCache:
+    """
+    Read-through local disk cache of S3 objects, keyed by bucket/key and validated by ETag.
+
+    Every read is a conditional GET (If-None-Match: <cached ETag>). An unchanged object answers
+    304 with no body and is served from disk; a changed one is downloaded and replaces the copy.
+    The cache holds at most `max_bytes` and evicts the least recently used objects first.
+    Bodies are served as in-memory buffers, no file handle is left open for the caller to close.
+
+    index.json is rewritten after an eviction, every `index_batch` new objects, on flush() and at exit,
+    not on every store. Files a crash left out of the index are removed when the index is loaded.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = 512 * 1024 * 1024, index_batch: int = 20):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 's3_cache')
+        self.max_bytes = max_bytes
+        self.index_batch = index_batch
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # (bucket, key) -> {'etag', 'size', 'file', 'metadata'}, oldest first
+        self._size = 0
+        self._unsaved = 0
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0,
+                      'bytes_from_cache': 0, 'bytes_downloaded': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+        atexit.register(self.flush)
+
+    def get_object(self, s3: BaseClient, bucket_name: str, object_key: str) -> dict:
+        """Same shape as s3.get_object: {'Body', 'ETag', 'ContentLength', 'ContentType', 'ContentEncoding'}"""
+        key = (bucket_name, object_key)
+        with self._lock:
+            entry = self._index.get(key)
+        try:
+            if entry is None:
+                response = s3.get_object(Bucket=bucket_name, Key=object_key)
+            else:
+                response = s3.get_object(Bucket=bucket_name, Key=object_key, IfNoneMatch=entry['etag'])
+        except ClientError as e:
+            if entry is None or e.response['Error']['Code'] not in ('304', 'NotModified'):
+                raise
+            body = self._open(key, entry)
+            if body is not None:
+                self._count('hits')
+                self._count('bytes_from_cache', entry['size'])
+                return self._response(body, entry)
+            # The cached file vanished under us, fall back to a plain download
+            response = s3.get_object(Bucket=bucket_name, Key=object_key)
+
+        self._count('misses' if entry is None else 'stale')
+        if response.get('ContentLength', 0) > self.max_bytes:
+            # Larger than the whole cache, stream it through
+            return response
+        return self._store(key, response)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._index.values():
+                self._remove_file(entry)
+            self._index.clear()
+            self._size = 0
+            self._save_index()
+
+    def flush(self):
+        # Persist the index now
+        with self._lock:
+            if self._unsaved:
+                self._save_index()
+
+    def _open(self, key: tuple, entry: dict):
+        with self._lock:
+            if self._index.get(key) is not entry:
+                return None
+            try:
+                body = self._read_file(entry['file'])
+            except FileNotFoundError:
+                del self._index[key]
+                self._size -= entry['size']
+                return None
+            self._index.move_to_end(key)
+            return body
+
+    def _store(self, key: tuple, response: dict) -> dict:
+        file_name = hashlib.sha1('/'.join(key).encode('utf-8')).hexdigest()
+        path = os.path.join(self.cache_dir, file_name)
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, delete=False) as f:
+            try:
+                shutil.copyfileobj(response['Body'], f)
+            except Exception:
+                f.close()
+                os.remove(f.name)
+                raise
+            size = f.tell()
+        entry = {'etag': response['ETag'], 'size': size, 'file': file_name,
+                 'metadata': {k: response[k] for k in ('ContentType', 'ContentEncoding') if response.get(k)}}
+        with self._lock:
+            os.replace(f.name, path)
+            # Read before evicting, this file may be evicted right away
+            body = self._read_file(file_name)
+            replaced = self._index.pop(key, None)
+            if replaced is not None:
+                self._size -= replaced['size']
+            self._index[key] = entry
+            self._size += size
+            self.stats['bytes_downloaded'] += size
+            self._unsaved += 1
+            evicted_any = False
+            while self._size > self.max_bytes and len(self._index) > 1:
+                _, evicted = self._index.popitem(last=False)
+                self._size -= evicted['size']
+                self._remove_file(evicted)
+                self.stats['evictions'] += 1
+                evicted_any = True
+            if evicted_any or self._unsaved >= self.index_batch:
+                self._save_index()
+        return self._response(body, entry)
+
+    def _read_file(self, file_name: str) -> BytesIO:
+        with open(os.path.join(self.cache_dir, file_name), 'rb') as f:
+            return BytesIO(f.read())
+
+    def _response(self, body, entry: dict) -> dict:
+        return {'Body': body, 'ETag': entry['etag'], 'ContentLength': entry['size'], **entry['metadata']}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _remove_file(self, entry: dict):
+        try:
+            os.remove(os.path.join(self.cache_dir, entry['file']))
+        except FileNotFoundError:
+            pass
+
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _load_index(self):
+        # The index survives restarts of the app, in least recently used order
+        try:
+            with open(self._index_path()) as f:
+                items = json.load(f)
+        except (FileNotFoundError, ValueError):
+            items = []
+        for bucket_name, object_key, entry in items:
+            if os.path.exists(os.path.join(self.cache_dir, entry['file'])):
+                self._index[(bucket_name, object_key)] = entry
+                self._size += entry['size']
+        # Objects stored after the last index write of a previous run are unknown, drop their files
+        known = {entry['file'] for entry in self._index.values()}
+        for file_name in os.listdir(self.cache_dir):
+            if re.fullmatch(r'[0-9a-f]{40}', file_name) and file_name not in known:
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except OSError:
+                    pass
+
+    def _save_index(self):
+        # Caller holds the lock
+        self._unsaved = 0
+        with open(self._index_path() + '.part', 'w') as f:
+            json.dump([[b, k, e] for (b, k), e in self._index.items()], f)
+        os.replace(self._index_path() + '.part', self._index_path())
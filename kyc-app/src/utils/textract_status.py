@@ -0,0 +1,3 @@
+import utils.common_layer  # noqa: F401
+
+from common.textract_status import normalise_etag, output_keys, read_status, status_key
@@ -0,0 +1,44 @@
+import time
+
+from botocore.client import BaseClient
+from concurrent.futures import ThreadPoolExecutor
+from utils.textract_status import normalise_etag, output_keys, read_status
+
+
+def wait_for_document(s3: BaseClient, bucket_name: str, document: str, source_etag: str, timeout: float = 600,
+                      initial_delay: float = 1.0, max_delay: float = 10.0) -> dict:
+    """
+    Poll the completion manifest of one uploaded document with exponential backoff.
+
+    :param source_etag: ETag of the upload, manifests of earlier uploads of the same file name are ignored
+    :return: The manifest ('status' completed or failed), or {'status': 'timeout'} if none arrived in time
+    """
+    start = time.monotonic()
+    delay = initial_delay
+    while True:
+        manifest = read_status(s3, bucket_name, document)
+        if manifest is not None and manifest.get('source_etag') == normalise_etag(source_etag):
+            manifest['waited'] = round(time.monotonic() - start, 3)
+            return manifest
+        if time.monotonic() - start + delay > timeout:
+            raw_key, filtered_key = output_keys(document)
+            return {'document': document, 'status': 'timeout', 'raw_key': raw_key, 'filtered_key': filtered_key,
+                    'waited': round(time.monotonic() - start, 3)}
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def wait_for_documents(s3: BaseClient, bucket_name: str, documents: list, timeout: float = 600,
+                       max_workers: int = 8) -> list:
+    """
+    Wait for several documents at once, total wait is about the slowest document rather than the sum.
+
+    :param documents: List of (document, source_etag)
+    :return: One wait_for_document result per document, in input order
+    """
+    if not documents:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(documents))) as executor:
+        futures = [executor.submit(wait_for_document, s3, bucket_name, document, source_etag, timeout)
+                   for document, source_etag in documents]
+        return [future.result() for future in futures]
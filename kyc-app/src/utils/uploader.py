@@ -0,0 +1,57 @@
+import time
+
+from boto3.s3.transfer import TransferConfig
+from botocore.client import BaseClient
+from concurrent.futures import ThreadPoolExecutor
+
+MB = 1024 * 1024
+
+# Files above 8 MB go multipart in 8 MB parts, 4 parts in flight per file.
+# Buffered memory per file stays around part size * max_io_queue, whatever the file size.
+default_transfer_config = TransferConfig(
+    multipart_threshold=8 * MB,
+    multipart_chunksize=8 * MB,
+    max_concurrency=4,
+    max_io_queue=8,
+    use_threads=True,
+)
+
+
+def upload_file(s3: BaseClient, fileobj, bucket_name: str, object_key: str,
+                config: TransferConfig = default_transfer_config, extra_args: dict = None) -> dict:
+    """
+    Stream a file-like object to S3, multipart with concurrent part uploads once it exceeds the threshold.
+
+    :param fileobj: Readable binary file object, e.g. a Streamlit UploadedFile, read in parts rather than all at once
+    :return: {'key', 'etag', 'bytes', 'seconds', 'mb_per_s'}
+    """
+    start = time.perf_counter()
+    sent = [0]
+
+    def progress(bytes_amount):
+        sent[0] += bytes_amount
+
+    s3.upload_fileobj(fileobj, bucket_name, object_key, ExtraArgs=extra_args, Config=config, Callback=progress)
+    seconds = time.perf_counter() - start
+    # upload_fileobj does not return the ETag, the Textract completion manifest is matched against it
+    etag = s3.head_object(Bucket=bucket_name, Key=object_key)['ETag']
+    return {'key': object_key, 'etag': etag, 'bytes': sent[0], 'seconds': round(seconds, 3),
+            'mb_per_s': round(sent[0] / MB / seconds, 2) if seconds > 0 else None}
+
+
+def upload_files(s3: BaseClient, files: list, bucket_name: str, max_files: int = 3,
+                 config: TransferConfig = default_transfer_config) -> list:
+    """
+    Upload several files in parallel, each one through upload_file.
+
+    :param files: List of (fileobj, object_key)
+    :param max_files: Files uploaded at once, max_files * config.max_concurrency should stay within the
+                      client's max_pool_connections
+    :return: One upload_file result per file, in input order
+    """
+    if not files:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_files, len(files))) as executor:
+        futures = [executor.submit(upload_file, s3, fileobj, bucket_name, object_key, config)
+                   for fileobj, object_key in files]
+        return [future.result() for future in futures]
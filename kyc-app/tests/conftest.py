@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Import utils as app.py does, and use the in-memory S3 of the Lambda harness
+_root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for _path in (os.path.join(_root_dir, 'kyc-app', 'src'), os.path.join(_root_dir, 'backend', 'harness')):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
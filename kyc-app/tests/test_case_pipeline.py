@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from utils import case_pipeline
+from utils.case_pipeline import Stage, run_consolidation, run_pipeline
+
+
+class _Store:
+    def __init__(self, entry):
+        self.entry = entry
+
+    def get(self, clnt_nbr):
+        return self.entry
+
+
+def _statuses(report):
+    return {row['stage']: row['status'] for row in report}
+
+
+def test_completed_stage_is_resumed_even_if_a_dependency_fails():
+    def fail(context, results):
+        raise RuntimeError('lookup failed')
+    stages = [Stage('client_info', fail),
+              Stage('street_view', lambda context, results: {}, deps=('client_info',), proc='Proc1',
+                    resume=lambda entry: {'bucket': entry['Proc1_Bucket']}),
+              Stage('web_scraping', lambda context, results: {}, deps=('client_info',))]
+    results, report = run_pipeline({'case_store': _Store({'Proc1': 'Completed', 'Proc1_Bucket': 'b'}),
+                                    'clnt_nbr': '123456704'}, stages)
+    assert _statuses(report) == {'client_info': 'failed', 'street_view': 'skipped', 'web_scraping': 'blocked'}
+    assert results['street_view'] == {'bucket': 'b'}
+
+
+def test_consolidation_does_not_wait_for_street_view():
+    consolidation = next(stage for stage in case_pipeline.case_stages if stage.name == 'consolidation')
+    assert 'street_view' not in consolidation.deps
+
+
+def test_failed_summary_stops_the_pipeline(monkeypatch):
+    monkeypatch.setattr(case_pipeline, 's3_fetch_many', lambda s3, requests: (
+        [pd.DataFrame({'a': [1]}), {'t': 1}, {'w': 1}], []))
+    monkeypatch.setattr(case_pipeline, 'invoke_lambda_with_evidence',
+                        lambda *args, **kwargs: ({'statusCode': 500, 'body': 'error'}, 'inline'))
+    results = {'client_info': {'json': '{}'}, 'textract': {'bucket': 'o', 'key': ';filtered.csv'},
+               'transcribe': {'bucket': 't', 'key': 't.json'}, 'web_scraping': {'bucket': 'w', 'key': 'w.json'}}
+    context = {'s3': None, 'clnt_nbr': '123456704', 'case_store': _Store({})}
+    with pytest.raises(RuntimeError):
+        run_consolidation(context, results)
+
+    stages = [Stage('consolidation', lambda context, _: run_consolidation(context, results)),
+              Stage('sow_report', lambda context, results: pytest.fail('ran on a stale sow_data.csv'),
+                    deps=('consolidation',))]
+    _, report = run_pipeline(context, stages)
+    assert _statuses(report) == {'consolidation': 'failed', 'sow_report': 'blocked'}
@@ -0,0 +1,130 @@
+import json
+
+import pandas as pd
+import pytest
+
+from fakes import FakeS3
+from utils.case_store import CaseStore, S3CaseStore
+from utils.entry_cache import EntryCache
+from utils.invoke_s3 import WriteConflict, s3_read_csv, s3_write_csv
+
+bucket_name = 'client-master-entry'
+legacy_key = 'clnt_master_entry.csv'
+
+
+@pytest.fixture
+def s3():
+    s3 = FakeS3()
+    s3.create_bucket(Bucket=bucket_name)
+    return s3
+
+
+def _case(s3, clnt_nbr):
+    return json.loads(s3.get_object(Bucket=bucket_name, Key=f'cases/{clnt_nbr}.json')['Body'].read())
+
+
+def test_create_get_update(s3):
+    store = S3CaseStore(s3, bucket_name)
+    assert store.create('123456704')[0] is True
+    assert store.create('123456704')[0] is False
+    store.update('123456704', {'Proc1': 'Completed', 'Proc1_Bucket': 'streetviewimages'})
+    assert store.get('123456704')['Proc1'] == 'Completed'
+    assert store.get('000000000') is None
+    with pytest.raises(KeyError):
+        store.update('000000000', {'Proc1': 'Completed'})
+    with pytest.raises(KeyError):
+        store.update('123456704', {'NotAColumn': 1})
+
+
+def test_concurrent_updates_of_different_columns_both_land(s3):
+    first = S3CaseStore(s3, bucket_name, cache=EntryCache(revalidate_after=60))
+    second = S3CaseStore(s3, bucket_name)
+    first.create('123456704')
+    first.get('123456704')
+    # The first store's cached ETag is stale after this, its update conflicts once and is re-applied
+    second.update('123456704', {'Proc1': 'Completed'})
+    first.update('123456704', {'Proc2': 'Completed'})
+    assert {k: _case(s3, '123456704')[k] for k in ('Proc1', 'Proc2')} == {'Proc1': 'Completed', 'Proc2': 'Completed'}
+
+
+def test_legacy_table_is_migrated_once(s3):
+    s3_write_csv(s3, pd.DataFrame([{'CLNT_NBR': '000000001', 'Proc1': 'Completed', 'Proc1_Bucket': 'b',
+                                    'Proc1_Object': 'o'}, {'CLNT_NBR': '000000002'}]), bucket_name, legacy_key)
+    store = S3CaseStore(s3, bucket_name)
+    assert store.migrate_legacy(legacy_key) == 2
+    entry = store.get('000000001')
+    assert entry['Proc1'] == 'Completed' and entry['Proc2'] is None
+    assert sorted(e['CLNT_NBR'] for e in store.entries()) == ['000000001', '000000002']
+
+    # The marker makes later runs a single HEAD, even when the table changed meanwhile
+    s3_write_csv(s3, pd.DataFrame([{'CLNT_NBR': '000000003'}]), bucket_name, legacy_key)
+    gets = []
+    get_object = s3.get_object
+    s3.get_object = lambda **kwargs: gets.append(kwargs['Key']) or get_object(**kwargs)
+    assert store.migrate_legacy(legacy_key) == 0
+    assert gets == [] and store.get('000000003') is None
+
+
+def test_migration_never_overwrites_a_case(s3):
+    S3CaseStore(s3, bucket_name).create('000000001')
+    S3CaseStore(s3, bucket_name).update('000000001', {'Proc1': 'Completed'})
+    s3_write_csv(s3, pd.DataFrame([{'CLNT_NBR': '000000001', 'Proc1': None}]), bucket_name, legacy_key)
+    store = S3CaseStore(s3, bucket_name)
+    assert store.migrate_legacy(legacy_key) == 0
+    assert store.get('000000001')['Proc1'] == 'Completed'
+
+
+def test_migration_without_legacy_table(s3):
+    assert S3CaseStore(s3, bucket_name).migrate_legacy(legacy_key) == 0
+    s3.head_object(Bucket=bucket_name, Key='migrations/clnt_master_entry.json')
+
+
+def test_new_client_costs_one_read_and_one_write(s3):
+    s3_write_csv(s3, pd.DataFrame([{'CLNT_NBR': '000000001'}]), bucket_name, legacy_key)
+    gets = []
+    get_object = s3.get_object
+    s3.get_object = lambda **kwargs: gets.append(kwargs['Key']) or get_object(**kwargs)
+    store = S3CaseStore(s3, bucket_name)
+    assert store.get('999999999') is None
+    assert store.create('999999999')[0] is True
+    assert gets == ['cases/999999999.json']
+
+
+def test_export_is_conditional(s3):
+    store = S3CaseStore(s3, bucket_name)
+    store.create('123456704')
+    df = store.export_csv(s3, bucket_name, 'exports/clnt_master_entry.csv')
+    exported = s3_read_csv(s3, bucket_name, 'exports/clnt_master_entry.csv', dtype={'CLNT_NBR': str})
+    assert list(exported['CLNT_NBR']) == list(df['CLNT_NBR']) == ['123456704']
+
+    to_dataframe = store.to_dataframe
+
+    def written_meanwhile():
+        s3.put_object(Bucket=bucket_name, Key='exports/clnt_master_entry.csv', Body=b'CLNT_NBR\n')
+        return to_dataframe()
+    store.to_dataframe = written_meanwhile
+    with pytest.raises(WriteConflict):
+        store.export_csv(s3, bucket_name, 'exports/clnt_master_entry.csv')
+
+
+def test_missing_case_is_cached_until_created(s3):
+    cache = EntryCache(revalidate_after=60)
+    store = S3CaseStore(s3, bucket_name, cache=cache)
+    assert store.get('123456704') is None
+    assert store.get('123456704') is None
+    assert cache.stats == {'hits': 1, 'revalidated': 0, 'misses': 1}
+    store.create('123456704')
+    assert store.get('123456704')['CLNT_NBR'] == '123456704'
+
+
+def test_missing_case_is_revalidated(s3):
+    cache = EntryCache(revalidate_after=0)
+    store = S3CaseStore(s3, bucket_name, cache=cache)
+    assert store.get('123456704') is None
+    S3CaseStore(s3, bucket_name).create('123456704')
+    assert store.get('123456704')['CLNT_NBR'] == '123456704'
+
+
+def test_case_store_is_abstract():
+    with pytest.raises(TypeError):
+        CaseStore()
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from fakes import FakeS3
+from utils.case_store import S3CaseStore, entry_schema
+from utils.change_log import append_change, compact_change_log, list_changes
+from utils.invoke_s3 import s3_read_csv
+
+bucket_name = 'client-master-entry'
+snapshot_key = 'clnt_master_entry.csv'
+
+
+@pytest.fixture
+def s3():
+    s3 = FakeS3()
+    s3.create_bucket(Bucket=bucket_name)
+    return s3
+
+
+def _snapshot(s3):
+    df = s3_read_csv(s3, bucket_name, snapshot_key, dtype={'CLNT_NBR': str})
+    return {row['CLNT_NBR']: row for row in df.to_dict(orient='records')}
+
+
+def test_compaction_folds_case_writes_and_clears_the_log(s3):
+    store = S3CaseStore(s3, bucket_name)
+    store.create('123456704')
+    store.update('123456704', {'Proc1': 'Completed'})
+    store.create('123456705')
+    assert len(list_changes(s3, bucket_name)) == 3
+
+    assert compact_change_log(s3, bucket_name, snapshot_key, list(entry_schema)) == 3
+    rows = _snapshot(s3)
+    assert sorted(rows) == ['123456704', '123456705']
+    assert rows['123456704']['Proc1'] == 'Completed'
+    assert list_changes(s3, bucket_name) == []
+    assert compact_change_log(s3, bucket_name, snapshot_key, list(entry_schema)) == 0
+
+
+def test_skewed_clock_cannot_reorder_deltas(s3):
+    store = S3CaseStore(s3, bucket_name)
+    store.create('123456704')
+    store.update('123456704', {'Proc1': 'Completed'})
+    # An older delta whose writer's clock ran ahead sorts after the newer one
+    s3.put_object(Bucket=bucket_name, Key='changes/99999999999999999999999-123456704-0000abcd.json',
+                  Body=json.dumps({'CLNT_NBR': '123456704', 'changes': {'Proc1': None}}))
+    compact_change_log(s3, bucket_name, snapshot_key, list(entry_schema))
+    assert _snapshot(s3)['123456704']['Proc1'] == 'Completed'
+
+
+def test_deltas_apply_when_there_is_no_case_object(s3):
+    append_change(s3, bucket_name, '123456704', {'Proc1': 'Completed'})
+    append_change(s3, bucket_name, '123456704', {'Proc2': 'Completed'})
+    compact_change_log(s3, bucket_name, snapshot_key, list(entry_schema))
+    row = _snapshot(s3)['123456704']
+    assert (row['Proc1'], row['Proc2']) == ('Completed', 'Completed')
+
+
+def test_compaction_keeps_rows_not_in_the_log(s3):
+    S3CaseStore(s3, bucket_name).create('123456704')
+    compact_change_log(s3, bucket_name, snapshot_key, list(entry_schema))
+    S3CaseStore(s3, bucket_name).create('123456705')
+    compact_change_log(s3, bucket_name, snapshot_key, list(entry_schema))
+    assert sorted(_snapshot(s3)) == ['123456704', '123456705']